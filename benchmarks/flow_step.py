@@ -0,0 +1,105 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+"""
+Measures the runtime's per-step overhead by invoking 100-node flows of
+trivial example components through Runtime. Two flow shapes are measured:
+
+- sequential: every component falls through to the next one in the flow
+  (EmitEvents with no events), so the runtime resolves the next component.
+- explicit: every component names the next one (NextComponent).
+
+Components do no I/O, so the reported time per step is the cost of the
+runtime itself: registry lookup, component construction, logging, tracing
+and model handling.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+from node_engine.libs.runtime import Runtime
+from node_engine.models.flow_definition import FlowDefinition
+
+parser = argparse.ArgumentParser(description="Benchmark runtime per-step overhead")
+parser.add_argument("--nodes", help="components per flow", type=int, default=100)
+parser.add_argument("--iterations", help="flow invocations", type=int, default=20)
+parser.add_argument(
+    "--registry-root",
+    help="registry root with the example components",
+    default=os.path.join(os.path.dirname(__file__), "..", "examples"),
+)
+parser.add_argument("--json", help="print results as JSON", action="store_true")
+args = parser.parse_args()
+
+# Keep console logging out of the measurement.
+logging.getLogger("node_engine").setLevel(logging.WARNING)
+
+
+def sequential_flow(nodes: int) -> dict:
+    return {
+        "key": "benchmark_sequential",
+        "session_id": "benchmark",
+        "flow": [
+            {"key": f"step_{i}", "name": "EmitEvents", "config": {}}
+            for i in range(nodes)
+        ],
+    }
+
+
+def explicit_flow(nodes: int) -> dict:
+    return {
+        "key": "benchmark_explicit",
+        "session_id": "benchmark",
+        "flow": [
+            {
+                "key": f"step_{i}",
+                "name": "NextComponent",
+                "config": {"next": f"step_{i + 1}" if i + 1 < nodes else "exit"},
+            }
+            for i in range(nodes)
+        ],
+    }
+
+
+async def measure(runtime: Runtime, definition: dict) -> dict:
+    # Warm up imports and caches.
+    await runtime.invoke(FlowDefinition(**definition))
+
+    elapsed = 0.0
+    for _ in range(args.iterations):
+        flow_definition = FlowDefinition(**definition)
+        start = time.perf_counter()
+        result = await runtime.invoke(flow_definition)
+        elapsed += time.perf_counter() - start
+        if result.status.error:
+            raise Exception(result.status.error)
+
+    steps = args.iterations * args.nodes
+    return {
+        "flow": definition["key"],
+        "nodes": args.nodes,
+        "flow_ms": round(elapsed * 1000 / args.iterations, 3),
+        "step_us": round(elapsed * 1_000_000 / steps, 1),
+    }
+
+
+async def main() -> None:
+    runtime = Runtime(os.path.abspath(args.registry_root))
+    results = [
+        await measure(runtime, sequential_flow(args.nodes)),
+        await measure(runtime, explicit_flow(args.nodes)),
+    ]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'flow':25} {'nodes':>6} {'flow ms':>10} {'step us':>10}")
+    for result in results:
+        print(
+            f"{result['flow']:25} {result['nodes']:>6} {result['flow_ms']:>10} {result['step_us']:>10}"
+        )
+
+
+asyncio.run(main())
@@ -0,0 +1,275 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+"""
+Runs the bundled example flows (examples/definitions) end to end against a
+local stand-in for Azure OpenAI (node_engine/azure_openai_stand_in.py), both through
+Runtime and through the service's FastAPI app, and reports for each flow:
+
+- p50/p99 latency of a flow invocation,
+- throughput with --concurrency invocations in flight,
+- per-step overhead: the time of an invocation not spent in the execute
+  methods of its components, divided by the number of steps,
+- peak memory allocated during one invocation (tracemalloc).
+
+Every invocation uses a new session, in a temporary storage directory, so
+results don't depend on history left by earlier runs. Background flows
+started by the flows also call the stand-in but are not measured.
+
+Results can be saved with --output and compared with a saved run with
+--compare, e.g. to check a change against the previous commit.
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import uuid
+from typing import Awaitable, Callable
+
+import httpx
+from fastapi import FastAPI
+
+from node_engine import service
+from node_engine.azure_openai_stand_in import StandInSettings, create_app, serve
+from node_engine.libs.runtime import Runtime
+from node_engine.libs.storage import Storage
+from node_engine.models.flow_definition import FlowDefinition
+
+root = os.path.join(os.path.dirname(__file__), "..")
+
+parser = argparse.ArgumentParser(description="Benchmark the example flows")
+parser.add_argument(
+    "--definitions",
+    help="glob of flow definition files",
+    default=os.path.join(root, "examples", "definitions", "**", "*.json"),
+)
+parser.add_argument(
+    "--registry-root",
+    help="registry root with the example components",
+    default=os.path.join(root, "examples"),
+)
+parser.add_argument(
+    "--modes",
+    help="comma separated: runtime (Runtime.invoke), service (POST /invoke)",
+    default="runtime,service",
+)
+parser.add_argument("--iterations", help="invocations per flow", type=int, default=20)
+parser.add_argument("--concurrency", help="invocations in flight", type=int, default=4)
+parser.add_argument(
+    "--latency",
+    help="stand-in latency distribution, e.g. fixed:50 or lognormal:50:0.5",
+    default="fixed:50",
+)
+parser.add_argument(
+    "--completion-tokens",
+    help="words in stand-in chat completions",
+    type=int,
+    default=20,
+)
+parser.add_argument("--json", help="print results as JSON", action="store_true")
+parser.add_argument("--output", help="write results as JSON to a file")
+parser.add_argument("--compare", help="JSON results of an earlier run to compare")
+args = parser.parse_args()
+
+# Keep console logging out of the measurement.
+logging.getLogger("node_engine").setLevel(logging.WARNING)
+
+# Canned responses for components that parse the completion.
+stand_in_responses = [{"match": '{\\"memories\\"', "content": '{"memories": []}'}]
+
+services = [
+    "AZUREOPENAI_CHATCOMPLETION_GPT4",
+    "AZUREOPENAI_CHATCOMPLETION_GPT35",
+    "AZUREOPENAI_EMBEDDINGS",
+]
+
+Invoke = Callable[[FlowDefinition], Awaitable[FlowDefinition]]
+
+
+def percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def new_session(definition: dict) -> FlowDefinition:
+    return FlowDefinition(**{**definition, "session_id": f"benchmark-{uuid.uuid4()}"})
+
+
+async def measure(invoke: Invoke, definition: dict) -> dict:
+    # Warm up imports, connections and caches.
+    await invoke(new_session(definition))
+
+    tracemalloc.start()
+    await invoke(new_session(definition))
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies: list[float] = []
+    overheads: list[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def run() -> None:
+        nonlocal errors
+        async with semaphore:
+            flow_definition = new_session(definition)
+            start = time.perf_counter()
+            result = await invoke(flow_definition)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        if result.status.error:
+            errors += 1
+        latencies.append(elapsed_ms)
+        trace = result.status.trace
+        if trace:
+            component_ms = sum(step["elapsed_time_ms"] for step in trace)
+            overheads.append((elapsed_ms - component_ms) / len(trace))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run() for _ in range(args.iterations)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "invocations": args.iterations,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "throughput_per_s": round(args.iterations / elapsed, 3),
+        "step_overhead_ms": (
+            round(statistics.median(overheads), 3) if overheads else None
+        ),
+        "peak_memory_kb": round(peak_bytes / 1024, 1),
+    }
+
+
+def load_definitions() -> list[tuple[str, dict]]:
+    definitions = []
+    for file_name in sorted(glob.glob(args.definitions, recursive=True)):
+        with open(file_name) as file:
+            definition = json.load(file)
+        if "flow" not in definition:
+            # Not a flow definition, e.g. sub-flow context such as agent personas.
+            continue
+        name = os.path.relpath(
+            file_name, os.path.dirname(args.definitions.split("*")[0])
+        )
+        definitions.append((name, definition))
+    return definitions
+
+
+def commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+async def main() -> dict:
+    endpoint = serve(
+        create_app(
+            StandInSettings(
+                latency=args.latency,
+                completion_tokens=args.completion_tokens,
+                responses=stand_in_responses,
+            )
+        )
+    )
+    for name in services:
+        os.environ[name] = f"endpoint|{endpoint},key|benchmark,deployment|{name}"
+
+    registry_root = os.path.abspath(args.registry_root)
+    runtime = Runtime(registry_root)
+    app = FastAPI()
+    service.init(app, registry_root)
+    client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://service", timeout=None
+    )
+
+    async def invoke_runtime(flow_definition: FlowDefinition) -> FlowDefinition:
+        return await runtime.invoke(flow_definition)
+
+    async def invoke_service(flow_definition: FlowDefinition) -> FlowDefinition:
+        response = await client.post(
+            "/invoke", json=flow_definition.model_dump(mode="json")
+        )
+        response.raise_for_status()
+        return FlowDefinition.model_validate(response.json())
+
+    modes = {"runtime": invoke_runtime, "service": invoke_service}
+
+    results = []
+    for name, definition in load_definitions():
+        for mode in args.modes.split(","):
+            result = await measure(modes[mode], definition)
+            results.append({"flow": name, "mode": mode, **result})
+
+    await runtime.background.shutdown(timeout=5)
+    await client.aclose()
+
+    return {
+        "commit": commit(),
+        "python": platform.python_version(),
+        "settings": {
+            "iterations": args.iterations,
+            "concurrency": args.concurrency,
+            "latency": args.latency,
+            "completion_tokens": args.completion_tokens,
+        },
+        "results": results,
+    }
+
+
+def print_table(report: dict, baseline: dict | None) -> None:
+    previous = {
+        (result["flow"], result["mode"]): result
+        for result in (baseline or {}).get("results", [])
+    }
+    print(
+        f"{'flow':45} {'mode':8} {'errors':>6} {'p50 ms':>10} {'p99 ms':>10} "
+        f"{'flows/s':>9} {'step ms':>8} {'peak KB':>9}"
+        + (f" {'p50 vs base':>12}" if baseline else "")
+    )
+    for result in report["results"]:
+        line = (
+            f"{result['flow']:45} {result['mode']:8} {result['errors']:>6} "
+            f"{result['p50_ms']:>10} {result['p99_ms']:>10} "
+            f"{result['throughput_per_s']:>9} {str(result['step_overhead_ms']):>8} "
+            f"{result['peak_memory_kb']:>9}"
+        )
+        base = previous.get((result["flow"], result["mode"]))
+        if base:
+            change = (result["p50_ms"] - base["p50_ms"]) / base["p50_ms"] * 100
+            line += f" {change:>+11.1f}%"
+        print(line)
+
+
+with tempfile.TemporaryDirectory() as storage_root:
+    Storage.root_path = storage_root
+    report = asyncio.run(main())
+
+if args.output:
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+
+if args.json:
+    print(json.dumps(report, indent=2))
+else:
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+    print_table(report, baseline)
@@ -0,0 +1,131 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+"""
+Compares the wire formats supported by /invoke and /invoke_component (JSON,
+msgpack, each optionally gzip or zstd compressed) on the bundled example flow
+definitions. For each flow and format it reports the payload size and the
+average time to encode and decode it.
+
+Example flows carry little data, so by default each flow is also measured
+with a context holding memory embeddings as produced by ExtractEmbeddings
+(1536 floats per memory). Use --embeddings to change the number of memories.
+
+Requires node-engine[binary] for the msgpack and zstd formats.
+"""
+
+import argparse
+import glob
+import json
+import os
+import random
+import time
+
+from node_engine.libs import serialization
+from node_engine.models.flow_definition import FlowDefinition
+
+embedding_size = 1536
+
+formats = [
+    (serialization.json_content_type, None),
+    (serialization.json_content_type, "gzip"),
+    (serialization.json_content_type, "zstd"),
+    (serialization.msgpack_content_type, None),
+    (serialization.msgpack_content_type, "gzip"),
+    (serialization.msgpack_content_type, "zstd"),
+]
+
+parser = argparse.ArgumentParser(description="Benchmark flow definition wire formats")
+parser.add_argument(
+    "--definitions",
+    help="glob of flow definition files",
+    default=os.path.join(
+        os.path.dirname(__file__), "..", "examples", "definitions", "**", "*.json"
+    ),
+)
+parser.add_argument(
+    "--embeddings",
+    help="number of memory embeddings to add to each flow's context",
+    type=int,
+    default=20,
+)
+parser.add_argument(
+    "--iterations", help="iterations per measurement", type=int, default=20
+)
+parser.add_argument("--json", help="print results as JSON", action="store_true")
+args = parser.parse_args()
+
+
+def with_embeddings(flow_definition: dict, count: int) -> dict:
+    # Deterministic stand-in for ExtractEmbeddings output.
+    rng = random.Random(0)
+    return {
+        **flow_definition,
+        "context": {
+            **flow_definition.get("context", {}),
+            "memories_embeddings": [
+                {
+                    "item": f"memory {i}",
+                    "embedding": [
+                        rng.uniform(-0.1, 0.1) for _ in range(embedding_size)
+                    ],
+                }
+                for i in range(count)
+            ],
+        },
+    }
+
+
+def measure(data: dict, content_type: str, content_encoding: str | None) -> dict:
+    body = serialization.encode(data, content_type, content_encoding)
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        serialization.encode(data, content_type, content_encoding)
+    encode_ms = (time.perf_counter() - start) * 1000 / args.iterations
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        serialization.decode(body, content_type, content_encoding)
+    decode_ms = (time.perf_counter() - start) * 1000 / args.iterations
+
+    return {
+        "content_type": content_type,
+        "content_encoding": content_encoding or "identity",
+        "bytes": len(body),
+        "encode_ms": round(encode_ms, 3),
+        "decode_ms": round(decode_ms, 3),
+    }
+
+
+results = []
+for file_name in sorted(glob.glob(args.definitions, recursive=True)):
+    with open(file_name) as file:
+        definition = json.load(file)
+    if "flow" not in definition:
+        # Not a flow definition, e.g. sub-flow context such as agent personas.
+        continue
+    # Serialize the flow definition as the client sends it, with defaults.
+    data = FlowDefinition(**definition).model_dump(mode="json")
+    variants = [("", data)]
+    if args.embeddings:
+        variants.append(
+            (f"+{args.embeddings} embeddings", with_embeddings(data, args.embeddings))
+        )
+
+    for suffix, variant in variants:
+        for content_type, content_encoding in formats:
+            result = measure(variant, content_type, content_encoding)
+            result["flow"] = os.path.basename(file_name) + suffix
+            results.append(result)
+
+if args.json:
+    print(json.dumps(results, indent=2))
+else:
+    print(
+        f"{'flow':45} {'content type':20} {'encoding':9} {'bytes':>10} {'encode ms':>10} {'decode ms':>10}"
+    )
+    for result in results:
+        print(
+            f"{result['flow']:45} {result['content_type']:20} {result['content_encoding']:9} "
+            f"{result['bytes']:>10} {result['encode_ms']:>10} {result['decode_ms']:>10}"
+        )
@@ -1,7 +1,5 @@
 # Copyright (c) Microsoft. All rights reserved.
 
-import asyncio
-
 from node_engine.models.flow_definition import FlowDefinition
 from node_engine.libs.node_engine_component import NodeEngineComponent
 from node_engine.models.flow_step import FlowStep
@@ -17,7 +15,17 @@ class BackgroundProcess(NodeEngineComponent):
                 "type": "list",
                 "description": "The flow to run in the background.",
                 "required": True,
-            }
+            },
+            "priority": {
+                "type": "number",
+                "description": "Priority of the flow among queued background flows, lower runs first.",
+                "default": 0,
+            },
+            "coalesce": {
+                "type": "boolean",
+                "description": "Whether to run at most one instance of the flow per session at a time, with at most one more queued using the latest context.",
+                "default": False,
+            },
         },
     }
 
@@ -62,15 +70,26 @@ class BackgroundProcess(NodeEngineComponent):
             **{
                 "key": "invoke_async",
                 "session_id": self.flow_definition.session_id,
-                "context": self.flow_definition.context,
+                "context": self.context.fork(),
                 "flow": flow,
             }
         )
 
-        # start the sub-flow asynchronously
-        asyncio.create_task(self.invoke(sub_flow_definition))
-        # suspend for a moment to allow the sub-flow to start
-        await asyncio.sleep(0)
+        # queue the sub-flow with the runtime's background supervisor
+        coalesce_key = None
+        if self.config.get("coalesce", False):
+            coalesce_key = ":".join(
+                [
+                    self.flow_definition.session_id,
+                    self.flow_definition.key,
+                    self.component_key,
+                ]
+            )
+        await self.invoke_background(
+            sub_flow_definition,
+            priority=self.config.get("priority", 0),
+            coalesce_key=coalesce_key,
+        )
 
         self.log("Background process completed")
 
@@ -48,6 +48,13 @@ class DebugAgentResponse(NodeEngineComponent):
                 "required": False,
             },
         },
+        "config": {
+            "cache_ttl": {
+                "type": "number",
+                "description": "Seconds to reuse the completion for identical requests.  Defaults to no caching.",
+                "required": False,
+            },
+        },
     }
 
     writes_to = {
@@ -125,7 +132,12 @@ class DebugAgentResponse(NodeEngineComponent):
             )
 
         service = self.config.get("service") or ""
-        response = await self.azure_openai_chat_completion.create(messages, service)
+        response = await self.azure_openai_chat_completion.create(
+            messages,
+            service,
+            cache_ttl=self.config.get("cache_ttl"),
+            telemetry=self.telemetry,
+        )
         self.context.set("debug_agent_response", response)
 
         self.log(f"Response generated [{service}]: {response}.")
@@ -21,6 +21,8 @@ class EvaluateContinue(NodeEngineComponent):
 
     writes_to = None
 
+    side_effect_free = True
+
     sample_input = {
         "key": "sample",
         "session_id": "123456",
@@ -63,6 +65,9 @@ class EvaluateContinue(NodeEngineComponent):
         ],
     }
 
+    def candidate_successors(self) -> list[str]:
+        return list((self.config.get("outputs") or {}).values())
+
     async def execute(self) -> FlowStep:
         # extract intent from message
 
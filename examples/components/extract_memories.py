@@ -3,6 +3,7 @@
 import json
 
 from node_engine.libs.azure_openai_chat_completion import AzureOpenAIChatCompletion
+from node_engine.libs.prompt_budget import fit_history
 from node_engine.libs.storage import Storage
 from node_engine.libs.telemetry import Timer
 from node_engine.libs.node_engine_component import NodeEngineComponent
@@ -14,6 +15,7 @@ class ExtractMemories(NodeEngineComponent):
 
     default_config = {
         "service": "AZUREOPENAI_CHATCOMPLETION_GPT35",
+        "history_token_budget": 2000,
         "prompts": [
             {
                 "role": "user",
@@ -49,6 +51,29 @@ class ExtractMemories(NodeEngineComponent):
                 "description": "The key in the context where the memories will be stored.  Defaults to 'memories'.",
                 "required": False,
             },
+            "history_token_budget": {
+                "type": "number",
+                "description": "Maximum estimated tokens of chat history to include, most recent messages first.  Defaults to 2000.",
+                "required": False,
+            },
+            "summary_source": {
+                "type": "string",
+                "description": "The key in the context of a summary produced by SummarizeHistory.  When present, the summary is included and only the messages it does not cover are added from the chat history.",
+                "required": False,
+            },
+            "cache_ttl": {
+                "type": "number",
+                "description": "Seconds to reuse the completion for identical requests.  Defaults to no caching.",
+                "required": False,
+            },
+        },
+        "storage": {
+            "messages": {
+                "type": [
+                    {"sender": "string", "content": "string", "timestamp": "number"}
+                ],
+                "description": "The chat history.",
+            },
         },
     }
 
@@ -72,10 +97,30 @@ class ExtractMemories(NodeEngineComponent):
 
         history = await Storage.get(self.flow_definition.session_id, "messages") or []
 
+        # include the rolling summary, if any (see SummarizeHistory), and only
+        # the messages it does not cover
+        summary_source = self.config.get("summary_source")
+        summary = self.context.get(summary_source) if summary_source else None
+        if summary:
+            messages.append(
+                {
+                    "role": "system",
+                    "content": f"<CHAT_SUMMARY>{summary['content']}</CHAT_SUMMARY>",
+                }
+            )
+            history = history[summary["processed"] :]
+
+        def render(message: dict) -> str:
+            return f"{message['sender']}: {message['content']}\n"
+
+        # most recent messages that fit in the history token budget
         history_text = ""
-        # last 40 messages
-        for message in history[-40:]:
-            history_text += f"{message['sender']}: {message['content']}\n"
+        for message in fit_history(
+            history,
+            render,
+            self.config.get("history_token_budget"),
+        ):
+            history_text += render(message)
 
         messages.append(
             {
@@ -92,7 +137,12 @@ class ExtractMemories(NodeEngineComponent):
         self.log.debug({"messages": messages})
 
         timer = Timer()
-        response = await self.azure_openai_chat_completion.create(messages, service)
+        response = await self.azure_openai_chat_completion.create(
+            messages,
+            service,
+            cache_ttl=self.config.get("cache_ttl"),
+            telemetry=self.telemetry,
+        )
         timer.stop()
         await self.telemetry.capture_average(
             "avg_chat_completion", timer.elapsed_time()
@@ -5,6 +5,7 @@ import time
 from datetime import datetime
 
 from node_engine.libs.azure_openai_chat_completion import AzureOpenAIChatCompletion
+from node_engine.libs.prompt_budget import fit_history
 from node_engine.libs.storage import Storage
 from node_engine.libs.telemetry import Timer
 from node_engine.libs.node_engine_component import NodeEngineComponent
@@ -16,6 +17,7 @@ class GenerateResponse(NodeEngineComponent):
 
     default_config = {
         "service": "AZUREOPENAI_CHATCOMPLETION_GPT35",
+        "history_token_budget": 2000,
         "prompts": [
             {
                 "role": "system",
@@ -65,6 +67,24 @@ class GenerateResponse(NodeEngineComponent):
                 "description": "Whether to include debug information in the response.",
                 "required": False,
             },
+            "history_token_budget": {
+                "type": "number",
+                "description": "Maximum estimated tokens of chat history to include, most recent messages first.  Defaults to 2000.",
+                "required": False,
+            },
+        },
+        "storage": {
+            "whiteboard": {
+                "type": [{"content": "string", "timestamp": "number"}],
+                "description": "The whiteboard versions, the latest last.",
+            },
+            "messages": {
+                "type": [
+                    {"sender": "string", "content": "string", "timestamp": "number"}
+                ],
+                "description": "The chat history. Stored under the 'storage_key' config value when set.",
+                "config": "storage_key",
+            },
         },
     }
 
@@ -204,20 +224,28 @@ class GenerateResponse(NodeEngineComponent):
 
         storage_key = self.config.get("storage_key", "messages")
         history = await Storage.get(self.flow_definition.session_id, storage_key) or []
-        # last 40 messages
-        for message in history[-40:]:
+
+        def render(message: dict) -> str:
             if "timestamp" not in message:
                 message["timestamp"] = int(time.time())
+            return "[{timestamp} - {sender}]: {content}".format(
+                timestamp=format_timestamp(message["timestamp"]),
+                sender=message["sender"],
+                content=message["content"],
+            )
+
+        # most recent messages that fit in the history token budget
+        for message in fit_history(
+            history,
+            render,
+            self.config.get("history_token_budget"),
+        ):
             messages.append(
                 {
                     "role": (
                         "assistant" if message["sender"] == agent["name"] else "user"
                     ),
-                    "content": "[{timestamp} - {sender}]: {content}".format(
-                        timestamp=format_timestamp(message["timestamp"]),
-                        sender=message["sender"],
-                        content=message["content"],
-                    ),
+                    "content": render(message),
                 }
             )
 
@@ -3,6 +3,7 @@
 import time
 
 from node_engine.libs.azure_openai_chat_completion import AzureOpenAIChatCompletion
+from node_engine.libs.prompt_budget import fit_history
 from node_engine.libs.storage import Storage
 from node_engine.libs.telemetry import Timer
 from node_engine.libs.node_engine_component import NodeEngineComponent
@@ -14,6 +15,7 @@ class GenerateWhiteboard(NodeEngineComponent):
 
     default_config = {
         "service": "AZUREOPENAI_CHATCOMPLETION_GPT4",
+        "history_token_budget": 4000,
         "prompts": [
             {
                 "role": "user",
@@ -47,6 +49,33 @@ class GenerateWhiteboard(NodeEngineComponent):
                 "description": "Whether to include debug information in the whiteboard.  Defaults to False.",
                 "required": False,
             },
+            "history_token_budget": {
+                "type": "number",
+                "description": "Maximum estimated tokens of chat history to include, most recent messages first.  Defaults to 4000.",
+                "required": False,
+            },
+            "summary_source": {
+                "type": "string",
+                "description": "The key in the context of a summary produced by SummarizeHistory.  When present, the summary is included and only the messages it does not cover are added from the chat history.",
+                "required": False,
+            },
+            "cache_ttl": {
+                "type": "number",
+                "description": "Seconds to reuse the completion for identical requests.  Defaults to no caching.",
+                "required": False,
+            },
+        },
+        "storage": {
+            "whiteboard": {
+                "type": [{"content": "string", "timestamp": "number"}],
+                "description": "The whiteboard versions, the latest last.",
+            },
+            "messages": {
+                "type": [
+                    {"sender": "string", "content": "string", "timestamp": "number"}
+                ],
+                "description": "The chat history.",
+            },
         },
     }
 
@@ -103,19 +132,38 @@ class GenerateWhiteboard(NodeEngineComponent):
 
         # add chat history to messages
         history = await Storage.get(self.flow_definition.session_id, "messages") or []
+
+        # include the rolling summary, if any (see SummarizeHistory), and only
+        # the messages it does not cover
+        summary_source = self.config.get("summary_source")
+        summary = self.context.get(summary_source) if summary_source else None
+        if summary:
+            messages.append(
+                {
+                    "role": "system",
+                    "content": f"<CHAT_SUMMARY>{summary['content']}</CHAT_SUMMARY>",
+                }
+            )
+            history = history[summary["processed"] :]
+
+        def render(message: dict) -> str:
+            return "[{sender}]: {content}".format(
+                sender=message["sender"],
+                content=message["content"],
+            )
+
+        # most recent messages that fit in the history token budget
+        recent_history = fit_history(
+            history,
+            render,
+            self.config.get("history_token_budget"),
+        )
         messages.append(
             {
                 "role": "system",
                 "content": "<CHAT_HISTORY>{chat_history}</CHAT_HISTORY>".format(
                     chat_history="\n".join(
-                        [
-                            "[{sender}]: {content}".format(
-                                sender=message["sender"],
-                                content=message["content"],
-                            )
-                            # last 100 messages
-                            for message in history[-100:]
-                        ]
+                        render(message) for message in recent_history
                     )
                 ),
             }
@@ -131,7 +179,12 @@ class GenerateWhiteboard(NodeEngineComponent):
         self.log.debug({"messages": messages})
 
         timer = Timer()
-        completion = await self.azure_openai_chat_completion.create(messages, service)
+        completion = await self.azure_openai_chat_completion.create(
+            messages,
+            service,
+            cache_ttl=self.config.get("cache_ttl"),
+            telemetry=self.telemetry,
+        )
         timer.stop()
         await self.telemetry.capture_average(
             "avg_chat_completion", timer.elapsed_time()
@@ -1,6 +1,7 @@
 # Copyright (c) Microsoft. All rights reserved.
 
 from node_engine.libs.azure_openai_chat_completion import AzureOpenAIChatCompletion
+from node_engine.libs.prompt_budget import fit_history
 from node_engine.libs.storage import Storage
 from node_engine.libs.node_engine_component import NodeEngineComponent
 from node_engine.models.flow_step import FlowStep
@@ -11,6 +12,7 @@ class IntentExtraction(NodeEngineComponent):
 
     default_config = {
         "service": "AZUREOPENAI_CHATCOMPLETION_GPT35",
+        "history_token_budget": 1000,
         "prompts": [
             {
                 "role": "system",
@@ -40,6 +42,24 @@ class IntentExtraction(NodeEngineComponent):
                 "description": "The key in the context where the intent will be stored.  Defaults to 'intent'.",
                 "required": False,
             },
+            "history_token_budget": {
+                "type": "number",
+                "description": "Maximum estimated tokens of chat history to include, most recent messages first.  Defaults to 1000.",
+                "required": False,
+            },
+            "cache_ttl": {
+                "type": "number",
+                "description": "Seconds to reuse the completion for identical requests.  Defaults to no caching.",
+                "required": False,
+            },
+        },
+        "storage": {
+            "messages": {
+                "type": [
+                    {"sender": "string", "content": "string", "timestamp": "number"}
+                ],
+                "description": "The chat history.",
+            },
         },
     }
 
@@ -107,7 +127,12 @@ class IntentExtraction(NodeEngineComponent):
         messages = []
 
         history = await Storage.get(self.flow_definition.session_id, "messages") or []
-        for message in history:
+        # most recent messages that fit in the history token budget
+        for message in fit_history(
+            history,
+            lambda message: message["content"],
+            self.config.get("history_token_budget"),
+        ):
             messages.append(
                 {
                     "role": "assistant" if message["sender"] == "bot" else "user",
@@ -123,7 +148,12 @@ class IntentExtraction(NodeEngineComponent):
         self.log.debug({"messages": messages})
 
         # generate intent
-        intent = await self.azure_openai_chat_completion.create(messages, service)
+        intent = await self.azure_openai_chat_completion.create(
+            messages,
+            service,
+            cache_ttl=self.config.get("cache_ttl"),
+            telemetry=self.telemetry,
+        )
 
         # store intent in context
         target = self.config.get("target", "intent")
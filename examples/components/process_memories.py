@@ -1,7 +1,5 @@
 # Copyright (c) Microsoft. All rights reserved.
 
-import asyncio
-
 from node_engine.models.flow_definition import FlowDefinition
 from node_engine.libs.node_engine_component import NodeEngineComponent
 from node_engine.models.flow_step import FlowStep
@@ -108,9 +106,19 @@ class ProcessMemories(NodeEngineComponent):
         if self.config.get("await", True):
             await self.invoke(sub_flow_definition)
         else:
-            # Start the task in the background
-            asyncio.create_task(self.invoke(sub_flow_definition))
-            # Suspend for a moment to allow the task to start
-            await asyncio.sleep(0)
+            # Queue the sub-flow with the runtime's background supervisor. The
+            # sub-flow processes the whole message history, so a burst of
+            # messages only needs the latest queued run of this step.
+            await self.invoke_background(
+                sub_flow_definition,
+                coalesce_key=":".join(
+                    [
+                        self.flow_definition.session_id,
+                        self.flow_definition.key,
+                        self.component_key,
+                        sub_flow_definition.key,
+                    ]
+                ),
+            )
 
         return self.continue_flow()
@@ -27,6 +27,13 @@ class RetrieveContent(NodeEngineComponent):
                 "required": False,
             },
         },
+        "storage": {
+            "content": {
+                "type": "list",
+                "description": "The content to retrieve, stored under the 'key' config value.",
+                "config": "key",
+            },
+        },
     }
 
     writes_to = {
@@ -38,6 +45,8 @@ class RetrieveContent(NodeEngineComponent):
         }
     }
 
+    side_effect_free = True
+
     sample_input = {
         "key": "sample",
         "session_id": "123456",
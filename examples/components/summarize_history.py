@@ -0,0 +1,205 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import time
+
+from node_engine.libs.azure_openai_chat_completion import AzureOpenAIChatCompletion
+from node_engine.libs.node_engine_component import NodeEngineComponent
+from node_engine.libs.prompt_budget import estimate_tokens, message_overhead_tokens
+from node_engine.libs.storage import Storage
+from node_engine.libs.telemetry import Timer
+from node_engine.models.flow_step import FlowStep
+
+
+class SummarizeHistory(NodeEngineComponent):
+    description = "Maintains a rolling summary of the chat history, summarizing only the messages added since the last run. The summary and the index of the first message it does not cover are stored in context under the key 'history_summary' by default."
+
+    default_config = {
+        "service": "AZUREOPENAI_CHATCOMPLETION_GPT35",
+        "keep_recent": 10,
+        "chunk_token_budget": 3000,
+        "prompts": [
+            {
+                "role": "system",
+                "content": "Update the <SUMMARY/> of a conversation with the <NEW_MESSAGES/>. Keep facts, decisions, open questions and the preferences of the participants, and drop small talk. Keep the summary concise and return only the updated summary text.",
+            }
+        ],
+    }
+
+    reads_from = {
+        "context": None,
+        "config": {
+            "service": {
+                "type": "string",
+                "description": "The service to use for summarizing.",
+                "required": False,
+            },
+            "prompts": {
+                "type": [
+                    {
+                        "role": "string",
+                        "content": "string",
+                    }
+                ]
+            },
+            "storage_key": {
+                "type": "string",
+                "description": "The storage key of the chat history.  Defaults to 'messages'.",
+                "required": False,
+            },
+            "keep_recent": {
+                "type": "number",
+                "description": "Number of most recent messages left out of the summary, for components to include verbatim.  Defaults to 10.",
+                "required": False,
+            },
+            "chunk_token_budget": {
+                "type": "number",
+                "description": "Maximum estimated tokens of new messages sent per summarization request.  Defaults to 3000.",
+                "required": False,
+            },
+            "target": {
+                "type": "string",
+                "description": "The key in the context and storage where the summary will be stored.  Defaults to 'history_summary'.",
+                "required": False,
+            },
+            "cache_ttl": {
+                "type": "number",
+                "description": "Seconds to reuse the completion for identical requests.  Defaults to no caching.",
+                "required": False,
+            },
+        },
+        "storage": {
+            "messages": {
+                "type": [
+                    {"sender": "string", "content": "string", "timestamp": "number"}
+                ],
+                "description": "The chat history. Stored under the 'storage_key' config value when set.",
+                "config": "storage_key",
+            },
+            "history_summary": {
+                "type": {
+                    "content": "string",
+                    "processed": "number",
+                    "timestamp": "number",
+                },
+                "description": "The summary from the previous run. Stored under the 'target' config value when set.",
+                "config": "target",
+            },
+        },
+    }
+
+    writes_to = {
+        "context": {
+            "history_summary": {
+                "type": {
+                    "content": "string",
+                    "processed": "number",
+                    "timestamp": "number",
+                },
+                "description": "The summary of the messages before index 'processed' of the chat history.",
+            }
+        }
+    }
+
+    sample_input = {
+        "key": "sample",
+        "session_id": "123456",
+        "context": {},
+        "flow": [
+            {
+                "key": "start",
+                "name": "SummarizeHistory",
+                "config": {
+                    "keep_recent": 0,
+                },
+            }
+        ],
+    }
+
+    azure_openai_chat_completion = AzureOpenAIChatCompletion()
+
+    async def execute(self) -> FlowStep:
+        session_id = self.flow_definition.session_id
+        storage_key = self.config.get("storage_key", "messages")
+        target = self.config.get("target", "history_summary")
+
+        history = await Storage.get(session_id, storage_key) or []
+        summary = await Storage.get(session_id, target) or {
+            "content": "",
+            "processed": 0,
+            "timestamp": None,
+        }
+
+        # Only messages after the high-water mark are sent, in chunks that
+        # fit in the token budget, leaving the most recent ones out.
+        end = max(0, len(history) - self.config.get("keep_recent"))
+        if summary["processed"] > len(history):
+            # The history was replaced, start over.
+            summary = {"content": "", "processed": 0, "timestamp": None}
+
+        self.log(
+            f"Summarizing messages {summary['processed']} to {end} of {len(history)}"
+        )
+
+        service = self.config.get("service") or self.default_config["service"]
+        budget = self.config.get("chunk_token_budget")
+        while summary["processed"] < end:
+            chunk = []
+            tokens = 0
+            for message in history[summary["processed"] : end]:
+                text = f"[{message['sender']}]: {message['content']}"
+                tokens += estimate_tokens(text) + message_overhead_tokens
+                if chunk and tokens > budget:
+                    break
+                chunk.append(text)
+
+            messages = [
+                *(self.config.get("prompts") or []),
+                {
+                    "role": "system",
+                    "content": f"<SUMMARY>{summary['content']}</SUMMARY>",
+                },
+                {
+                    "role": "system",
+                    "content": "<NEW_MESSAGES>{}</NEW_MESSAGES>".format(
+                        "\n".join(chunk)
+                    ),
+                },
+            ]
+
+            self.log.debug({"messages": messages})
+
+            timer = Timer()
+            try:
+                # Errors and incomplete responses raise rather than being
+                # returned, so they don't replace the summary.
+                content = await self.azure_openai_chat_completion.create(
+                    messages,
+                    service,
+                    cache_ttl=self.config.get("cache_ttl"),
+                    telemetry=self.telemetry,
+                    raise_on_incomplete=True,
+                )
+            except Exception as exception:
+                # The summary and mark saved so far are kept.
+                return self.exit_flow_with_error(
+                    f"Error summarizing messages {summary['processed']} to {end}: {exception}"
+                )
+            timer.stop()
+            await self.telemetry.capture_average(
+                "avg_chat_completion", timer.elapsed_time()
+            )
+            await self.telemetry.capture_average("avg_summarized_messages", len(chunk))
+
+            summary = {
+                "content": content,
+                "processed": summary["processed"] + len(chunk),
+                "timestamp": int(time.time()),
+            }
+            # Save after every chunk, so progress is kept if a later one fails.
+            await Storage.set(session_id, target, summary)
+
+        self.context.set(target, summary)
+
+        self.log(f"Summary covers {summary['processed']} messages")
+
+        return self.continue_flow()
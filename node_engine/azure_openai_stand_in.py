@@ -0,0 +1,341 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+"""
+Local stand-in for the Azure OpenAI chat completions (streaming and not) and
+embeddings endpoints, for load testing flows without calling real
+deployments. Responses are deterministic; latency follows a configurable
+distribution, and errors (429, 500) and timeouts can be injected at given
+rates.
+
+Point a service at it with the usual connection string, e.g.
+AZUREOPENAI_CHATCOMPLETION_GPT4=endpoint|http://127.0.0.1:8010,key|any,deployment|gpt-4
+"""
+
+import argparse
+import array
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import math
+import random
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, Callable
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Returns a sampler of latencies in milliseconds for a distribution spec:
+    "fixed:<ms>", "uniform:<min ms>:<max ms>", "normal:<mean ms>:<stddev ms>"
+    or "lognormal:<median ms>:<sigma>".
+    """
+    kind, *values = spec.split(":")
+    try:
+        params = [float(value) for value in values]
+        match kind, len(params):
+            case "fixed", 1:
+                return lambda rng: params[0]
+            case "uniform", 2:
+                return lambda rng: rng.uniform(params[0], params[1])
+            case "normal", 2:
+                return lambda rng: max(0.0, rng.gauss(params[0], params[1]))
+            case "lognormal", 2:
+                return lambda rng: rng.lognormvariate(math.log(params[0]), params[1])
+    except ValueError:
+        pass
+    raise ValueError(f"invalid latency distribution: {spec}")
+
+
+@dataclass
+class StandInSettings:
+    # Time to the response, or to the first chunk when streaming.
+    latency: str = "fixed:50"
+    # Time between chunks when streaming.
+    token_latency_ms: float = 0
+    # Words in generated completions.
+    completion_tokens: int = 20
+    # Canned completions: the content of the first entry whose "match"
+    # string appears in the request messages is returned.
+    responses: list[dict[str, str]] = field(default_factory=list)
+    embedding_dimensions: int = 1536
+    # Fractions of requests answered with a 429 (with Retry-After) or a 500,
+    # or left hanging for `timeout_seconds` to make the client time out.
+    error_rate_429: float = 0
+    error_rate_500: float = 0
+    timeout_rate: float = 0
+    retry_after_ms: int = 1000
+    timeout_seconds: float = 600
+    seed: int = 0
+
+
+def embedding(text: str, dimensions: int) -> list[float]:
+    """
+    Returns a unit vector derived from a hash of the text, so the same text
+    always gets the same embedding.
+    """
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    vector = [rng.gauss(0, 1) for _ in range(dimensions)]
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+def create_app(settings: StandInSettings | None = None) -> FastAPI:
+    settings = settings or StandInSettings()
+    sample_latency = parse_latency(settings.latency)
+    rng = random.Random(settings.seed)
+    app = FastAPI()
+    stats = {"chat": 0, "stream": 0, "embeddings": 0, "429": 0, "500": 0, "timeout": 0}
+
+    async def inject() -> JSONResponse | None:
+        # Waits for the sampled latency, then returns an error response to
+        # send instead of the result, if one is injected.
+        draw = rng.random()
+        await asyncio.sleep(sample_latency(rng) / 1000)
+        if draw < settings.error_rate_429:
+            stats["429"] += 1
+            return JSONResponse(
+                {"error": {"code": "429", "message": "Rate limit is exceeded."}},
+                status_code=429,
+                headers={
+                    "retry-after-ms": str(settings.retry_after_ms),
+                    "retry-after": str(math.ceil(settings.retry_after_ms / 1000)),
+                },
+            )
+        draw -= settings.error_rate_429
+        if draw < settings.error_rate_500:
+            stats["500"] += 1
+            return JSONResponse(
+                {"error": {"code": "500", "message": "Internal server error."}},
+                status_code=500,
+            )
+        draw -= settings.error_rate_500
+        if draw < settings.timeout_rate:
+            stats["timeout"] += 1
+            await asyncio.sleep(settings.timeout_seconds)
+            return JSONResponse(
+                {"error": {"code": "408", "message": "Request timed out."}},
+                status_code=408,
+            )
+        return None
+
+    def completion_content(messages: Any) -> str:
+        prompt = json.dumps(messages)
+        for response in settings.responses:
+            if response["match"] in prompt:
+                return response["content"]
+        return " ".join(f"word{i}" for i in range(settings.completion_tokens))
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def chat_completions(deployment: str, request: Request) -> Any:
+        body = await request.json()
+        stream = bool(body.get("stream"))
+        stats["stream" if stream else "chat"] += 1
+        error = await inject()
+        if error:
+            return error
+
+        id = f"chatcmpl-{stats['chat'] + stats['stream']}"
+        created = int(time.time())
+        content = completion_content(body.get("messages", []))
+        prompt_tokens = len(json.dumps(body.get("messages", []))) // 4
+        completion_tokens = len(content.split())
+
+        if not stream:
+            return {
+                "id": id,
+                "object": "chat.completion",
+                "created": created,
+                "model": deployment,
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": content},
+                    }
+                ],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            }
+
+        def chunk(delta: dict, finish_reason: str | None = None) -> str:
+            data = {
+                "id": id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": deployment,
+                "choices": [
+                    {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                ],
+            }
+            return f"data: {json.dumps(data)}\n\n"
+
+        async def chunks() -> AsyncGenerator[str, None]:
+            yield chunk({"role": "assistant", "content": ""})
+            for index, word in enumerate(content.split(" ")):
+                if index and settings.token_latency_ms:
+                    await asyncio.sleep(settings.token_latency_ms / 1000)
+                yield chunk({"content": word if index == 0 else f" {word}"})
+            yield chunk({}, finish_reason="stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    @app.post("/openai/deployments/{deployment}/embeddings")
+    async def embeddings(deployment: str, request: Request) -> Any:
+        body = await request.json()
+        stats["embeddings"] += 1
+        error = await inject()
+        if error:
+            return error
+
+        inputs = body.get("input", [])
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        texts = [item if isinstance(item, str) else json.dumps(item) for item in inputs]
+        tokens = sum(len(text) // 4 for text in texts)
+        vectors = [embedding(text, settings.embedding_dimensions) for text in texts]
+        if body.get("encoding_format") == "base64":
+            # Little-endian float32, as the service sends them.
+            vectors = [
+                base64.b64encode(array.array("f", vector).tobytes()).decode("ascii")
+                for vector in vectors
+            ]
+        return {
+            "object": "list",
+            "model": deployment,
+            "data": [
+                {"object": "embedding", "index": index, "embedding": vector}
+                for index, vector in enumerate(vectors)
+            ],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    @app.get("/stats", description="Requests served and errors injected")
+    async def get_stats() -> dict[str, int]:
+        return stats
+
+    return app
+
+
+def serve(app: FastAPI, host: str = "127.0.0.1", port: int = 0) -> str:
+    """
+    Serves the app from a daemon thread, on a free port unless one is given,
+    and returns its endpoint once it accepts connections.
+    """
+    if not port:
+        with socket.socket() as sock:
+            sock.bind((host, 0))
+            port = sock.getsockname()[1]
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, host=host, port=port, log_level="warning")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://{host}:{port}"
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(name)35s | %(message)s")
+
+    parser = argparse.ArgumentParser(
+        prog="node-engine-azure-openai-stand-in",
+        description="Local stand-in for Azure OpenAI chat completions and embeddings",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    defaults = StandInSettings()
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="host to bind")
+    parser.add_argument("--port", type=int, default=8010, help="port to bind")
+    parser.add_argument(
+        "--latency",
+        default=defaults.latency,
+        help="latency distribution: fixed:<ms>, uniform:<min>:<max>, normal:<mean>:<stddev> or lognormal:<median>:<sigma>",
+    )
+    parser.add_argument(
+        "--token-latency-ms",
+        type=float,
+        default=defaults.token_latency_ms,
+        help="delay between streamed chunks",
+    )
+    parser.add_argument(
+        "--completion-tokens",
+        type=int,
+        default=defaults.completion_tokens,
+        help="words in generated completions",
+    )
+    parser.add_argument(
+        "--responses",
+        help='JSON file with canned completions: [{"match": "...", "content": "..."}]',
+    )
+    parser.add_argument(
+        "--embedding-dimensions", type=int, default=defaults.embedding_dimensions
+    )
+    parser.add_argument(
+        "--error-rate-429",
+        type=float,
+        default=defaults.error_rate_429,
+        help="fraction of requests answered with 429",
+    )
+    parser.add_argument(
+        "--error-rate-500",
+        type=float,
+        default=defaults.error_rate_500,
+        help="fraction of requests answered with 500",
+    )
+    parser.add_argument(
+        "--timeout-rate",
+        type=float,
+        default=defaults.timeout_rate,
+        help="fraction of requests left hanging for --timeout-seconds",
+    )
+    parser.add_argument("--retry-after-ms", type=int, default=defaults.retry_after_ms)
+    parser.add_argument(
+        "--timeout-seconds", type=float, default=defaults.timeout_seconds
+    )
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    args = parser.parse_args()
+
+    responses = []
+    if args.responses:
+        with open(args.responses) as file:
+            responses = json.load(file)
+
+    settings = StandInSettings(
+        latency=args.latency,
+        token_latency_ms=args.token_latency_ms,
+        completion_tokens=args.completion_tokens,
+        responses=responses,
+        embedding_dimensions=args.embedding_dimensions,
+        error_rate_429=args.error_rate_429,
+        error_rate_500=args.error_rate_500,
+        timeout_rate=args.timeout_rate,
+        retry_after_ms=args.retry_after_ms,
+        timeout_seconds=args.timeout_seconds,
+        seed=args.seed,
+    )
+    app = create_app(settings)
+
+    logger.info(
+        "Use e.g. AZUREOPENAI_CHATCOMPLETION_GPT4=endpoint|http://%s:%s,key|any,deployment|gpt-4",
+        args.host,
+        args.port,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,16 @@
 # Copyright (c) Microsoft. All rights reserved.
 
 import urllib.parse
+from typing import Any
 
 import httpx
 import pydantic
 
+from node_engine.libs import deadline, tracing
+from node_engine.libs.serialization import WireFormat
 from node_engine.models.flow_definition import FlowDefinition
 from node_engine.models.flow_event import FlowEvent
+from node_engine.models.flow_job import FlowJob
 from node_engine.models.flow_status import FlowStatus
 from node_engine.models.flow_step import FlowStep
 
@@ -14,14 +18,34 @@ default_endpoint = "http://localhost:8000"
 invoke_path = "/invoke"
 invoke_component_path = "/invoke_component"
 emit_sse_message_path = "/emit_sse_message"
+jobs_path = "/jobs"
 
 
 # This is the client that will be used by the user to interact with the Node Engine.
 # New approach is to use the NodeEngineClient class to interact with the Node Engine.
 # Old approach is to use the invoke, invoke_component, and emit functions, but this is deprecated.
 class NodeEngineClient:
-    def __init__(self, service_endpoint: str = default_endpoint) -> None:
+    def __init__(
+        self,
+        service_endpoint: str = default_endpoint,
+        wire_format: WireFormat | None = None,
+    ) -> None:
         self.service_endpoint = service_endpoint
+        # Format used for /invoke and /invoke_component bodies, JSON by default.
+        self.wire_format = wire_format or WireFormat()
+
+    def _headers(self, headers: dict[str, str] | None = None) -> dict[str, str]:
+        return {
+            **self.wire_format.headers(),
+            **deadline.headers(),
+            **tracing.headers(),
+            **(headers or {}),
+        }
+
+    def _decode(self, response: httpx.Response) -> Any:
+        return self.wire_format.decode(
+            response.content, response.headers.get("content-type")
+        )
 
     def validate_url(self, url):
         parsed_url = urllib.parse.urlparse(url)
@@ -51,13 +75,17 @@ class NodeEngineClient:
 
             response = await client.post(
                 invoke_url,
-                json=flow_definition.model_dump(mode="json"),
-                headers=headers,
-                timeout=None,
+                content=self.wire_format.encode(
+                    flow_definition.model_dump(mode="json")
+                ),
+                headers=self._headers(headers),
+                timeout=deadline.remaining(),
             )
 
         try:
-            return_flow_definition = FlowDefinition.model_validate(response.json())
+            return_flow_definition = FlowDefinition.model_validate(
+                self._decode(response)
+            )
         except pydantic.ValidationError as e:
             error = f"{str(e)}. Response: {response}"
             return_flow_definition = FlowDefinition(
@@ -85,17 +113,57 @@ class NodeEngineClient:
 
             response = await client.post(
                 f"{invoke_component_url}?component_key={component_key}",
-                json=flow_definition.model_dump(),
-                headers=headers,
-                timeout=None,
+                content=self.wire_format.encode(
+                    flow_definition.model_dump(mode="json")
+                ),
+                headers=self._headers(headers),
+                timeout=deadline.remaining(),
             )
 
-        response_json = response.json()
+        response_json = self._decode(response)
         return FlowStep(
             flow_definition=FlowDefinition(**response_json["flow_definition"]),
             next=response_json["next"],
         )
 
+    async def submit_job(
+        self, flow_definition: FlowDefinition, tunnel_authorization: str | None = None
+    ) -> FlowJob:
+        """
+        Starts the flow as a job on the service and returns it without waiting
+        for the flow to complete. Poll with `get_job` or subscribe to "job"
+        events over SSE for progress.
+        """
+        self.validate_url(self.service_endpoint)
+        async with httpx.AsyncClient() as client:
+            headers = None
+            if tunnel_authorization is not None:
+                headers = {"X-Tunnel-Authorization": tunnel_authorization}
+
+            response = await client.post(
+                f"{self.service_endpoint}{jobs_path}",
+                content=self.wire_format.encode(
+                    flow_definition.model_dump(mode="json")
+                ),
+                headers=self._headers(headers),
+            )
+
+        response.raise_for_status()
+        return FlowJob.model_validate(self._decode(response))
+
+    async def get_job(self, job_id: str) -> FlowJob | None:
+        self.validate_url(self.service_endpoint)
+        async with httpx.AsyncClient() as client:
+            response = await client.get(
+                f"{self.service_endpoint}{jobs_path}/{urllib.parse.quote(job_id)}",
+                headers=self._headers(),
+            )
+
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return FlowJob.model_validate(self._decode(response))
+
     async def emit(
         self, event: FlowEvent, connection_id: str | None = None
     ) -> httpx.Response:
@@ -116,8 +184,12 @@ class NodeEngineClient:
 
 class RemoteExecutor:
 
-    def __init__(self, service_endpoint: str = default_endpoint) -> None:
-        self.client = NodeEngineClient(service_endpoint)
+    def __init__(
+        self,
+        service_endpoint: str = default_endpoint,
+        wire_format: WireFormat | None = None,
+    ) -> None:
+        self.client = NodeEngineClient(service_endpoint, wire_format)
 
     async def invoke(
         self, flow_definition: FlowDefinition, tunnel_authorization: str | None = None
@@ -134,5 +206,17 @@ class RemoteExecutor:
             flow_definition, component_key, tunnel_authorization
         )
 
+    async def invoke_background(
+        self,
+        flow_definition: FlowDefinition,
+        tunnel_authorization: str | None = None,
+        priority: int = 0,
+        coalesce_key: str | None = None,
+    ) -> str:
+        # The remote service runs the flow as a job; it has no notion of
+        # background priorities or coalescing.
+        job = await self.client.submit_job(flow_definition, tunnel_authorization)
+        return job.id
+
     async def emit(self, event: FlowEvent, connection_id: str | None = None) -> None:
         await self.client.emit(event, connection_id=connection_id)
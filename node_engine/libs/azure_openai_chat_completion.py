@@ -1,5 +1,6 @@
 # Copyright (c) Microsoft. All rights reserved.
 
+import time
 from typing import Dict, List, Literal, Optional, Union
 
 from openai import AsyncAzureOpenAI
@@ -12,11 +13,29 @@ from openai.types.chat import (
     completion_create_params,
 )
 
+from node_engine.libs import deadline, metrics
+from node_engine.libs.completion_cache import completion_cache
+from node_engine.libs.rate_limiter import estimate_tokens, get_limiter
+from node_engine.libs.single_flight import SingleFlight, request_key
+from node_engine.libs.telemetry import Telemetry
 from node_engine.libs.utility import load_azureopenai_config
 
 api_version_default = "2023-05-15"
 
 
+def request_timeout() -> dict:
+    """
+    Returns the client option bounding a request by the current deadline,
+    if any (see `deadline`).
+    """
+    remaining = deadline.remaining()
+    return {} if remaining is None else {"timeout": remaining}
+
+
+# Identical chat completion requests made concurrently share one API call.
+single_flight = SingleFlight()
+
+
 class AzureOpenAIChatCompletion:
     async def create(
         self,
@@ -44,13 +63,60 @@ class AzureOpenAIChatCompletion:
         tools: List[ChatCompletionToolParam] | None = None,
         top_p: Optional[float] | None = None,
         user: str | None = None,
+        cache_ttl: float | None = None,
+        telemetry: Telemetry | None = None,
+        raise_on_incomplete: bool = False,
     ) -> str:
+        """
+        Returns the content of a chat completion. With `cache_ttl` (seconds),
+        completions are cached by endpoint, deployment, messages and sampling
+        parameters and identical requests within the TTL are answered from
+        the cache. Cache hits, misses and saved latency are captured with
+        `telemetry` when provided. Concurrent identical requests share a
+        single API call, see `single_flight`. Unexpected and incomplete
+        responses are returned as a description, or raised as an exception
+        with `raise_on_incomplete`, for callers that must not take the
+        description for content.
+        """
         # read from config, for local dev read env if not in config
         service_dict = load_azureopenai_config(service)
         model = model or service_dict["deployment"]
         endpoint = endpoint or service_dict["endpoint"]
         api_key = api_key or service_dict["key"]
         api_version = api_version or api_version_default
+
+        sampling_params = {
+            "frequency_penalty": frequency_penalty,
+            "function_call": function_call,
+            "functions": functions,
+            "logit_bias": logit_bias,
+            "max_tokens": max_tokens,
+            "presence_penalty": presence_penalty,
+            "response_format": response_format,
+            "seed": seed,
+            "stop": stop,
+            "temperature": temperature,
+            "tool_choice": tool_choice,
+            "tools": tools,
+            "top_p": top_p,
+        }
+
+        cache_key = None
+        if cache_ttl and not stream and (n is None or n == 1):
+            cache_key = completion_cache.key(endpoint, model, messages, sampling_params)
+            cached = await completion_cache.get(cache_key)
+            if telemetry:
+                await telemetry.increment_key(
+                    "completion_cache_hit" if cached else "completion_cache_miss"
+                )
+            if cached:
+                if telemetry:
+                    await telemetry.capture_average(
+                        "completion_cache_saved_ms", cached["latency_ms"]
+                    )
+                return cached["value"]
+            start_time = time.perf_counter()
+
         client = AsyncAzureOpenAI(
             azure_endpoint=endpoint,
             azure_deployment=model,
@@ -63,15 +129,15 @@ class AzureOpenAIChatCompletion:
                 return NOT_GIVEN
             return value
 
-        try:
-            # bug: https://github.com/openai/openai-python/issues/779
-            # can't call with_options() on AsyncAzureOpenAI
-            # response = await self.client.with_options(
-            #    max_retries=max_retries,
-            # )
+        # Retries are handled by the deployment's limiter rather than the
+        # client, so they are rate limited and retry only the failed request.
+        limiter = get_limiter(endpoint, model, service_dict)
+        tokens = estimate_tokens(messages) + (max_tokens or 0)
+
+        async def create_completion():
+            start = time.perf_counter()
             response = await client.with_options(
-                max_retries=make_none_not_give(max_retries),
-                timeout=make_none_not_give(retry_delay_ms),
+                max_retries=0, **request_timeout()
             ).chat.completions.create(
                 messages=messages,
                 model=model,
@@ -92,14 +158,54 @@ class AzureOpenAIChatCompletion:
                 top_p=make_none_not_give(top_p),
                 user=make_none_not_give(user),
             )
+            metrics.observe_llm_request(
+                "chat_completion",
+                model,
+                time.perf_counter() - start,
+                getattr(response, "usage", None),
+            )
+            return response
+
+        try:
+            response = await single_flight.do(
+                request_key(
+                    endpoint=endpoint,
+                    deployment=model,
+                    api_version=api_version,
+                    messages=messages,
+                    params=sampling_params,
+                    n=n,
+                    stream=stream,
+                    user=user,
+                ),
+                lambda: limiter.call(
+                    create_completion,
+                    tokens=tokens,
+                    max_retries=max_retries,
+                    retry_delay_ms=retry_delay_ms,
+                ),
+            )
         except Exception as exception:
             raise Exception("Error creating chat completion.") from exception
 
+        error = None
         if not isinstance(response, ChatCompletion):
-            return f"unexpected response from Azure OpenAI chat completion: {response}"
-
-        choice = list(response.choices)[0]
-        if choice.finish_reason != "stop":
-            return f"incomplete response - reason: {choice.finish_reason}"
+            error = f"unexpected response from Azure OpenAI chat completion: {response}"
+        else:
+            choice = list(response.choices)[0]
+            if choice.finish_reason != "stop":
+                error = f"incomplete response - reason: {choice.finish_reason}"
+        if error:
+            if raise_on_incomplete:
+                raise Exception(error)
+            return error
 
-        return choice.message.content or ""
+        content = choice.message.content or ""
+        if cache_key and cache_ttl:
+            await completion_cache.set(
+                cache_key,
+                content,
+                cache_ttl,
+                latency_ms=(time.perf_counter() - start_time) * 1000,
+            )
+        return content
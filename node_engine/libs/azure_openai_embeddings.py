@@ -1,16 +1,23 @@
 # Copyright (c) Microsoft. All rights reserved.
 
-import asyncio
 import json
+import time
 from typing import Optional
 
-from openai import APIConnectionError, AsyncAzureOpenAI
+from openai import AsyncAzureOpenAI
 from openai.types import CreateEmbeddingResponse
 
+from node_engine.libs import metrics
+from node_engine.libs.azure_openai_chat_completion import request_timeout
+from node_engine.libs.rate_limiter import estimate_tokens, get_limiter
+from node_engine.libs.single_flight import SingleFlight, request_key
 from node_engine.libs.utility import load_azureopenai_config
 
 api_version_default = "2023-05-15"
 
+# Identical embedding requests made concurrently share one API call.
+single_flight = SingleFlight()
+
 
 class AzureOpenAIEmbeddings:
     async def create(
@@ -37,35 +44,43 @@ class AzureOpenAIEmbeddings:
             api_version=api_version,
         )
 
-        async def retry() -> list[list[float]]:
-            await asyncio.sleep(retry_delay_ms / 1000)
-            return await self.create(
-                input, azureopenai_env_var, max_retries - 1, retry_delay_ms * 2
-            )
+        # Retries are handled by the deployment's limiter rather than the
+        # client, so they are rate limited and retry only the failed item.
+        limiter = get_limiter(endpoint, model, config)
 
         # determine if text is a string or list of strings
         if isinstance(input, str):
             input = [input]
 
+        async def create_embedding(item: str) -> CreateEmbeddingResponse:
+            start = time.perf_counter()
+            response = await client.with_options(
+                max_retries=0, **request_timeout()
+            ).embeddings.create(model=model, input=item)
+            metrics.observe_llm_request(
+                "embeddings", model, time.perf_counter() - start, response.usage
+            )
+            return response
+
         values = []
         for item in input:
             if not isinstance(item, str):
                 item = json.dumps(item)
             try:
-                # bug: https://github.com/openai/openai-python/issues/779
-                # can't call with_options() on AsyncAzureOpenAI
-                # response = await self.client.with_options(
-                #    max_retries=max_retries,
-                # )
-                response = await client.embeddings.create(
-                    model=model,
-                    input=item,
+                response = await single_flight.do(
+                    request_key(
+                        endpoint=endpoint,
+                        deployment=model,
+                        api_version=api_version,
+                        input=item,
+                    ),
+                    lambda: limiter.call(
+                        lambda: create_embedding(item),
+                        tokens=estimate_tokens(item),
+                        max_retries=max_retries,
+                        retry_delay_ms=retry_delay_ms,
+                    ),
                 )
-            except APIConnectionError as exception:
-                if max_retries > 0:
-                    response = await retry()
-                else:
-                    raise Exception(f"Error creating chat completion: {exception}")
             except Exception as exception:
                 raise Exception(f"Error creating embeddings: {exception}")
 
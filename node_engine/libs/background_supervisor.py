@@ -0,0 +1,222 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from node_engine.libs import deadline
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BackgroundTask:
+    id: str
+    session_id: str
+    name: str
+    priority: int
+    run: Callable[[], Awaitable[Any]]
+    coalesce_key: str | None = None
+    # Number of later submissions with the same coalesce key merged into
+    # this task while it was queued.
+    coalesced: int = 0
+    created: float = field(default_factory=time.time)
+    started: float | None = None
+    task: asyncio.Task | None = None
+
+    def info(self) -> dict[str, Any]:
+        now = time.time()
+        started = self.started or now
+        return {
+            "id": self.id,
+            "session_id": self.session_id,
+            "name": self.name,
+            "priority": self.priority,
+            "coalesce_key": self.coalesce_key,
+            "coalesced": self.coalesced,
+            "status": "queued" if self.started is None else "running",
+            "queued_seconds": round(started - self.created, 3),
+            "running_seconds": round(now - started, 3),
+        }
+
+
+class BackgroundSupervisor:
+    """
+    Runs background work, such as sub-flows started by BackgroundProcess, on a
+    bounded pool of workers. Tasks wait in a priority queue (lower priority
+    values run first, then in submission order) until a worker is free and
+    their session is below its limit of running tasks. The supervisor holds a
+    reference to every task until it completes, and `shutdown` lets queued and
+    running tasks finish before cancelling what is left.
+
+    Tasks submitted with a `coalesce_key` are debounced: at most one task per
+    key runs and at most one waits in the queue. Submitting while a task with
+    the same key is queued replaces that task's work with the new one (the
+    latest input wins) instead of queueing another run.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_running_per_session: int = 1,
+        max_queued_per_session: int = 16,
+    ) -> None:
+        self.max_workers = max_workers
+        self.max_running_per_session = max_running_per_session
+        self.max_queued_per_session = max_queued_per_session
+        self.queue: list[tuple[int, int, BackgroundTask]] = []
+        self.running: dict[str, BackgroundTask] = {}
+        self.closed = False
+        self._counter = itertools.count()
+
+    def submit(
+        self,
+        session_id: str,
+        name: str,
+        run: Callable[[], Awaitable[Any]],
+        priority: int = 0,
+        coalesce_key: str | None = None,
+    ) -> BackgroundTask:
+        """
+        Queues `run` to be called and awaited by a worker. Returns the queued
+        task, which is an existing task when the submission was coalesced.
+        """
+        if self.closed:
+            raise Exception("background supervisor is shutting down")
+
+        if coalesce_key is not None:
+            for index, (_, count, pending) in enumerate(self.queue):
+                if pending.coalesce_key == coalesce_key:
+                    pending.run = run
+                    pending.name = name
+                    pending.coalesced += 1
+                    if priority < pending.priority:
+                        pending.priority = priority
+                        self.queue[index] = (priority, count, pending)
+                        heapq.heapify(self.queue)
+                    return pending
+
+        queued = sum(1 for *_, task in self.queue if task.session_id == session_id)
+        if queued >= self.max_queued_per_session:
+            raise Exception(
+                f"too many queued background tasks for session {session_id}"
+            )
+
+        task = BackgroundTask(
+            id=uuid.uuid4().hex,
+            session_id=session_id,
+            name=name,
+            priority=priority,
+            run=run,
+            coalesce_key=coalesce_key,
+        )
+        heapq.heappush(self.queue, (priority, next(self._counter), task))
+        self._dispatch()
+        return task
+
+    def cancel(self, task_id: str) -> bool:
+        """
+        Removes a queued task or cancels a running one. Returns False if the
+        task is unknown or already complete.
+        """
+        if task_id in self.running:
+            task = self.running[task_id]
+            if task.task:
+                task.task.cancel()
+            return True
+
+        for index, (*_, task) in enumerate(self.queue):
+            if task.id == task_id:
+                self.queue.pop(index)
+                heapq.heapify(self.queue)
+                return True
+        return False
+
+    def list(self) -> list[dict[str, Any]]:
+        """
+        Returns the running tasks followed by the queued tasks in the order
+        they will run.
+        """
+        return [task.info() for task in self.running.values()] + [
+            task.info() for *_, task in sorted(self.queue)
+        ]
+
+    async def shutdown(self, timeout: float = 30) -> None:
+        """
+        Stops accepting tasks and waits up to `timeout` seconds for queued and
+        running tasks to complete, then cancels the remaining ones.
+        """
+        self.closed = True
+        try:
+            async with asyncio.timeout(timeout):
+                while self.running:
+                    await asyncio.wait(
+                        [task.task for task in self.running.values() if task.task],
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+        except TimeoutError:
+            pass
+
+        if self.queue or self.running:
+            logger.warning(
+                "Cancelling %d queued and %d running background tasks",
+                len(self.queue),
+                len(self.running),
+            )
+        self.queue.clear()
+        tasks = [task.task for task in self.running.values() if task.task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _running_for(self, session_id: str) -> int:
+        return sum(1 for task in self.running.values() if task.session_id == session_id)
+
+    def _blocked(self, task: BackgroundTask) -> bool:
+        if self._running_for(task.session_id) >= self.max_running_per_session:
+            return True
+        return task.coalesce_key is not None and any(
+            running.coalesce_key == task.coalesce_key
+            for running in self.running.values()
+        )
+
+    def _dispatch(self) -> None:
+        # Start the highest priority tasks whose session is below its limit
+        # and that don't share a coalesce key with a running task, keeping
+        # the others queued in order.
+        deferred = []
+        while self.queue and len(self.running) < self.max_workers:
+            entry = heapq.heappop(self.queue)
+            task = entry[2]
+            if self._blocked(task):
+                deferred.append(entry)
+                continue
+            task.started = time.time()
+            # Background flows outlive the flow that started them, and its
+            # deadline.
+            with deadline.detached():
+                task.task = asyncio.create_task(self._run(task))
+            self.running[task.id] = task
+        for entry in deferred:
+            heapq.heappush(self.queue, entry)
+
+    async def _run(self, task: BackgroundTask) -> None:
+        try:
+            await task.run()
+        except asyncio.CancelledError:
+            logger.info(
+                "Background task cancelled; id: %s, name: %s", task.id, task.name
+            )
+            raise
+        except Exception:
+            logger.exception(
+                "Background task failed; id: %s, name: %s", task.id, task.name
+            )
+        finally:
+            self.running.pop(task.id, None)
+            self._dispatch()
@@ -0,0 +1,140 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import logging
+import time
+from collections import OrderedDict
+from typing import Any
+
+from node_engine.libs.single_flight import request_key
+from node_engine.libs.storage import Storage
+
+# Storage session under which cached completions are kept, one file per entry.
+completion_cache_storage_session_id = "_completion_cache"
+
+logger = logging.getLogger(__name__)
+
+
+class CompletionCache:
+    """
+    Two tier cache for chat completions: an in-memory LRU in front of entries
+    persisted to Storage, so cached completions survive service restarts.
+    Entries expire after the TTL they were stored with. Once more than
+    `max_stored_entries` are persisted, expired entries are removed from
+    Storage along with those expiring soonest, down to three quarters of the
+    limit so sweeps are rare.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_stored_entries: int = 8192) -> None:
+        self.max_entries = max_entries
+        self.max_stored_entries = max_stored_entries
+        self.entries: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        # Entries persisted to Storage, counted when first needed, and
+        # possibly over-counted since overwrites are counted too.
+        self.stored_entries: int | None = None
+        self.pruning = False
+        self.hits = 0
+        self.misses = 0
+        self.saved_latency_ms = 0.0
+
+    @staticmethod
+    def key(
+        endpoint: str, deployment: str, messages: Any, params: dict[str, Any]
+    ) -> str:
+        """
+        Returns the cache key for a request, a hash of the service endpoint,
+        deployment, messages and sampling parameters.
+        """
+        return request_key(
+            endpoint=endpoint,
+            deployment=deployment,
+            messages=messages,
+            params={key: value for key, value in params.items() if value is not None},
+        )
+
+    async def get(self, key: str) -> dict[str, Any] | None:
+        """
+        Returns the cached entry ({"value", "expires", "latency_ms"}) for the
+        key, or None, counting hits and misses.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            try:
+                entry = await Storage.get(completion_cache_storage_session_id, key)
+            except Exception as exception:
+                logger.warning("Unable to read cached completion: %s", exception)
+            if entry is not None:
+                self._remember(key, entry)
+
+        if entry is not None and entry["expires"] <= time.time():
+            await self._forget(key)
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        self.saved_latency_ms += entry["latency_ms"]
+        return entry
+
+    async def set(self, key: str, value: str, ttl: float, latency_ms: float) -> None:
+        entry = {"value": value, "expires": time.time() + ttl, "latency_ms": latency_ms}
+        self._remember(key, entry)
+        if self.stored_entries is None:
+            self.stored_entries = len(
+                await Storage.keys(completion_cache_storage_session_id)
+            )
+        await Storage.set(completion_cache_storage_session_id, key, entry)
+        self.stored_entries += 1
+        if self.stored_entries > self.max_stored_entries and not self.pruning:
+            self.pruning = True
+            try:
+                await self._prune()
+            finally:
+                self.pruning = False
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "stored_entries": self.stored_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "saved_latency_ms": self.saved_latency_ms,
+        }
+
+    async def _prune(self) -> None:
+        now = time.time()
+        entries = []
+        for key in await Storage.keys(completion_cache_storage_session_id):
+            try:
+                entry = await Storage.get(completion_cache_storage_session_id, key)
+            except Exception:
+                # Unreadable entries are removed along with expired ones.
+                entry = None
+            if entry is None or entry["expires"] <= now:
+                await self._forget(key)
+            else:
+                entries.append((entry["expires"], key))
+
+        entries.sort()
+        excess = len(entries) - self.max_stored_entries * 3 // 4
+        for _, key in entries[: max(0, excess)]:
+            await self._forget(key)
+        self.stored_entries = len(entries) - max(0, excess)
+
+    async def _forget(self, key: str) -> None:
+        self.entries.pop(key, None)
+        await Storage.delete(completion_cache_storage_session_id, key)
+
+    def _remember(self, key: str, entry: dict[str, Any]) -> None:
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+# Shared by all chat completion calls in the process.
+completion_cache = CompletionCache()
@@ -1,6 +1,7 @@
 # Copyright (c) Microsoft. All rights reserved.
 
 import importlib.util
+from types import ModuleType
 
 from node_engine.libs.component_loaders.component_loader import ComponentLoader
 from node_engine.libs.node_engine_component import NodeEngineComponent
@@ -18,6 +19,17 @@ class CodeComponentLoader:
         executor: FlowExecutor,
         tunnel_authorization: str | None = None,
     ) -> NodeEngineComponent:
+        return ComponentLoader.load(
+            flow_definition,
+            component_key,
+            CodeComponentLoader.compile(code),
+            class_name,
+            executor,
+            tunnel_authorization,
+        )
+
+    @staticmethod
+    def compile(code: str) -> ModuleType:
         # convert code to module
         spec = importlib.util.spec_from_loader("helper", loader=None)
         if spec is None:
@@ -26,12 +38,4 @@ class CodeComponentLoader:
         if module is None:
             raise Exception("Could not load module from spec")
         exec(code, module.__dict__)
-
-        return ComponentLoader.load(
-            flow_definition,
-            component_key,
-            module,
-            class_name,
-            executor,
-            tunnel_authorization,
-        )
+        return module
@@ -2,6 +2,7 @@
 
 from node_engine.libs.endpoint_runner import EndpointRunner
 from node_engine.libs.node_engine_component import NodeEngineComponent
+from node_engine.libs.serialization import WireFormat
 from node_engine.models.flow_definition import FlowDefinition
 
 
@@ -14,6 +15,8 @@ class EndpointComponentLoader:
         component_name: str,
         class_name: str,
         tunnel_authorization: str | None = None,
+        reads_from: dict | None = None,
+        wire_format: WireFormat | None = None,
     ) -> NodeEngineComponent:
         component = EndpointRunner(
             flow_definition,
@@ -22,6 +25,8 @@ class EndpointComponentLoader:
             component_name,
             class_name,
             tunnel_authorization,
+            reads_from=reads_from,
+            wire_format=wire_format,
         )
 
         return component
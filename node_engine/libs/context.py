@@ -1,5 +1,6 @@
 # Copyright (c) Microsoft. All rights reserved.
 
+import copy
 import json
 from typing import Any
 
@@ -7,12 +8,42 @@ from node_engine.models.flow_definition import FlowDefinition
 
 
 class Context:
-    def __init__(self, flow_definition: FlowDefinition, log=None) -> None:
+    def __init__(
+        self, flow_definition: FlowDefinition, log=None, track_changes=False
+    ) -> None:
         self.flow_definition = flow_definition
         self.log = log
+        self.track_changes = track_changes
+
+        # Keys read through this context, and the original (shared) values of
+        # mutable entries that were copied on first access. Only populated
+        # when tracking is enabled, which components do for their own context.
+        self.reads: set[str] = set()
+        self._copied: dict[str, Any] = {}
+        self._snapshot: dict[str, Any] = (
+            dict(flow_definition.context) if track_changes else {}
+        )
 
     def get(self, key, default=None) -> Any:
-        return self.flow_definition.context.get(key, default)
+        if not self.track_changes:
+            return self.flow_definition.context.get(key, default)
+
+        self.reads.add(key)
+        if key not in self.flow_definition.context:
+            return default
+
+        value = self.flow_definition.context[key]
+        if key in self._copied or not isinstance(value, (dict, list)):
+            return value
+
+        # Copy-on-write: the first time a mutable value is handed out, replace
+        # it with a shallow copy so in-place changes made by the component do
+        # not leak into structure shared with a parent flow or earlier steps.
+        # Nested items stay shared until they are replaced themselves.
+        self._copied[key] = value
+        value = copy.copy(value)
+        self.flow_definition.context[key] = value
+        return value
 
     def delete(self, key) -> None:
         if key in self.flow_definition.context:
@@ -22,6 +53,8 @@ class Context:
         self.flow_definition.context[key] = value
 
     def has_key(self, key) -> bool:
+        if self.track_changes:
+            self.reads.add(key)
         return key in self.flow_definition.context
 
     def validate_presence_of(self, key) -> bool:
@@ -33,3 +66,82 @@ class Context:
 
     def json(self) -> str:
         return json.dumps(self.flow_definition.context, indent=2)
+
+    def fork(self, overrides: dict | None = None) -> dict:
+        """
+        Returns a new context dict for a sub-flow. Values are shared with this
+        context rather than copied; components in the sub-flow copy a value
+        only when they access it (see `get`).
+        """
+        return {**self.flow_definition.context, **(overrides or {})}
+
+    def written_keys(
+        self, context: dict | None = None, compare_values: bool = False
+    ) -> list[str]:
+        """
+        Returns the keys that were added, replaced, changed in place (one
+        level deep) or deleted since this context was created. Pass `context`
+        to compare against a replacement context dict, e.g. one returned by a
+        remote component. With `compare_values`, replaced values that are
+        equal to the original are not reported.
+        """
+        if not self.track_changes:
+            raise Exception("change tracking is not enabled for this context")
+
+        current = self.flow_definition.context if context is None else context
+        before = self._snapshot
+
+        written = set(before.keys() ^ current.keys())
+        for key in before.keys() & current.keys():
+            value = current[key]
+            original = before[key]
+            if value is original:
+                continue
+            if self._copied.get(key) is original and not _shallow_changed(
+                original, value
+            ):
+                continue
+            if compare_values and value == original:
+                continue
+            written.add(key)
+        return sorted(written)
+
+    def delta(
+        self, context: dict | None = None, compare_values: bool = False
+    ) -> dict[str, Any]:
+        """
+        Returns the changes made since this context was created as
+        {"set": {key: value}, "delete": [key]}. Apply with `apply_delta`.
+        """
+        current = self.flow_definition.context if context is None else context
+        delta: dict[str, Any] = {"set": {}, "delete": []}
+        for key in self.written_keys(current, compare_values):
+            if key in current:
+                delta["set"][key] = current[key]
+            else:
+                delta["delete"].append(key)
+        return delta
+
+
+def apply_delta(context: dict, delta: dict[str, Any]) -> dict:
+    """
+    Applies a delta produced by `Context.delta` to a context dict in place.
+    """
+    context.update(delta.get("set") or {})
+    for key in delta.get("delete") or []:
+        context.pop(key, None)
+    return context
+
+
+def _shallow_changed(original: Any, value: Any) -> bool:
+    # Compare a copied value with the value it was copied from by identity of
+    # its items, which is enough to detect appends, removals and replacements
+    # without walking nested structure.
+    if type(original) is not type(value) or len(original) != len(value):
+        return True
+    if isinstance(value, dict):
+        return any(
+            key not in original or original[key] is not item
+            for key, item in value.items()
+        )
+    return any(a is not b for a, b in zip(original, value))
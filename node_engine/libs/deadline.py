@@ -0,0 +1,84 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import contextlib
+import time
+from contextvars import ContextVar
+from typing import Iterator, Mapping
+
+# Header carrying the time left for an invocation, in milliseconds. The time
+# left rather than the deadline itself is sent, so clocks don't need to agree.
+timeout_header = "X-Timeout-Ms"
+
+# Deadline of the current invocation, as a time.monotonic() value.
+_deadline: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+
+def remaining() -> float | None:
+    """
+    Returns the seconds left before the current deadline (not below zero),
+    or None if there is no deadline.
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+@contextlib.contextmanager
+def scope(timeout: float | None) -> Iterator[None]:
+    """
+    Sets the deadline to `timeout` seconds from now for the code run within
+    the context, including tasks it starts. An earlier deadline already set
+    is kept, so nested scopes can only shorten it.
+    """
+    if timeout is None:
+        yield
+        return
+    deadline = time.monotonic() + timeout
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextlib.contextmanager
+def detached() -> Iterator[None]:
+    """
+    Clears the deadline for work that outlives the invocation starting it,
+    such as background flows and jobs.
+    """
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def headers() -> dict[str, str]:
+    """
+    Returns the header propagating the current deadline to a service.
+    """
+    left = remaining()
+    if left is None:
+        return {}
+    return {timeout_header: str(int(left * 1000))}
+
+
+def from_headers(headers: Mapping[str, str]) -> float | None:
+    """
+    Returns the timeout in seconds sent by a caller, or None.
+    """
+    value = headers.get(timeout_header)
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value) / 1000)
+    except ValueError:
+        return None
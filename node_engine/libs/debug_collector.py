@@ -1,12 +1,37 @@
 # Copyright (c) Microsoft. All rights reserved.
 
+import inspect
 import json
 import re
-from typing import Any
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
 
 from node_engine.libs.debug_inspector import DebugInspector
 from node_engine.models.flow_definition import FlowDefinition
 
+# Config keys holding service connection strings, left out of debug output.
+service_key_pattern = re.compile(r"(\w+\_)?service")
+
+num_log_messages = 4
+
+# Most recent error references kept for `materialize`.
+max_references = 256
+
+
+@dataclass
+class DebugReference:
+    # Kept for many errors at once, so it doesn't reference the component
+    # itself, which holds the live flow definition.
+    message: str
+    flow_definition: FlowDefinition
+    component_class: type | None
+    component_source: Callable[[], str | Awaitable[str]] | None
+
+
+_references: OrderedDict[str, DebugReference] = OrderedDict()
+
 
 def collect(
     message: str,
@@ -38,16 +63,12 @@ def collect(
         return obj
 
     flow_string = json.dumps(
-        [
-            strip_key(c.model_dump(), re.compile(r"(\w+\_)?service"))
-            for c in debug_inspector.flow
-        ],
+        [strip_key(c.model_dump(), service_key_pattern) for c in debug_inspector.flow],
         indent=2,
     )
 
     context_string = debug_inspector.context.json()
 
-    num_log_messages = 4
     context_log_string = json.dumps(
         [log_item.model_dump() for log_item in debug_inspector.log(num_log_messages)],
         indent=2,
@@ -73,3 +94,76 @@ def collect(
         "log": context_log_string,
     }
     return info
+
+
+def reference(
+    message: str,
+    flow_definition: FlowDefinition,
+    component: Any | None = None,
+) -> dict[str, Any]:
+    """
+    Returns the debug information for an error exit. Rather than collecting
+    it, which serializes the flow and context and reads the component's
+    source, the state needed to collect it is kept and a reference to it is
+    returned, for `materialize` to collect on request. Components with
+    `include_debug` in their config get the full information right away.
+    """
+    if component is not None and component.config.get("include_debug"):
+        source = component._source_code
+        return collect(
+            message=message,
+            flow_definition=flow_definition,
+            component_info=component.__class__.get_info(),
+            # Remote source can't be fetched here, see `materialize`.
+            component_source=(
+                None if inspect.iscoroutinefunction(source) else source()
+            ),
+        )
+
+    # Shallow copies, so later changes to the flow don't show up.
+    status = flow_definition.status
+    snapshot = flow_definition.model_copy(
+        update={
+            "context": dict(flow_definition.context),
+            "status": status.model_copy(update={"log": status.log[-num_log_messages:]}),
+        }
+    )
+    debug_id = uuid.uuid4().hex
+    _references[debug_id] = DebugReference(
+        message=message,
+        flow_definition=snapshot,
+        component_class=component.__class__ if component is not None else None,
+        component_source=(
+            component._source_loader(snapshot) if component is not None else None
+        ),
+    )
+    while len(_references) > max_references:
+        _references.popitem(last=False)
+    return {"debug_id": debug_id}
+
+
+async def materialize(debug_id: str) -> dict[str, Any] | None:
+    """
+    Collects the debug information of an error returned by `reference`, or
+    returns None if it is unknown or no longer kept.
+    """
+    debug_reference = _references.get(debug_id)
+    if debug_reference is None:
+        return None
+
+    component_source = None
+    if debug_reference.component_source is not None:
+        try:
+            component_source = debug_reference.component_source()
+            if inspect.isawaitable(component_source):
+                component_source = await component_source
+        except Exception:
+            component_source = None
+
+    component_class = debug_reference.component_class
+    return collect(
+        message=debug_reference.message,
+        flow_definition=debug_reference.flow_definition,
+        component_info=component_class.get_info() if component_class else {},
+        component_source=component_source,
+    )
@@ -1,14 +1,32 @@
 # Copyright (c) Microsoft. All rights reserved.
 
+import functools
+from typing import Any, Awaitable, Callable
 from urllib.parse import urlencode, urljoin, urlparse
 
 import httpx
 from node_engine.client import RemoteExecutor
 
+from node_engine.libs import deadline, tracing
+from node_engine.libs.context import apply_delta
+from node_engine.libs.serialization import WireFormat
+from node_engine.libs.utility import declared_context_keys
+from node_engine.models.component_invocation import (
+    ComponentInvocation,
+    ComponentInvocationResult,
+)
+from node_engine.models.flow_component import FlowComponent
 from node_engine.models.flow_definition import FlowDefinition
 from node_engine.libs.node_engine_component import NodeEngineComponent
 from node_engine.models.flow_step import FlowStep
 
+# Context keys sent to remote components regardless of their declared reads,
+# since the remote runtime itself depends on them.
+runtime_context_keys = ["stream_log"]
+
+# Source of remote components, by endpoint, component name and class name.
+_source_cache: dict[tuple[str, str, str], str] = {}
+
 
 class EndpointRunner(NodeEngineComponent):
     def __init__(
@@ -19,14 +37,26 @@ class EndpointRunner(NodeEngineComponent):
         component_name,
         class_name,
         tunnel_authorization=None,
+        reads_from=None,
+        wire_format: WireFormat | None = None,
     ) -> None:
-        super().__init__(flow_definition, config, executor=RemoteExecutor(endpoint))
+        super().__init__(
+            flow_definition,
+            config,
+            executor=RemoteExecutor(endpoint, wire_format),
+        )
         self.endpoint = endpoint
         self.component_name = component_name
         self.class_name = class_name
         self.tunnel_authorization = tunnel_authorization
+        # Context keys the remote component reads, as declared in its
+        # registration. None means the component doesn't declare them and
+        # the full flow definition is exchanged instead.
+        self.context_keys = declared_context_keys(reads_from)
+        self.wire_format = wire_format or WireFormat()
 
-    def validate_url(self, url):
+    @staticmethod
+    def validate_url(url):
         parsed_url = urlparse(url)
 
         # Check if the hostname or IP address is valid. Note: we trust "localhost" for simplicity
@@ -41,16 +71,28 @@ class EndpointRunner(NodeEngineComponent):
                 "Invalid URL scheme. HTTPS is required for non-local IP addresses."
             )
 
+    def _headers(self) -> dict[str, str]:
+        headers = {
+            **self.wire_format.headers(),
+            **deadline.headers(),
+            **tracing.headers(),
+        }
+        if self.tunnel_authorization:
+            headers["X-Tunnel-Authorization"] = f"tunnel {self.tunnel_authorization}"
+        return headers
+
+    def _decode(self, response: httpx.Response) -> Any:
+        return self.wire_format.decode(
+            response.content, response.headers.get("content-type")
+        )
+
     async def execute(self) -> FlowStep:
         # Run component from a remote endpoint.
+        if self.context_keys is not None:
+            return await self._execute_delta()
 
         async with httpx.AsyncClient() as client:
-            if self.tunnel_authorization:
-                headers = {
-                    "X-Tunnel-Authorization": f"tunnel {self.tunnel_authorization}"
-                }
-            else:
-                headers = None
+            headers = self._headers()
 
             uri = (
                 urljoin(self.endpoint, "/invoke_component")
@@ -67,9 +109,11 @@ class EndpointRunner(NodeEngineComponent):
             self.validate_url(uri)
             response = await client.post(
                 uri,
-                json=self.flow_definition.model_dump(),
+                content=self.wire_format.encode(
+                    self.flow_definition.model_dump(mode="json")
+                ),
                 headers=headers,
-                timeout=None,
+                timeout=deadline.remaining(),
             )
 
         if response.status_code != 200:
@@ -77,30 +121,46 @@ class EndpointRunner(NodeEngineComponent):
                 f"Error in '{self.component_key}': {response.status_code} {response.reason_phrase} {response.text}"
             )
 
-        data = response.json()
+        data = self._decode(response)
         updated_flow_definition = FlowDefinition(**data["flow_definition"])
         next = data["next"]
 
         return self.continue_flow(next, updated_flow_definition)
 
-    async def _source_code(self) -> str:
-        async with httpx.AsyncClient() as client:
-            if self.tunnel_authorization:
-                headers = {
-                    "X-Tunnel-Authorization": f"tunnel {self.tunnel_authorization}"
-                }
-            else:
-                headers = None
+    async def _execute_delta(self) -> FlowStep:
+        # Send only this component's (template-evaluated) config and the
+        # context keys it reads, and merge the returned changes back into
+        # the local flow definition. The invoked component is named as the
+        # remote registry knows it.
+        context = self.flow_definition.context
+        keys = set(self.context_keys or []) | set(runtime_context_keys)
+        invocation = ComponentInvocation(
+            key=self.flow_definition.key,
+            session_id=self.flow_definition.session_id,
+            component_key=self.component_key,
+            flow=[
+                (
+                    FlowComponent(
+                        key=component.key,
+                        name=self.component_name,
+                        config=self.config.config,
+                    )
+                    if component.key == self.component_key
+                    else FlowComponent(key=component.key, name=component.name)
+                )
+                for component in self.flow_definition.flow
+            ],
+            context={key: context[key] for key in keys if key in context},
+        )
 
+        async with httpx.AsyncClient() as client:
             uri = (
-                urljoin(self.endpoint, "/get_component_source")
+                urljoin(self.endpoint, "/invoke_component_delta")
                 + "?"
                 + urlencode(
                     {
                         "component_name": self.component_name,
                         "class_name": self.class_name,
-                        "component_key": self.component_key,
-                        "with_line_numbers": True,
                     }
                 )
             )
@@ -108,12 +168,93 @@ class EndpointRunner(NodeEngineComponent):
             self.validate_url(uri)
             response = await client.post(
                 uri,
-                json=self.flow_definition.model_dump(),
-                headers=headers,
-                timeout=None,
+                content=self.wire_format.encode(invocation.model_dump(mode="json")),
+                headers=self._headers(),
+                timeout=deadline.remaining(),
             )
 
         if response.status_code != 200:
-            return ""
+            return self.exit_flow_with_error(
+                f"Error in '{self.component_key}': {response.status_code} {response.reason_phrase} {response.text}"
+            )
+
+        result = ComponentInvocationResult.model_validate(self._decode(response))
+
+        apply_delta(context, result.context_delta)
+        self.status.log.extend(result.status.log)
+        self.status.trace.extend(result.status.trace)
+        if result.status.error:
+            self.status.error = result.status.error
+
+        return self.continue_flow(result.next)
+
+    async def _source_code(self) -> str:
+        return await fetch_source(
+            self.endpoint,
+            self.component_name,
+            self.class_name,
+            self.component_key,
+            self.flow_definition,
+            self.tunnel_authorization,
+        )
+
+    def _source_loader(
+        self, flow_definition: FlowDefinition
+    ) -> Callable[[], Awaitable[str]]:
+        return functools.partial(
+            fetch_source,
+            self.endpoint,
+            self.component_name,
+            self.class_name,
+            self.component_key,
+            flow_definition,
+            self.tunnel_authorization,
+        )
+
+
+async def fetch_source(
+    endpoint: str,
+    component_name: str,
+    class_name: str,
+    component_key: str,
+    flow_definition: FlowDefinition,
+    tunnel_authorization: str | None = None,
+) -> str:
+    """
+    Returns the source of a remote component, fetched from its endpoint.
+    """
+    cache_key = (endpoint, component_name, class_name)
+    if cache_key in _source_cache:
+        return _source_cache[cache_key]
+
+    async with httpx.AsyncClient() as client:
+        headers = {**deadline.headers(), **tracing.headers()}
+        if tunnel_authorization:
+            headers["X-Tunnel-Authorization"] = f"tunnel {tunnel_authorization}"
+
+        uri = (
+            urljoin(endpoint, "/get_component_source")
+            + "?"
+            + urlencode(
+                {
+                    "component_name": component_name,
+                    "class_name": class_name,
+                    "component_key": component_key,
+                    "with_line_numbers": True,
+                }
+            )
+        )
+
+        EndpointRunner.validate_url(uri)
+        response = await client.post(
+            uri,
+            json=flow_definition.model_dump(),
+            headers=headers,
+            timeout=deadline.remaining(),
+        )
+
+    if response.status_code != 200:
+        return ""
 
-        return response.text
+    _source_cache[cache_key] = response.text
+    return response.text
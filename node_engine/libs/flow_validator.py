@@ -0,0 +1,149 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+from node_engine.libs.registry import Registry
+from node_engine.models.flow_component import FlowComponent
+from node_engine.models.flow_definition import FlowDefinition
+from node_engine.models.flow_validation import FlowValidation
+
+# Config options of components that count or limit their runs, such as Repeat
+# and NextComponent, which end a loop by continuing elsewhere or exiting with
+# an error.
+limit_config_keys = ("limit", "times")
+
+
+def successors(
+    flow: list[FlowComponent], index: int
+) -> tuple[list[str], list[str] | None]:
+    """
+    Returns the keys the component at `index` likely continues to,
+    including "exit", and the `next`/`outputs` targets set in its config, or
+    None for targets that are templates resolved at runtime. A component with
+    `outputs` continues to one of them, one with `next` continues to it (or
+    also leaves it, to the following component or "exit", if it limits its
+    runs), others to the following component. This is inferred from config,
+    since components don't declare how they route, so it only backs
+    warnings.
+    """
+    component = flow[index]
+    targets = []
+    next = component.config.get("next")
+    if isinstance(next, str):
+        targets.append(next)
+    outputs = component.config.get("outputs")
+    if isinstance(outputs, dict):
+        targets.extend(target for target in outputs.values() if isinstance(target, str))
+    if any("{{" in target for target in targets):
+        return [], None
+
+    following = flow[index + 1].key if index + 1 < len(flow) else "exit"
+    if not targets:
+        return [following], targets
+    if any(key in component.config for key in limit_config_keys):
+        return [*targets, following, "exit"], targets
+    return targets, targets
+
+
+def validate(flow_definition: FlowDefinition, registry: Registry) -> FlowValidation:
+    """
+    Checks a flow without running it, using the component metadata index of
+    the registry: that its components are registered and load, have the
+    config their `reads_from` declares required and continue to components
+    of the flow. Components that seem unreachable from the first component
+    and loops the flow seems unable to exit, since no component in them
+    branches or limits its runs, are warnings: routing is inferred from
+    config (see `successors`), and components may route otherwise.
+    Reachability is not checked for flows with templated targets.
+    """
+    errors: list[str] = []
+    warnings: list[str] = []
+    flow = flow_definition.flow
+    if not flow:
+        return FlowValidation(valid=False, errors=["No components found in flow"])
+
+    keys = set()
+    for component in flow:
+        if component.key in keys:
+            errors.append(f"{component.key}: duplicate component key")
+        keys.add(component.key)
+
+    edges: dict[str, list[str]] = {}
+    dynamic = False
+    for index, component in enumerate(flow):
+        info = registry.component_info(component.name)
+        if info is None:
+            errors.append(f"{component.key}: component not found: {component.name}")
+        elif info["error"]:
+            errors.append(
+                f"{component.key}: error loading component: [{component.name}] {info['error']}"
+            )
+        else:
+            errors.extend(
+                f"{component.key}: missing required config: {name}"
+                for name in required_config(info)
+                if name not in component.config
+                and name not in (info["default_config"] or {})
+            )
+
+        following, targets = successors(flow, index)
+        if targets is None:
+            dynamic = True
+            continue
+        errors.extend(
+            f"{component.key}: next component not found: {target}"
+            for target in targets
+            if target != "exit" and target not in keys
+        )
+        # Unknown targets end the flow with an error, reported above.
+        edges.setdefault(
+            component.key,
+            [key if key in keys else "exit" for key in following],
+        )
+
+    if dynamic:
+        return FlowValidation(valid=not errors, errors=errors, warnings=warnings)
+
+    # Components reachable from the first one.
+    reachable = {flow[0].key}
+    pending = [flow[0].key]
+    while pending:
+        for key in edges.get(pending.pop(), []):
+            if key not in reachable and key in edges:
+                reachable.add(key)
+                pending.append(key)
+    warnings.extend(
+        f"{key}: component is unreachable" for key in edges if key not in reachable
+    )
+
+    # Components the flow can exit from.
+    exits = {"exit"}
+    changed = True
+    while changed:
+        changed = False
+        for key, following in edges.items():
+            if key not in exits and any(target in exits for target in following):
+                exits.add(key)
+                changed = True
+    looping = [key for key in edges if key in reachable and key not in exits]
+    if looping:
+        warnings.append(
+            f"possible unbounded loop, no component in it branches or limits"
+            f" its runs: {', '.join(looping)}"
+        )
+
+    return FlowValidation(valid=not errors, errors=errors, warnings=warnings)
+
+
+def required_config(info: dict) -> list[str]:
+    """
+    Returns the config options a component's `reads_from` declares required.
+    """
+    reads_from = info.get("reads_from")
+    if not isinstance(reads_from, dict) or not isinstance(
+        reads_from.get("config"), dict
+    ):
+        return []
+    return [
+        name
+        for name, declaration in reads_from["config"].items()
+        if isinstance(declaration, dict) and declaration.get("required") is True
+    ]
@@ -0,0 +1,151 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import asyncio
+import json
+import logging
+import time
+import traceback
+import uuid
+
+from node_engine.libs import deadline
+from node_engine.libs.runtime import Runtime
+from node_engine.libs.storage import Storage
+from node_engine.models.flow_definition import FlowDefinition
+from node_engine.models.flow_event import FlowEvent
+from node_engine.models.flow_job import FlowJob, JobStatusEnum
+
+# Storage session under which job checkpoints are kept, one file per job.
+jobs_storage_session_id = "_jobs"
+
+job_event = "job"
+
+logger = logging.getLogger(__name__)
+
+
+class JobManager:
+    """
+    Runs flows as background jobs. Each job is checkpointed to Storage after
+    every step, so jobs interrupted by a service restart can be resumed from
+    the component they were about to run (see `resume`). That component runs
+    again from the start, so components should tolerate being re-run.
+    """
+
+    def __init__(self, runtime: Runtime) -> None:
+        self.runtime = runtime
+        # Strong references to running jobs, so they are not garbage collected.
+        self.tasks: dict[str, asyncio.Task] = {}
+
+    async def submit(
+        self, flow_definition: FlowDefinition, tunnel_authorization: str | None = None
+    ) -> FlowJob:
+        """
+        Checkpoints a new job for the flow and starts running it.
+        """
+        if not flow_definition.flow or len(flow_definition.flow) == 0:
+            raise Exception("No components found in flow")
+
+        job = FlowJob(
+            id=uuid.uuid4().hex,
+            flow_definition=flow_definition,
+            next=flow_definition.flow[0].key,
+        )
+        await self.save(job)
+        self.start(job, tunnel_authorization)
+        return job
+
+    async def get(self, job_id: str) -> FlowJob | None:
+        # Job ids are used as storage file names, don't allow paths.
+        if not job_id.isalnum():
+            return None
+        data = await Storage.get(jobs_storage_session_id, job_id)
+        if data is None:
+            return None
+        return FlowJob.model_validate(data)
+
+    async def save(self, job: FlowJob) -> None:
+        job.updated = time.time()
+        await Storage.set(jobs_storage_session_id, job.id, job.model_dump(mode="json"))
+
+    async def resume(self) -> list[str]:
+        """
+        Restarts queued or running jobs from their last checkpoint, e.g. after
+        a service restart. Returns the ids of resumed jobs. The tunnel
+        authorization of the original request is not stored, so resumed jobs
+        run without it.
+        """
+        resumed = []
+        for job_id in await Storage.keys(jobs_storage_session_id):
+            if job_id in self.tasks:
+                continue
+            try:
+                job = await self.get(job_id)
+            except Exception as exception:
+                logger.error("Unable to load job %s: %s", job_id, exception)
+                continue
+            if job is None or job.status not in (
+                JobStatusEnum.queued,
+                JobStatusEnum.running,
+            ):
+                continue
+            logger.info("Resuming job %s at component %s", job.id, job.next)
+            self.start(job)
+            resumed.append(job.id)
+        return resumed
+
+    def start(self, job: FlowJob, tunnel_authorization: str | None = None) -> None:
+        # Jobs outlive the request that submits them, and its deadline.
+        with deadline.detached():
+            task = asyncio.create_task(self.__run(job, tunnel_authorization))
+        self.tasks[job.id] = task
+        task.add_done_callback(lambda _: self.tasks.pop(job.id, None))
+
+    async def __run(self, job: FlowJob, tunnel_authorization: str | None) -> None:
+        async def checkpoint(flow_definition: FlowDefinition, next: str) -> None:
+            job.flow_definition = flow_definition
+            job.next = next
+            job.steps += 1
+            await self.save(job)
+            await self.emit(job)
+
+        job.status = JobStatusEnum.running
+        await self.save(job)
+        await self.emit(job)
+
+        try:
+            flow_definition = await self.runtime.invoke(
+                job.flow_definition,
+                tunnel_authorization,
+                start_at=job.next,
+                on_step=checkpoint,
+            )
+            job.flow_definition = flow_definition
+            job.error = flow_definition.status.error
+            job.status = JobStatusEnum.failed if job.error else JobStatusEnum.completed
+        except Exception as exception:
+            logger.error("Job %s failed: %s", job.id, traceback.format_exc())
+            job.error = str(exception)
+            job.status = JobStatusEnum.failed
+
+        job.next = None
+        await self.save(job)
+        await self.emit(job)
+
+    async def emit(self, job: FlowJob) -> None:
+        """
+        Emits the job's progress to the flow's session.
+        """
+        await self.runtime.emit(
+            FlowEvent(
+                session_id=job.flow_definition.session_id,
+                event=job_event,
+                data=json.dumps(
+                    {
+                        "id": job.id,
+                        "status": job.status.value,
+                        "next": job.next,
+                        "steps": job.steps,
+                        "error": job.error,
+                    }
+                ),
+            )
+        )
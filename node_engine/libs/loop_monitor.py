@@ -0,0 +1,147 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import asyncio
+import logging
+import os
+import sys
+import sysconfig
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass
+from typing import Any
+
+from node_engine.libs import metrics
+
+logger = logging.getLogger(__name__)
+
+# Frames in these directories are skipped when locating the blocking code,
+# so the location is the caller, e.g. a component calling json.dumps.
+_library_paths = tuple(
+    os.path.realpath(sysconfig.get_paths()[name]) + os.sep
+    for name in ("stdlib", "purelib", "platlib")
+)
+
+
+@dataclass
+class LoopBlock:
+    # How long the heartbeat was late, in milliseconds.
+    lag_ms: float
+    # "file:line (function)" of the code found running during the block, or
+    # None if the block ended before it was sampled.
+    location: str | None
+    stack: list[str]
+    time: float
+
+    def info(self) -> dict[str, Any]:
+        return {
+            "lag_ms": round(self.lag_ms, 3),
+            "location": self.location,
+            "stack": self.stack,
+            "time": self.time,
+        }
+
+
+def _location(stack: traceback.StackSummary) -> str | None:
+    if not stack:
+        return None
+    frame = next(
+        (
+            frame
+            for frame in reversed(stack)
+            if not os.path.realpath(frame.filename).startswith(_library_paths)
+        ),
+        stack[-1],
+    )
+    return f"{os.path.basename(frame.filename)}:{frame.lineno} ({frame.name})"
+
+
+class LoopMonitor:
+    """
+    Measures event loop lag with a heartbeat task that sleeps `interval_ms`
+    at a time and records how late it wakes up. A watchdog thread samples the
+    stack of the event loop thread when the heartbeat is more than
+    `threshold_ms` late, so the code blocking the loop (synchronous file
+    access, CPU heavy work, blocking calls in components) is reported with
+    the lag it caused: logged as a warning, counted by location in the
+    metrics and kept in `blocks` (most recent last).
+    """
+
+    def __init__(
+        self, threshold_ms: float = 100, interval_ms: float = 50, history: int = 20
+    ) -> None:
+        self.threshold_ms = threshold_ms
+        self.interval_ms = interval_ms
+        self.blocks: deque[LoopBlock] = deque(maxlen=history)
+        # Heartbeat state, shared with the watchdog thread.
+        self._beats = 0
+        self._expected: float | None = None
+        self._sampled: tuple[int, traceback.StackSummary] | None = None
+        self._thread_id: int | None = None
+        self._task: asyncio.Task | None = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        """
+        Starts monitoring the running event loop.
+        """
+        if self._task is not None:
+            return
+        self._thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        threading.Thread(target=self._watchdog, daemon=True).start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _heartbeat(self) -> None:
+        interval = self.interval_ms / 1000
+        while True:
+            self._expected = time.monotonic() + interval
+            await asyncio.sleep(interval)
+            lag = max(0.0, time.monotonic() - self._expected)
+            metrics.event_loop_lag.observe(lag)
+            if lag * 1000 >= self.threshold_ms:
+                self._report(lag * 1000)
+            self._beats += 1
+
+    def _report(self, lag_ms: float) -> None:
+        sampled = self._sampled
+        stack = sampled[1] if sampled and sampled[0] == self._beats else None
+        location = _location(stack) if stack else None
+        block = LoopBlock(
+            lag_ms=lag_ms,
+            location=location,
+            stack=traceback.format_list(stack) if stack else [],
+            time=time.time(),
+        )
+        self.blocks.append(block)
+        metrics.event_loop_blocks.inc(location or "unknown")
+        logger.warning(
+            "Event loop blocked for %.0f ms; location: %s\n%s",
+            lag_ms,
+            location or "unknown",
+            "".join(block.stack),
+        )
+
+    def _watchdog(self) -> None:
+        # Checks often enough to sample blocks a little over the threshold.
+        period = max(0.005, self.threshold_ms / 4000)
+        while not self._stopped.wait(period):
+            expected = self._expected
+            beat = self._beats
+            if expected is None or self._thread_id is None:
+                continue
+            if (time.monotonic() - expected) * 1000 < self.threshold_ms:
+                continue
+            if self._sampled is not None and self._sampled[0] == beat:
+                # Sampled once per block.
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is not None:
+                self._sampled = (beat, traceback.extract_stack(frame))
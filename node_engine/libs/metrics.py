@@ -0,0 +1,234 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+"""
+Process-wide metrics, exposed in the Prometheus text format by the service's
+/metrics endpoint. Recording a value is a dict lookup and a few additions, so
+metrics can be recorded on every component step and storage operation.
+Values are recorded from the event loop thread only.
+"""
+
+import math
+from bisect import bisect_left
+from typing import Iterable, Sequence
+
+# Bucket upper bounds, in seconds, for latencies from a millisecond to a minute.
+latency_buckets = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+token_buckets = (16, 64, 256, 1024, 4096, 16384, 65536)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+
+    def _label_text(self, values: Sequence[str], extra: str = "") -> str:
+        pairs = [
+            f'{label}="{_escape(str(value))}"'
+            for label, value in zip(self.labels, values)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> Iterable[str]:
+        return []
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {_escape(self.help)}",
+            f"# TYPE {self.name} {self.type}",
+            *self.samples(),
+        ]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """
+    A value that only goes up, by label values.
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labels)
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for label_values, value in sorted(self.values.items()):
+            yield f"{self.name}{self._label_text(label_values)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    """
+    A value that is set, by label values.
+    """
+
+    type = "gauge"
+
+    def set(self, value: float, *label_values: str) -> None:
+        self.values[label_values] = value
+
+
+class Histogram(Metric):
+    """
+    Counts of observed values in buckets, with their sum and count, by label
+    values.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = latency_buckets,
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # Per label values: the count in each bucket (not cumulative, with
+        # one more for +Inf), and the sum of the values.
+        self.counts: dict[tuple[str, ...], list[int]] = {}
+        self.sums: dict[tuple[str, ...], float] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        counts = self.counts.get(label_values)
+        if counts is None:
+            counts = self.counts[label_values] = [0] * (len(self.buckets) + 1)
+            self.sums[label_values] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self.sums[label_values] += value
+
+    def samples(self) -> Iterable[str]:
+        for label_values, counts in sorted(self.counts.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                labels = self._label_text(
+                    label_values, f'le="{_format_value(float(bound))}"'
+                )
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = self._label_text(label_values)
+            yield f"{self.name}_sum{labels} {_format_value(self.sums[label_values])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: list[Metric] = []
+
+    def register(self, metric: Metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self, extra: Iterable[Metric] = ()) -> str:
+        """
+        Returns the registered metrics, and `extra` ones collected by the
+        caller, in the Prometheus text exposition format.
+        """
+        return "\n".join(metric.render() for metric in (*self.metrics, *extra)) + "\n"
+
+
+registry = Registry()
+
+component_duration = registry.register(
+    Histogram(
+        "node_engine_component_duration_seconds",
+        "Execution time of components, by component name",
+        ["component"],
+    )
+)
+flow_duration = registry.register(
+    Histogram(
+        "node_engine_flow_duration_seconds",
+        "Duration of flow invocations, by flow key",
+        ["flow"],
+    )
+)
+storage_duration = registry.register(
+    Histogram(
+        "node_engine_storage_operation_duration_seconds",
+        "Latency of session storage operations, by operation",
+        ["operation"],
+    )
+)
+llm_duration = registry.register(
+    Histogram(
+        "node_engine_llm_request_duration_seconds",
+        "Latency of Azure OpenAI requests, by operation and deployment",
+        ["operation", "deployment"],
+    )
+)
+llm_tokens = registry.register(
+    Histogram(
+        "node_engine_llm_request_tokens",
+        "Tokens per Azure OpenAI request, by operation, deployment and type (prompt or completion)",
+        ["operation", "deployment", "type"],
+        buckets=token_buckets,
+    )
+)
+
+event_loop_lag = registry.register(
+    Histogram(
+        "node_engine_event_loop_lag_seconds",
+        "Delay of the event loop monitor's heartbeat past its scheduled time",
+    )
+)
+event_loop_blocks = registry.register(
+    Counter(
+        "node_engine_event_loop_blocks_total",
+        "Times the event loop was blocked beyond the threshold, by the function running when it was detected",
+        ["location"],
+    )
+)
+
+
+def observe_llm_request(
+    operation: str, deployment: str, seconds: float, usage: object | None
+) -> None:
+    """
+    Records the latency of an Azure OpenAI request and the tokens it used,
+    from the `usage` of its response when present.
+    """
+    llm_duration.observe(seconds, operation, deployment)
+    if usage is None:
+        return
+    for type in ("prompt", "completion"):
+        tokens = getattr(usage, f"{type}_tokens", None)
+        if tokens is not None:
+            llm_tokens.observe(tokens, operation, deployment, type)
@@ -0,0 +1,110 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+from typing import Any, Callable, Coroutine
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+from node_engine.libs import serialization
+
+original_content_type_scope_key = "node_engine.content_type"
+
+
+class NegotiatedRequest(Request):
+    """
+    Request that decompresses its body and decodes msgpack bodies. The route
+    presents msgpack requests to FastAPI as JSON so body validation still
+    happens, and `json` returns the decoded msgpack instead.
+    """
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_body"):
+            body = await super().body()
+            self._body = serialization.decompress(
+                body, self.headers.get("content-encoding")
+            )
+        return self._body
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = serialization.decode(
+                await self.body(),
+                self.scope.get(
+                    original_content_type_scope_key, serialization.json_content_type
+                ),
+            )
+        return self._json
+
+
+class NegotiatedResponse(JSONResponse):
+    """
+    Response that keeps its content unrendered until NegotiatedRoute knows
+    which format the client asked for.
+    """
+
+    def render(self, content: Any) -> bytes:
+        self.content = content
+        return b""
+
+
+class NegotiatedRoute(APIRoute):
+    """
+    Route supporting msgpack request/response bodies and gzip/zstd compressed
+    request bodies. JSON remains the default. Responses are compressed only
+    when the client compressed its request and accepts the same encoding.
+    Use with `response_class=NegotiatedResponse`.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        original_route_handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            content_type = request.headers.get(
+                "content-type", serialization.json_content_type
+            )
+            scope = request.scope
+            if (
+                serialization.negotiate_content_type(content_type)
+                == serialization.msgpack_content_type
+            ):
+                scope = {
+                    **scope,
+                    original_content_type_scope_key: content_type,
+                    "headers": [
+                        (key, value)
+                        for key, value in scope["headers"]
+                        if key != b"content-type"
+                    ]
+                    + [(b"content-type", serialization.json_content_type.encode())],
+                }
+            request = NegotiatedRequest(scope, request.receive)
+
+            response = await original_route_handler(request)
+            if not isinstance(response, NegotiatedResponse):
+                return response
+
+            response_content_type = serialization.negotiate_content_type(
+                request.headers.get("accept")
+            )
+            response_content_encoding = None
+            if request.headers.get("content-encoding"):
+                response_content_encoding = serialization.negotiate_content_encoding(
+                    request.headers.get("accept-encoding")
+                )
+
+            response.body = serialization.encode(
+                response.content, response_content_type, response_content_encoding
+            )
+            response.media_type = response_content_type
+            headers = {
+                key: value
+                for key, value in response.headers.items()
+                if key not in ("content-length", "content-type")
+            }
+            if response_content_encoding:
+                headers["content-encoding"] = response_content_encoding
+            response.init_headers(headers)
+            return response
+
+        return route_handler
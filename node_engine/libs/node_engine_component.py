@@ -1,22 +1,39 @@
 # Copyright (c) Microsoft. All rights reserved.
 
+import functools
 import inspect
 import time
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, Awaitable, Callable
+from weakref import WeakKeyDictionary
 
-from node_engine.libs import debug_collector, log
+from node_engine.libs import debug_collector, log, metrics
 from node_engine.libs.component_config import ComponentConfig
 from node_engine.libs.context import Context
 from node_engine.libs.telemetry import Telemetry
-from node_engine.libs.utility import continue_flow, exit_flow_with_error
+from node_engine.libs.utility import (
+    continue_flow,
+    declared_storage_keys,
+    exit_flow_with_error,
+)
 from node_engine.models.flow_definition import FlowDefinition
 from node_engine.models.flow_event import FlowEvent
 from node_engine.models.flow_executor import FlowExecutor
 from node_engine.models.flow_step import FlowStep
 
+# Source of the execute method and info by component class. Weak, since code
+# components get a new class every time the registry is reloaded.
+_source_cache: WeakKeyDictionary[type, str] = WeakKeyDictionary()
+_info_cache: WeakKeyDictionary[type, dict[str, Any]] = WeakKeyDictionary()
+
 
 class NodeEngineComponent(ABC):
+    # Components that only read storage and change the flow context, without
+    # writing storage (telemetry and caches included), emitting events or
+    # starting other flows, may run speculatively (see Speculation), since
+    # their work can be discarded.
+    side_effect_free = False
+
     def __init__(
         self,
         flow_definition: FlowDefinition,
@@ -25,7 +42,7 @@ class NodeEngineComponent(ABC):
         tunnel_authorization: str | None = None,
     ) -> None:
         self.flow_definition = flow_definition
-        self.context = Context(self.flow_definition)
+        self.context = Context(self.flow_definition, track_changes=True)
         self.status = self.flow_definition.status
         self.component_key = component_key
         self.tunnel_authorization = tunnel_authorization
@@ -60,12 +77,19 @@ class NodeEngineComponent(ABC):
         start_time_ns = time.time_ns()
 
         # Call the original execute method.
-        result = await self.execute(*args, **kwargs)
-
-        # Code to execute after the method.
-        end_time_ns = time.time_ns()
-
-        # Populate trace information into the status.
+        try:
+            result = await self.execute(*args, **kwargs)
+        finally:
+            # Code to execute after the method.
+            end_time_ns = time.time_ns()
+            metrics.component_duration.observe(
+                (end_time_ns - start_time_ns) / 1_000_000_000,
+                self.__class__.__name__,
+            )
+
+        # Populate trace information into the status. Only the context keys
+        # this component read and the changes it made are recorded, rather
+        # than the whole context.
         trace = {
             "elapsed_time_ms": (end_time_ns - start_time_ns) / 1_000_000,
             "component": {
@@ -73,7 +97,8 @@ class NodeEngineComponent(ABC):
                 "name": self.__class__.__name__,
             },
             "config": self.config.config,
-            "context": self.flow_definition.context,
+            "context_reads": sorted(self.context.reads),
+            "context_delta": self.context.delta(result.flow_definition.context),
         }
         self.status.trace.append(trace)
 
@@ -81,15 +106,38 @@ class NodeEngineComponent(ABC):
 
     @classmethod
     def get_info(cls) -> dict[str, Any]:
-        return {
-            "name": cls.__name__,
-            "description": getattr(cls, "description", None),
-            "default_config": getattr(cls, "default_config", None),
-            "reads_from": getattr(cls, "reads_from", None),
-            "writes_to": getattr(cls, "writes_to", None),
-            "sample_input": getattr(cls, "sample_input", None),
-            "sample_output": getattr(cls, "sample_output", None),
-        }
+        """
+        Returns the component's metadata. It is built once per class and
+        shared, so it must not be changed.
+        """
+        info = _info_cache.get(cls)
+        if info is None:
+            info = {
+                "name": cls.__name__,
+                "description": getattr(cls, "description", None),
+                "default_config": getattr(cls, "default_config", None),
+                "reads_from": getattr(cls, "reads_from", None),
+                "writes_to": getattr(cls, "writes_to", None),
+                "sample_input": getattr(cls, "sample_input", None),
+                "sample_output": getattr(cls, "sample_output", None),
+                "side_effect_free": cls.side_effect_free,
+            }
+            _info_cache[cls] = info
+        return info
+
+    def storage_keys(self) -> list[str]:
+        """
+        Returns the session storage keys this component declares it reads,
+        which the runtime prefetches when the flow starts.
+        """
+        return declared_storage_keys(getattr(self, "reads_from", None), self.config.get)
+
+    def candidate_successors(self) -> list[str]:
+        """
+        Returns the keys of the components this component may continue to,
+        for components that choose between branches. Empty by default.
+        """
+        return []
 
     @classmethod
     async def test(cls, executor: FlowExecutor) -> FlowStep | str:
@@ -110,6 +158,19 @@ class NodeEngineComponent(ABC):
     async def invoke(self, flow_definition: FlowDefinition) -> FlowDefinition:
         return await self.runtime.invoke(flow_definition, self.tunnel_authorization)
 
+    async def invoke_background(
+        self,
+        flow_definition: FlowDefinition,
+        priority: int = 0,
+        coalesce_key: str | None = None,
+    ) -> str:
+        return await self.runtime.invoke_background(
+            flow_definition,
+            self.tunnel_authorization,
+            priority=priority,
+            coalesce_key=coalesce_key,
+        )
+
     async def invoke_component(
         self, flow_definition: FlowDefinition, component_key: str
     ) -> FlowStep:
@@ -118,11 +179,10 @@ class NodeEngineComponent(ABC):
         )
 
     def exit_flow_with_error(self, message: str) -> FlowStep:
-        debug_information = debug_collector.collect(
+        debug_information = debug_collector.reference(
             message=message,
             flow_definition=self.flow_definition,
-            component_source=self._source_code(),
-            component_info=self.__class__.get_info(),
+            component=self,
         )
         return exit_flow_with_error(
             message,
@@ -142,8 +202,30 @@ class NodeEngineComponent(ABC):
         """
         Returns the source code of the execute method for debugging purposes.
         """
-        component_execute_source, start_line = inspect.getsourcelines(self.execute)
-        code_string = ""
-        for i, line in enumerate(component_execute_source, start_line):
-            code_string += f"{i}: {line}"
+        return _execute_source(self.__class__)
+
+    def _source_loader(
+        self, flow_definition: FlowDefinition
+    ) -> Callable[[], str | Awaitable[str]]:
+        """
+        Returns a function reading the source code for debug information
+        collected after the component ran (see `debug_collector`), in the
+        flow `flow_definition`. It must not hold on to the component, which
+        would keep its flow alive.
+        """
+        return functools.partial(_execute_source, self.__class__)
+
+
+def _execute_source(component_class: type) -> str:
+    code_string = _source_cache.get(component_class)
+    if code_string is not None:
         return code_string
+
+    component_execute_source, start_line = inspect.getsourcelines(
+        component_class.execute
+    )
+    code_string = ""
+    for i, line in enumerate(component_execute_source, start_line):
+        code_string += f"{i}: {line}"
+    _source_cache[component_class] = code_string
+    return code_string
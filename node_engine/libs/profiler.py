@@ -0,0 +1,260 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar, Token
+from types import FrameType
+from typing import Any
+
+from node_engine.libs.storage import Storage
+from node_engine.models.flow_definition import FlowDefinition
+
+# Storage session under which profiles are kept, two files per profile: its
+# metadata ("<id>.json") and its stacks ("<id>.collapsed").
+profiles_storage_session_id = "_profiles"
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    name = f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    # ";" separates frames in the collapsed stack format.
+    return name.replace(";", ":")
+
+
+def _awaitable_frame(awaitable: Any) -> FrameType | None:
+    for attribute in ("cr_frame", "gi_frame", "ag_frame"):
+        frame = getattr(awaitable, attribute, None)
+        if frame is not None:
+            return frame
+    return None
+
+
+def _awaited(awaitable: Any) -> Any:
+    for attribute in ("cr_await", "gi_yieldfrom", "ag_await"):
+        awaited = getattr(awaitable, attribute, None)
+        if awaited is not None:
+            return awaited
+    return None
+
+
+class ProfileCapture:
+    """
+    Samples of one flow invocation, each the stack of coroutines the
+    invocation was awaiting at the time, from `Runtime.invoke` down. When the
+    innermost coroutine was running, the frames of the functions it was
+    calling are included; otherwise the stack ends with "(waiting)", e.g. for
+    a response from Azure OpenAI or a read in a worker thread.
+    """
+
+    def __init__(
+        self, flow_definition: FlowDefinition, frame: FrameType, forced: bool
+    ) -> None:
+        self.id = f"{int(time.time() * 1000)}{uuid.uuid4().hex[:8]}"
+        self.flow_key = flow_definition.key
+        self.session_id = flow_definition.session_id
+        self.forced = forced
+        self.frame = frame
+        self.task = asyncio.current_task()
+        self.thread_id = threading.get_ident()
+        self.created = time.time()
+        self.started = time.perf_counter()
+        self.stacks: Counter[str] = Counter()
+        self.token: Token | None = None
+
+    def sample(self, thread_frame: FrameType | None) -> None:
+        if self.task is None:
+            return
+        names: list[str] = []
+        recording = False
+        awaitable: Any = self.task.get_coro()
+        while awaitable is not None:
+            frame = _awaitable_frame(awaitable)
+            if frame is None:
+                if recording:
+                    names.append("(waiting)")
+                break
+            if frame is self.frame:
+                recording = True
+            if recording:
+                names.append(_frame_name(frame))
+            awaited = _awaited(awaitable)
+            if awaited is None:
+                if recording and thread_frame is not None:
+                    names.extend(self._called_frames(thread_frame, frame))
+                break
+            awaitable = awaited
+        if recording:
+            self.stacks[";".join(names)] += 1
+
+    @staticmethod
+    def _called_frames(thread_frame: FrameType, frame: FrameType) -> list[str]:
+        # Frames called by `frame`, outermost first, if the thread is running
+        # it.
+        called = []
+        current: FrameType | None = thread_frame
+        while current is not None and current is not frame:
+            called.append(_frame_name(current))
+            current = current.f_back
+        if current is None:
+            return []
+        return called[::-1]
+
+    def collapsed(self) -> str:
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+
+# Capture of the invocation being run, so sub-flows are part of it.
+_capture: ContextVar[ProfileCapture | None] = ContextVar(
+    "profile_capture", default=None
+)
+
+
+class Profiler:
+    """
+    Wall clock sampling profiler for flow invocations. Invocations of flows
+    with `profile` set, and all invocations when `threshold_ms` is set, are
+    sampled every `interval_ms` from a worker thread. Profiles of flagged
+    invocations and of those that took at least `threshold_ms` are saved to
+    Storage in the collapsed stack format (one "frame;frame;... count" line
+    per stack, as read by flamegraph.pl and speedscope); the others are
+    dropped. At most `max_profiles` are kept, the oldest are deleted first.
+    """
+
+    def __init__(
+        self,
+        threshold_ms: float | None = None,
+        interval_ms: float = 10,
+        max_profiles: int = 100,
+    ) -> None:
+        self.threshold_ms = threshold_ms
+        self.interval_ms = interval_ms
+        self.max_profiles = max_profiles
+        self.active: set[ProfileCapture] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(
+        self, flow_definition: FlowDefinition, frame: FrameType | None
+    ) -> ProfileCapture | None:
+        """
+        Starts sampling an invocation of the flow run by `frame` (a frame of
+        `Runtime.invoke`), if it is to be profiled and not a sub-flow of an
+        invocation already sampled.
+        """
+        forced = flow_definition.profile
+        if frame is None or (not forced and self.threshold_ms is None):
+            return None
+        current = _capture.get()
+        if current is not None and current.task is asyncio.current_task():
+            return None
+
+        capture = ProfileCapture(flow_definition, frame, forced)
+        capture.token = _capture.set(capture)
+        with self._lock:
+            self.active.add(capture)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self._wake.set()
+        return capture
+
+    async def finish(self, capture: ProfileCapture) -> str | None:
+        """
+        Stops sampling an invocation and saves its profile if it was flagged
+        or slow. Returns the id of the saved profile.
+        """
+        with self._lock:
+            self.active.discard(capture)
+        _capture.reset(capture.token)
+        elapsed_ms = (time.perf_counter() - capture.started) * 1000
+        if not capture.forced and (
+            self.threshold_ms is None or elapsed_ms < self.threshold_ms
+        ):
+            return None
+
+        await Storage.set(
+            profiles_storage_session_id,
+            f"{capture.id}.collapsed",
+            capture.collapsed(),
+            raw=True,
+        )
+        await Storage.set(
+            profiles_storage_session_id,
+            f"{capture.id}.json",
+            {
+                "id": capture.id,
+                "flow_key": capture.flow_key,
+                "session_id": capture.session_id,
+                "created": capture.created,
+                "elapsed_ms": round(elapsed_ms, 3),
+                "samples": sum(capture.stacks.values()),
+                "interval_ms": self.interval_ms,
+                "reason": "flag" if capture.forced else "threshold",
+            },
+        )
+        await self._prune()
+        return capture.id
+
+    async def list(self) -> list[dict[str, Any]]:
+        """
+        Returns the metadata of the saved profiles, newest first.
+        """
+        profiles = []
+        for key in reversed(await Storage.keys(profiles_storage_session_id)):
+            if key.endswith(".json"):
+                profile = await Storage.get(profiles_storage_session_id, key)
+                if profile is not None:
+                    profiles.append(profile)
+        return profiles
+
+    async def get(self, profile_id: str) -> str | None:
+        """
+        Returns the collapsed stacks of a saved profile.
+        """
+        # Profile ids are used as storage file names, don't allow paths.
+        if not profile_id.isalnum():
+            return None
+        return await Storage.get(
+            profiles_storage_session_id, f"{profile_id}.collapsed", raw=True
+        )
+
+    async def _prune(self) -> None:
+        ids = [
+            key.removesuffix(".json")
+            for key in await Storage.keys(profiles_storage_session_id)
+            if key.endswith(".json")
+        ]
+        # Ids start with their creation time, so sort oldest first.
+        for profile_id in ids[: max(0, len(ids) - self.max_profiles)]:
+            await Storage.delete(profiles_storage_session_id, f"{profile_id}.json")
+            await Storage.delete(profiles_storage_session_id, f"{profile_id}.collapsed")
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if self.active:
+                    frames = sys._current_frames()
+                    for capture in self.active:
+                        try:
+                            capture.sample(frames.get(capture.thread_id))
+                        except Exception:
+                            logger.debug("Unable to sample", exc_info=True)
+                    waiting = False
+                else:
+                    self._wake.clear()
+                    waiting = True
+            if waiting:
+                self._wake.wait()
+            else:
+                time.sleep(self.interval_ms / 1000)
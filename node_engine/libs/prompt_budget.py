@@ -0,0 +1,43 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import re
+from typing import Any, Callable
+
+# Tokens added per chat message for role and separators.
+message_overhead_tokens = 4
+
+_token_pattern = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Fast local estimate of the number of tokens in a text, without loading a
+    tokenizer: punctuation and words count as one token, with longer words
+    counted as one token per four characters, rounded. Close to the GPT
+    tokenizers for English text.
+    """
+    return sum(max(1, (len(piece) + 2) // 4) for piece in _token_pattern.findall(text))
+
+
+def fit_history(
+    history: list[Any],
+    render: Callable[[Any], str],
+    budget: int,
+) -> list[Any]:
+    """
+    Returns the most recent items of `history` whose rendered text fits in
+    `budget` tokens, oldest first. Counting stops at the first item that
+    doesn't fit, so only the returned items are rendered and counted.
+    Counting is a single pass over the text, cheaper than caching the counts.
+    """
+    fitted = []
+    used = 0
+    for item in reversed(history):
+        tokens = estimate_tokens(render(item)) + message_overhead_tokens
+        if used + tokens > budget:
+            break
+        used += tokens
+        fitted.append(item)
+
+    fitted.reverse()
+    return fitted
@@ -0,0 +1,246 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, TypeVar
+
+from openai import APIConnectionError, APIStatusError, RateLimitError
+
+from node_engine.libs import deadline, prompt_budget
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously up to its capacity. `acquire` waits
+    until the requested amount is available; amounts above the capacity wait
+    for a full bucket.
+    """
+
+    def __init__(self, capacity: float, refill_per_second: float) -> None:
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1) -> None:
+        amount = min(amount, self.capacity)
+        # Waiters are served in order, so large requests are not starved.
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity,
+                    self.tokens + (now - self.updated) * self.refill_per_second,
+                )
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.refill_per_second)
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class DeploymentLimiter:
+    """
+    Rate limiter and retry policy shared by all calls to one Azure OpenAI
+    deployment.
+
+    - Requests per minute and tokens per minute are limited with token
+      buckets, so bursts queue instead of failing with 429s.
+    - 429 responses pause all calls to the deployment for the Retry-After
+      duration before the failed call is retried.
+    - Rate limits, server errors and connection errors are retried with
+      jittered exponential backoff, retrying only the failed call, unless
+      the backoff would pass the current deadline (see `deadline`).
+    - After `failure_threshold` consecutive server or connection errors the
+      circuit opens and calls fail fast for `reset_timeout` seconds, after
+      which a single trial call decides whether it closes again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30,
+        max_backoff: float = 30,
+    ) -> None:
+        self.name = name
+        self.requests = (
+            TokenBucket(requests_per_minute, requests_per_minute / 60)
+            if requests_per_minute
+            else None
+        )
+        self.tokens = (
+            TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+            if tokens_per_minute
+            else None
+        )
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_backoff = max_backoff
+        self.paused_until = 0.0
+        self.failures = 0
+        self.open_until: float | None = None
+        self.trial_in_progress = False
+
+    async def call(
+        self,
+        request: Callable[[], Awaitable[T]],
+        tokens: int = 0,
+        max_retries: int = 2,
+        retry_delay_ms: int = 1000,
+    ) -> T:
+        """
+        Calls `request` once the limits allow it, retrying failures that are
+        worth retrying up to `max_retries` times.
+        """
+        attempt = 0
+        while True:
+            await self._wait(tokens)
+            trial = self._enter_circuit()
+            try:
+                result = await request()
+            except RateLimitError as exception:
+                self._exit_circuit(trial, failed=False)
+                delay = self._backoff(attempt, retry_delay_ms)
+                retry_after = _retry_after(exception)
+                if retry_after is not None:
+                    delay = max(delay, retry_after)
+                    self.paused_until = max(
+                        self.paused_until, time.monotonic() + retry_after
+                    )
+                error = exception
+            except (APIConnectionError, APIStatusError) as exception:
+                if (
+                    isinstance(exception, APIStatusError)
+                    and exception.status_code < 500
+                ):
+                    self._exit_circuit(trial, failed=False)
+                    raise
+                self._exit_circuit(trial, failed=True)
+                delay = self._backoff(attempt, retry_delay_ms)
+                error = exception
+            except BaseException:
+                self._exit_circuit(trial, failed=None)
+                raise
+            else:
+                self._exit_circuit(trial, failed=False)
+                return result
+
+            if attempt >= max_retries:
+                raise error
+            remaining = deadline.remaining()
+            if remaining is not None and delay >= remaining:
+                # The retry could not complete before the deadline.
+                raise error
+            attempt += 1
+            logger.warning(
+                "Retrying %s call in %.2fs (attempt %d of %d): %s",
+                self.name,
+                delay,
+                attempt,
+                max_retries,
+                error,
+            )
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "failures": self.failures,
+            "circuit_open": self.open_until is not None,
+            "paused_seconds": max(0.0, self.paused_until - time.monotonic()),
+        }
+
+    async def _wait(self, tokens: int) -> None:
+        pause = self.paused_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+        if self.requests:
+            await self.requests.acquire(1)
+        if self.tokens and tokens:
+            await self.tokens.acquire(tokens)
+
+    def _enter_circuit(self) -> bool:
+        # Returns whether this call is the trial call of a half-open circuit.
+        if self.open_until is None:
+            return False
+        if time.monotonic() < self.open_until or self.trial_in_progress:
+            raise CircuitOpenError(
+                f"circuit open for {self.name} after {self.failures} consecutive failures"
+            )
+        self.trial_in_progress = True
+        return True
+
+    def _exit_circuit(self, trial: bool, failed: bool | None) -> None:
+        # `failed` is None when the call ended without a response from the
+        # service, e.g. when it was cancelled, which doesn't change the state.
+        if trial:
+            self.trial_in_progress = False
+        if failed is None:
+            return
+        if not failed:
+            self.failures = 0
+            self.open_until = None
+            return
+        self.failures += 1
+        if trial or self.failures >= self.failure_threshold:
+            self.open_until = time.monotonic() + self.reset_timeout
+
+    def _backoff(self, attempt: int, retry_delay_ms: int) -> float:
+        # Full jitter: a random delay up to the exponential backoff, so
+        # retries from concurrent calls spread out.
+        return random.uniform(
+            0, min(self.max_backoff, retry_delay_ms / 1000 * 2**attempt)
+        )
+
+
+def _retry_after(exception: APIStatusError) -> float | None:
+    headers = exception.response.headers
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+limiters: dict[str, DeploymentLimiter] = {}
+
+
+def get_limiter(endpoint: str, deployment: str, config: dict) -> DeploymentLimiter:
+    """
+    Returns the limiter shared by all calls to the deployment. Limits are read
+    from the optional `rpm` (requests per minute) and `tpm` (tokens per
+    minute) entries of the service config when the limiter is created.
+    """
+    name = f"{endpoint}|{deployment}"
+    if name not in limiters:
+        limiters[name] = DeploymentLimiter(
+            deployment,
+            requests_per_minute=float(config["rpm"]) if "rpm" in config else None,
+            tokens_per_minute=float(config["tpm"]) if "tpm" in config else None,
+        )
+    return limiters[name]
+
+
+def estimate_tokens(value: Any) -> int:
+    """
+    Rough token count for rate limiting, see `prompt_budget.estimate_tokens`.
+    """
+    return prompt_budget.estimate_tokens(
+        value if isinstance(value, str) else str(value)
+    )
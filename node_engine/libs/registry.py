@@ -1,9 +1,15 @@
 # Copyright (c) Microsoft. All rights reserved.
 
+import asyncio
+import importlib
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+from types import ModuleType
+from typing import Any
 
 from node_engine.libs.component_loaders.code_component_loader import CodeComponentLoader
+from node_engine.libs.component_loaders.component_loader import ComponentLoader
 from node_engine.libs.component_loaders.endpoint_component_loader import (
     EndpointComponentLoader,
 )
@@ -11,6 +17,7 @@ from node_engine.libs.component_loaders.module_component_loader import (
     ModuleComponentLoader,
 )
 from node_engine.libs.node_engine_component import NodeEngineComponent
+from node_engine.libs.serialization import WireFormat, json_content_type
 from node_engine.models.component_registration import ComponentRegistration
 from node_engine.models.flow_definition import FlowDefinition
 from node_engine.models.flow_executor import FlowExecutor
@@ -22,32 +29,161 @@ class Registry:
     def __init__(self, root_path: str) -> None:
         # We assume the registry file will be found at <root_path>/registry.json.
         self.root_path = root_path
-
-    # Load each time needed so that changes to the registry file are reflected
-    def list_components(self) -> list[ComponentRegistration]:
-        # helper: load components from local json file
-        def load_from_file(registry_file) -> list[ComponentRegistration]:
-            with open(registry_file, "rt") as file:
+        # Registrations by key, as of the registry file modification time.
+        self._modified: int | None = None
+        self._components: dict[str, ComponentRegistration] = {}
+        # Component metadata, built on demand after each reload, see `index`.
+        self._index: dict[str, dict[str, Any]] = {}
+        # Code components are compiled once per reload, by code.
+        self._code_modules: dict[str, ModuleType] = {}
+
+    def _reload(self) -> None:
+        # The registry file is only read again when it changed, so that
+        # changes to it are reflected without reading it for every load.
+        registry_file_path = os.path.join(self.root_path, registry_file_name)
+        try:
+            modified = os.stat(registry_file_path).st_mtime_ns
+        except FileNotFoundError:
+            modified = -1
+        if modified == self._modified:
+            return
+
+        component_definitions = []
+        if modified != -1:
+            with open(registry_file_path, "rt") as file:
                 component_definitions = [
                     ComponentRegistration(**component) for component in json.load(file)
                 ]
 
-            return component_definitions
-
-        # Load components from registry file.
-        registry_file_path = os.path.join(self.root_path, registry_file_name)
-        if not os.path.isfile(registry_file_path):
-            return []
-
-        component_definitions = load_from_file(registry_file_path)
-
         # Sort components by key.
-        sorted_component_definitions = sorted(
-            component_definitions, key=lambda component: component.key
-        )
+        self._components = {
+            component.key: component
+            for component in sorted(
+                component_definitions, key=lambda component: component.key
+            )
+        }
+        self._index = {}
+        self._code_modules = {}
+        self._modified = modified
 
-        # Return sorted components.
-        return sorted_component_definitions
+    def list_components(self) -> list[ComponentRegistration]:
+        self._reload()
+        return list(self._components.values())
+
+    def get_component(self, key: str) -> ComponentRegistration | None:
+        self._reload()
+        return self._components.get(key)
+
+    def index(self) -> dict[str, dict[str, Any]]:
+        """
+        Returns the metadata of every registered component by key: its
+        registration along with the info of its class (see
+        `NodeEngineComponent.get_info`), such as default config, reads_from,
+        writes_to and sample input and output. The index is built once per
+        registry reload, importing module and compiling code components, so
+        requests are served from memory. Endpoint components are described by
+        their registration only, and components that fail to load have an
+        `error` instead.
+        """
+        self._reload()
+        return {key: self.component_info(key) for key in self._components}
+
+    def component_info(self, key: str) -> dict[str, Any] | None:
+        """
+        Returns the metadata of the component with the given key from the
+        index (see `index`), adding it if needed, or None if the component is
+        not registered.
+        """
+        self._reload()
+        component = self._components.get(key)
+        if component is None:
+            return None
+        info = self._index.get(key)
+        if info is None:
+            info = self._component_info(component)
+            self._index[key] = info
+        return info
+
+    async def preload(self, concurrency: int = 8) -> dict[str, dict[str, Any]]:
+        """
+        Builds the index (see `index`) ahead of the requests that need it,
+        importing module components and compiling code components in up to
+        `concurrency` worker threads, so the event loop keeps running and
+        imports waiting on files or native code overlap. Returns the index.
+        """
+        self._reload()
+        modified = self._modified
+        pending = [
+            component
+            for key, component in self._components.items()
+            if key not in self._index
+        ]
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="registry-preload"
+        ) as executor:
+            infos = await asyncio.gather(
+                *(
+                    loop.run_in_executor(executor, self._component_info, component)
+                    for component in pending
+                )
+            )
+        # Results for a registry file that changed during the preload are
+        # dropped, rather than mixed into the index of the new one, which is
+        # preloaded instead.
+        self._reload()
+        if self._modified != modified:
+            return await self.preload(concurrency)
+        for component, info in zip(pending, infos):
+            self._index.setdefault(component.key, info)
+        return self.index()
+
+    def _component_info(self, component: ComponentRegistration) -> dict[str, Any]:
+        info: dict[str, Any] = {
+            "name": None,
+            "default_config": None,
+            "reads_from": None,
+            "writes_to": None,
+            "sample_input": None,
+            "sample_output": None,
+            "side_effect_free": False,
+        }
+        error = None
+        try:
+            match component.type:
+                case "endpoint":
+                    info["name"] = component.config["class_name"]
+                    info["reads_from"] = component.config.get("reads_from")
+                case "module" | "code":
+                    component_class = getattr(
+                        self._module(component), component.config["class"]
+                    )
+                    info.update(component_class.get_info())
+                case _:
+                    raise Exception(f"Component type '{component.type}' not supported")
+        except Exception as exception:
+            error = f"{exception.__class__.__name__}: {exception}"
+
+        # The class description is replaced by the registration's.
+        return {
+            **info,
+            "key": component.key,
+            "label": component.label,
+            "description": component.description,
+            "type": component.type,
+            "error": error,
+        }
+
+    def _module(self, component: ComponentRegistration) -> ModuleType:
+        if component.type == "module":
+            return importlib.import_module(component.config["module"])
+
+        code = component.config["code"]
+        module = self._code_modules.get(code)
+        if module is None:
+            module = CodeComponentLoader.compile(code)
+            self._code_modules[code] = module
+        return module
 
     def load_component(
         self,
@@ -58,17 +194,7 @@ class Registry:
         tunnel_authorization: str | None = None,
     ) -> NodeEngineComponent | None:
         # Get the component registration for the given key.
-        component_registration = (
-            next(
-                (
-                    component
-                    for component in self.list_components()
-                    if component.key == key
-                ),
-                None,
-            )
-            or None
-        )
+        component_registration = self.get_component(key)
 
         if component_registration is None:
             return None
@@ -83,6 +209,13 @@ class Registry:
                     component_registration.config["component_name"],
                     component_registration.config["class_name"],
                     tunnel_authorization=tunnel_authorization,
+                    reads_from=component_registration.config.get("reads_from"),
+                    wire_format=WireFormat(
+                        component_registration.config.get(
+                            "content_type", json_content_type
+                        ),
+                        component_registration.config.get("content_encoding"),
+                    ),
                 )
             case "module":
                 component = ModuleComponentLoader.load(
@@ -94,10 +227,10 @@ class Registry:
                     tunnel_authorization=tunnel_authorization,
                 )
             case "code":
-                component = CodeComponentLoader.load(
+                component = ComponentLoader.load(
                     flow_definition,
                     component_key,
-                    component_registration.config["code"],
+                    self._module(component_registration),
                     component_registration.config["class"],
                     executor=executor,
                     tunnel_authorization=tunnel_authorization,
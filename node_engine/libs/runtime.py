@@ -1,14 +1,29 @@
 # Copyright (c) Microsoft. All rights reserved.
 
 import asyncio
+import inspect
 import logging
+import time
 import traceback
+from collections import Counter
+from typing import Any, Awaitable, Callable
 
-from node_engine.libs import debug_collector
+from node_engine.libs import deadline, debug_collector, metrics, tracing
+from node_engine.libs.background_supervisor import BackgroundSupervisor
+from node_engine.libs.flow_validator import validate
 from node_engine.libs.log import get_flow_logger
 from node_engine.libs.node_engine_component import NodeEngineComponent
+from node_engine.libs.profiler import Profiler
 from node_engine.libs.registry import Registry
-from node_engine.libs.utility import continue_flow, exit_flow_with_error
+from node_engine.libs.speculation import Speculation, SpeculativeRun
+from node_engine.libs.storage import Storage
+from node_engine.libs.utility import (
+    continue_flow,
+    declared_storage_keys,
+    eval_template,
+    exit_flow_with_error,
+)
+from node_engine.models.flow_component import FlowComponent
 from node_engine.models.flow_definition import FlowDefinition
 from node_engine.models.flow_event import FlowEvent
 from node_engine.models.flow_step import FlowStep
@@ -32,15 +47,59 @@ class ConnectionEvent:
         self.message = event
 
 
+def find_component(
+    flow: list[FlowComponent], key: str
+) -> tuple[int, FlowComponent | None]:
+    """
+    Returns the index and component with the given key, or (-1, None).
+    Matching on key avoids comparing whole components, which is O(n) in
+    their config for every component passed over.
+    """
+    for index, item in enumerate(flow):
+        if item.key == key:
+            return index, item
+    return -1, None
+
+
 class Runtime:
-    def __init__(self, registry_root: str) -> None:
+    def __init__(
+        self,
+        registry_root: str,
+        background: BackgroundSupervisor | None = None,
+        speculation: Speculation | None = None,
+        profiler: Profiler | None = None,
+    ) -> None:
         self.registry = Registry(registry_root)
         self.consumers: list[EventConsumer] = []
+        self.background = background or BackgroundSupervisor()
+        # Speculative execution of branches is enabled by passing a
+        # Speculation, see there.
+        self.speculation = speculation
+        # Invocations of flows with `profile` set are always profiled, others
+        # only if the profiler has a latency threshold, see Profiler.
+        self.profiler = profiler or Profiler()
+        # Number of components stopped by their timeout or the invocation's
+        # deadline, by component name.
+        self.timeouts: Counter[str] = Counter()
 
     # Invoke a flow.
     async def invoke(
-        self, flow_definition: FlowDefinition, tunnel_authorization: str | None = None
+        self,
+        flow_definition: FlowDefinition,
+        tunnel_authorization: str | None = None,
+        start_at: str | None = None,
+        on_step: Callable[[FlowDefinition, str], Awaitable[None]] | None = None,
     ) -> FlowDefinition:
+        """
+        Invokes a flow, starting at its first component or at `start_at` when
+        resuming a flow. `on_step` is awaited after every step with the flow
+        definition and the key of the next component ("exit" at the end).
+
+        The flow's `timeout_ms` sets a deadline for the invocation, unless
+        the caller's deadline (see `deadline.scope`) is earlier. Flows that
+        fail validation (see flow_validator) exit with an error before any
+        component runs.
+        """
 
         log = get_flow_logger("runtime", flow_definition, executor=self)
         log("Invoking flow")
@@ -49,15 +108,68 @@ class Runtime:
         if not flow_definition.flow or len(flow_definition.flow) == 0:
             raise Exception("No components found in flow")
 
-        # Start the flow
-        next = flow_definition.flow[0].key
-        # Execute the flow until the next component is "exit".
-        while next != "exit":
-            result = await self.__execute_next(
-                flow_definition, next, tunnel_authorization
+        # Check the flow up front, rather than when reaching a bad step
+        # after the work of the steps before it.
+        validation = validate(flow_definition, self.registry)
+        if not validation.valid:
+            self.exit_flow_with_error(
+                f"Invalid flow: {'; '.join(validation.errors)}",
+                flow_definition,
+                log=log,
             )
-            flow_definition = result.flow_definition
-            next = "exit" if result.next is None else result.next
+            flow_definition.context["session_id"] = flow_definition.session_id
+            return flow_definition
+
+        # Start reading the storage keys the components declare they read,
+        # so the reads overlap instead of each component waiting in turn.
+        storage_keys = self.__storage_keys(flow_definition)
+        timeout = (
+            flow_definition.timeout_ms / 1000
+            if flow_definition.timeout_ms is not None
+            else None
+        )
+        with (
+            tracing.span(
+                f"flow {flow_definition.key}",
+                **{
+                    "flow.key": flow_definition.key,
+                    "session.id": flow_definition.session_id,
+                },
+            ) as span,
+            deadline.scope(timeout),
+            Storage.prefetching(flow_definition.session_id, storage_keys) as prefetch,
+        ):
+            # Start the flow
+            next = start_at or flow_definition.flow[0].key
+            speculative = None
+            start = time.perf_counter()
+            capture = self.profiler.start(flow_definition, inspect.currentframe())
+            try:
+                # Execute the flow until the next component is "exit".
+                while next != "exit":
+                    result, speculative = await self.__execute_next(
+                        flow_definition, next, tunnel_authorization, speculative
+                    )
+                    flow_definition = result.flow_definition
+                    next = "exit" if result.next is None else result.next
+                    if on_step:
+                        await on_step(flow_definition, next)
+            finally:
+                if speculative and self.speculation:
+                    self.speculation.discard(speculative)
+                metrics.flow_duration.observe(
+                    time.perf_counter() - start, flow_definition.key
+                )
+                if span is not None:
+                    span.set_attribute("flow.steps", len(flow_definition.status.trace))
+                    span.error = flow_definition.status.error
+                if capture is not None:
+                    profile_id = await self.profiler.finish(capture)
+                    if profile_id:
+                        log("Saved profile; profile_id: %s", profile_id)
+
+        if storage_keys:
+            log.debug("Storage prefetch: %s", prefetch.stats())
 
         # Add the session_id to the flow context in case
         # it was generated during the flow, since we don't
@@ -70,6 +182,35 @@ class Runtime:
         # Return the flow.
         return flow_definition
 
+    async def invoke_background(
+        self,
+        flow_definition: FlowDefinition,
+        tunnel_authorization: str | None = None,
+        priority: int = 0,
+        coalesce_key: str | None = None,
+    ) -> str:
+        """
+        Queues a flow to run in the background and returns the id of the
+        background task without waiting for the flow to start. Flows queued
+        with the same `coalesce_key` are debounced, see BackgroundSupervisor.
+        """
+        # Background flows are traced as children of the span queueing them,
+        # which may have ended by the time they run.
+        parent = tracing.current()
+
+        async def run() -> FlowDefinition:
+            with tracing.resume(parent):
+                return await self.invoke(flow_definition, tunnel_authorization)
+
+        task = self.background.submit(
+            flow_definition.session_id,
+            flow_definition.key,
+            run,
+            priority=priority,
+            coalesce_key=coalesce_key,
+        )
+        return task.id
+
     def add_event_consumer(
         self,
         session_id: str,
@@ -122,92 +263,277 @@ class Runtime:
             raise Exception("No components found in flow")
 
         # Find the component to invoke by key
-        return await self.__execute_next(
+        result, speculative = await self.__execute_next(
             flow_definition, component_key, tunnel_authorization
         )
+        if speculative and self.speculation:
+            self.speculation.discard(speculative)
+        return result
 
     async def __execute_next(
         self,
         flow_definition: FlowDefinition,
         key: str,
         tunnel_authorization=None,
-    ) -> FlowStep:
+        speculative: SpeculativeRun | None = None,
+    ) -> tuple[FlowStep, SpeculativeRun | None]:
         """
-        Executes the next component in the flow.
+        Executes the next component in the flow, using the result of
+        `speculative` if it ran that component ahead of time. Returns the
+        step and the speculative run of the component after it, if one was
+        started and may be used.
         """
         log = get_flow_logger("runtime", flow_definition, executor=self)
 
         # Find the next component to execute by key
-        flow_component = None
-        for item in flow_definition.flow:
-            if item.key == key:
-                flow_component = item
-                break
+        flow_component = find_component(flow_definition.flow, key)[1]
 
         flow_definition.status.current_component = flow_component
 
         # If no component is found, exit the flow
         if not flow_component:
-            return self.exit_flow_with_error(
-                f"No component found with key: {key}",
-                flow_definition,
-                log=log,
+            return (
+                self.exit_flow_with_error(
+                    f"No component found with key: {key}",
+                    flow_definition,
+                    log=log,
+                ),
+                None,
             )
 
-        log(
-            "Executing component; component_key: %s, component_name: %s",
-            flow_component.key,
-            flow_component.name,
-        )
+        if speculative and self.speculation and speculative.key != key:
+            self.speculation.discard(speculative)
+            speculative = None
 
-        # Execute the component and get the next component to execute
+        result = None
+        component = None
+        next_speculative = None
+        timeout_ms = None
         try:
-            component = self.registry.load_component(
-                flow_component.name,
-                flow_definition,
-                flow_component.key,
-                self,
-                tunnel_authorization=tunnel_authorization,
-            )
-        except Exception as exception:
-            return self.exit_flow_with_error(
-                f"Error loading component: [{flow_component.name}] {exception}",
-                flow_definition,
-                log=log,
+            if speculative and self.speculation:
+                # The speculative run is held to the same limits as the
+                # component run normally, counted from when it started.
+                component = speculative.component
+                timeout_ms = component.config.get("timeout_ms")
+                result = await self.__run_limited(
+                    flow_component,
+                    timeout_ms,
+                    speculative.elapsed_ms(),
+                    lambda: self.speculation.take(speculative, flow_definition),
+                )
+                speculative = None
+
+            if result is not None:
+                log(
+                    "Using speculative result; component_key: %s, component_name: %s",
+                    flow_component.key,
+                    flow_component.name,
+                )
+            else:
+                log(
+                    "Executing component; component_key: %s, component_name: %s",
+                    flow_component.key,
+                    flow_component.name,
+                )
+
+                # Execute the component and get the next component to execute
+                try:
+                    component = self.registry.load_component(
+                        flow_component.name,
+                        flow_definition,
+                        flow_component.key,
+                        self,
+                        tunnel_authorization=tunnel_authorization,
+                    )
+                except Exception as exception:
+                    return (
+                        self.exit_flow_with_error(
+                            f"Error loading component: [{flow_component.name}] {exception}",
+                            flow_definition,
+                            log=log,
+                        ),
+                        None,
+                    )
+                if component is None:
+                    return (
+                        self.exit_flow_with_error(
+                            f"Component not found: {flow_component.name}",
+                            flow_definition,
+                            log=log,
+                        ),
+                        None,
+                    )
+
+                next_speculative = self.__speculate(
+                    flow_definition, component, tunnel_authorization
+                )
+
+                timeout_ms = component.config.get("timeout_ms")
+                result = await self.__run_limited(
+                    flow_component, timeout_ms, 0, component.invoke_execute
+                )
+        except TimeoutError:
+            for run in (speculative, next_speculative):
+                if run and self.speculation:
+                    self.speculation.discard(run)
+            self.timeouts[flow_component.name] += 1
+            if component is not None:
+                await component.telemetry.increment_key("timeouts")
+            reason = (
+                "invocation deadline exceeded"
+                if deadline.expired()
+                else f"timeout_ms={timeout_ms}"
             )
-        if component is None:
-            return self.exit_flow_with_error(
-                f"Component not found: {flow_component.name}",
-                flow_definition,
-                log=log,
+            return (
+                self.exit_flow_with_error(
+                    f"component timed out. name={flow_component.name}, {reason}",
+                    flow_definition,
+                    log=log,
+                    component=component,
+                ),
+                None,
             )
-
-        try:
-            result = await component.invoke_execute()
         except Exception as exception:
+            if next_speculative and self.speculation:
+                self.speculation.discard(next_speculative)
             stacktrace = traceback.format_exc()
-            return self.exit_flow_with_error(
-                f"error executing component. name={flow_component.name}], error: {exception}, stack={stacktrace}",
-                flow_definition,
-                log=log,
-                component=component,
+            return (
+                self.exit_flow_with_error(
+                    f"error executing component. name={flow_component.name}], error: {exception}, stack={stacktrace}",
+                    flow_definition,
+                    log=log,
+                    component=component,
+                ),
+                None,
             )
 
         flow_definition = result.flow_definition
 
         if result.next is None:
             # No next component defined by component, so get next from flow.
-            next_index = flow_definition.flow.index(flow_component) + 1
+            next_index = find_component(flow_definition.flow, flow_component.key)[0] + 1
             if next_index >= len(flow_definition.flow):
                 # No more components in flow, exit.
-                return continue_flow("exit", flow_definition)
+                next = "exit"
             else:
                 # Get key of next component in flow.
-                return continue_flow(
-                    flow_definition.flow[next_index].key, flow_definition
-                )
+                next = flow_definition.flow[next_index].key
         else:
-            return continue_flow(result.next, flow_definition)
+            next = result.next
+
+        if next_speculative and self.speculation:
+            if not self.speculation.resolve(
+                next_speculative,
+                flow_definition.key,
+                flow_component.key,
+                component,
+                next,
+            ):
+                next_speculative = None
+
+        return continue_flow(next, flow_definition), next_speculative
+
+    async def __run_limited(
+        self,
+        flow_component: FlowComponent,
+        timeout_ms: float | None,
+        elapsed_ms: float,
+        step: Callable[[], Awaitable[FlowStep | None]],
+    ) -> FlowStep | None:
+        """
+        Runs a component step as a span, within the invocation's deadline and
+        the component's `timeout_ms` less the `elapsed_ms` it already ran.
+        Raises TimeoutError when either is exceeded.
+        """
+        # The component's timeout also bounds the remote calls it makes,
+        # through the deadline.
+        with deadline.scope(
+            (timeout_ms - elapsed_ms) / 1000 if timeout_ms is not None else None
+        ):
+            # A finished speculative run may already be over its timeout.
+            if deadline.expired():
+                raise TimeoutError()
+            async with asyncio.timeout(deadline.remaining()):
+                with tracing.span(
+                    f"component {flow_component.name}",
+                    **{
+                        "component.key": flow_component.key,
+                        "component.name": flow_component.name,
+                    },
+                ) as span:
+                    result = await step()
+                    if span is not None and result is not None:
+                        span.error = result.flow_definition.status.error
+                    return result
+
+    def __speculate(
+        self,
+        flow_definition: FlowDefinition,
+        component: NodeEngineComponent,
+        tunnel_authorization=None,
+    ) -> SpeculativeRun | None:
+        """
+        Starts the likely successor of a side effect free branching component,
+        when speculation is enabled and the successor is side effect free.
+        """
+        if not self.speculation or not component.side_effect_free:
+            return None
+
+        key = self.speculation.predict(
+            flow_definition.key,
+            component.component_key,
+            component.candidate_successors(),
+        )
+        successor = find_component(flow_definition.flow, key)[1] if key else None
+        if successor is None:
+            return None
+
+        fork = self.speculation.fork(flow_definition)
+        try:
+            speculative_component = self.registry.load_component(
+                successor.name,
+                fork,
+                successor.key,
+                self,
+                tunnel_authorization=tunnel_authorization,
+            )
+        except Exception:
+            # Reported when the component runs normally.
+            return None
+        if speculative_component is None or not speculative_component.side_effect_free:
+            return None
+
+        return self.speculation.start(successor.key, speculative_component, fork)
+
+    def __storage_keys(self, flow_definition: FlowDefinition) -> list[str]:
+        """
+        Returns the storage keys declared by the components of the flow, read
+        from the registry's metadata index and the flow's config rather than
+        by loading the components. Components that are unknown or fail to
+        load are skipped here and reported when they are executed.
+        """
+        keys = []
+        for flow_component in flow_definition.flow:
+            info = self.registry.component_info(flow_component.name)
+            if info is None or info["error"]:
+                continue
+
+            # Resolves config options like ComponentConfig.get, evaluating
+            # templates only in the options naming a storage key.
+            def get_config(
+                name: str,
+                config: dict = flow_component.config,
+                defaults: dict = info["default_config"] or {},
+            ) -> Any:
+                if name not in config:
+                    return defaults.get(name)
+                value = config[name]
+                if isinstance(value, str):
+                    return eval_template(value, flow_definition.context)
+                return value
+
+            keys.extend(declared_storage_keys(info["reads_from"], get_config))
+        return keys
 
     def exit_flow_with_error(
         self,
@@ -216,11 +542,10 @@ class Runtime:
         log: logging.Logger | logging.LoggerAdapter,
         component: NodeEngineComponent | None = None,
     ):
-        debug_information = debug_collector.collect(
+        debug_information = debug_collector.reference(
             message=message,
             flow_definition=flow_definition,
-            component_info=component.__class__.get_info() if component else {},
-            component_source=component._source_code() if component else None,
+            component=component,
         )
         return exit_flow_with_error(
             message,
@@ -0,0 +1,178 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import array
+import gzip
+import json
+import sys
+from dataclasses import dataclass
+from typing import Any
+
+json_content_type = "application/json"
+msgpack_content_type = "application/msgpack"
+content_types = [json_content_type, msgpack_content_type]
+content_encodings = ["gzip", "zstd"]
+
+# msgpack extension type used for lists of floats (e.g. embeddings), which are
+# packed as raw little-endian float32 arrays. This halves their size compared
+# to msgpack doubles, at the cost of float32 precision. Shorter lists are left
+# as regular msgpack arrays.
+float32_array_ext_type = 1
+float32_array_min_length = 16
+
+
+@dataclass
+class WireFormat:
+    """
+    Serialization format used for requests to the node engine service.
+    JSON without compression is the default.
+    """
+
+    content_type: str = json_content_type
+    content_encoding: str | None = None
+
+    def __post_init__(self) -> None:
+        if self.content_type not in content_types:
+            raise Exception(f"unsupported content type: {self.content_type}")
+        if self.content_encoding and self.content_encoding not in content_encodings:
+            raise Exception(f"unsupported content encoding: {self.content_encoding}")
+
+    def headers(self) -> dict[str, str]:
+        headers = {"Content-Type": self.content_type, "Accept": self.content_type}
+        if self.content_encoding:
+            headers["Content-Encoding"] = self.content_encoding
+            headers["Accept-Encoding"] = self.content_encoding
+        return headers
+
+    def encode(self, data: Any) -> bytes:
+        return encode(data, self.content_type, self.content_encoding)
+
+    def decode(self, body: bytes, content_type: str | None) -> Any:
+        # Compressed responses are decompressed by httpx, so only the content
+        # type needs handling here.
+        return decode(body, content_type or json_content_type)
+
+
+def encode(
+    data: Any,
+    content_type: str = json_content_type,
+    content_encoding: str | None = None,
+) -> bytes:
+    if _media_type(content_type) == msgpack_content_type:
+        msgpack = _import_msgpack()
+        body = msgpack.packb(_pack_float_arrays(data, msgpack))
+    else:
+        body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode(
+            "utf-8"
+        )
+    return compress(body, content_encoding)
+
+
+def decode(
+    body: bytes,
+    content_type: str = json_content_type,
+    content_encoding: str | None = None,
+) -> Any:
+    body = decompress(body, content_encoding)
+    if _media_type(content_type) == msgpack_content_type:
+        msgpack = _import_msgpack()
+        return msgpack.unpackb(body, ext_hook=_unpack_ext)
+    return json.loads(body)
+
+
+def compress(body: bytes, content_encoding: str | None) -> bytes:
+    match content_encoding:
+        case None | "" | "identity":
+            return body
+        case "gzip":
+            return gzip.compress(body, compresslevel=6)
+        case "zstd":
+            return _import_zstandard().ZstdCompressor().compress(body)
+        case _:
+            raise Exception(f"unsupported content encoding: {content_encoding}")
+
+
+def decompress(body: bytes, content_encoding: str | None) -> bytes:
+    match content_encoding:
+        case None | "" | "identity":
+            return body
+        case "gzip":
+            return gzip.decompress(body)
+        case "zstd":
+            return (
+                _import_zstandard().ZstdDecompressor().decompressobj().decompress(body)
+            )
+        case _:
+            raise Exception(f"unsupported content encoding: {content_encoding}")
+
+
+def negotiate_content_type(accept: str | None) -> str:
+    """
+    Returns the first supported content type listed in an Accept header,
+    defaulting to JSON.
+    """
+    for media_type in (accept or "").split(","):
+        media_type = _media_type(media_type)
+        if media_type in content_types:
+            return media_type
+    return json_content_type
+
+
+def negotiate_content_encoding(accept_encoding: str | None) -> str | None:
+    """
+    Returns the first supported content encoding listed in an Accept-Encoding
+    header, or None if there isn't one.
+    """
+    for encoding in (accept_encoding or "").split(","):
+        encoding = encoding.split(";")[0].strip().lower()
+        if encoding in content_encodings:
+            return encoding
+    return None
+
+
+def _media_type(content_type: str) -> str:
+    return content_type.split(";")[0].strip().lower()
+
+
+def _pack_float_arrays(value: Any, msgpack) -> Any:
+    if isinstance(value, dict):
+        return {key: _pack_float_arrays(item, msgpack) for key, item in value.items()}
+    if isinstance(value, list):
+        if len(value) >= float32_array_min_length and all(
+            type(item) is float for item in value
+        ):
+            values = array.array("f", value)
+            if sys.byteorder == "big":
+                values.byteswap()
+            return msgpack.ExtType(float32_array_ext_type, values.tobytes())
+        return [_pack_float_arrays(item, msgpack) for item in value]
+    return value
+
+
+def _unpack_ext(code: int, data: bytes) -> Any:
+    if code != float32_array_ext_type:
+        raise Exception(f"unsupported msgpack extension type: {code}")
+    values = array.array("f")
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tolist()
+
+
+def _import_msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise Exception(
+            f"{msgpack_content_type} requires the msgpack package, install node-engine[binary]"
+        )
+    return msgpack
+
+
+def _import_zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise Exception(
+            "zstd content encoding requires the zstandard package, install node-engine[binary]"
+        )
+    return zstandard
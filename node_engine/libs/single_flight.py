@@ -0,0 +1,75 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, TypeVar
+
+from node_engine.libs import deadline
+
+T = TypeVar("T")
+
+
+def request_key(**parts: Any) -> str:
+    """
+    Returns a stable hash of the given request parts. Parts that are None are
+    left out, so unset optional parameters don't change the key.
+    """
+    request = {key: value for key, value in parts.items() if value is not None}
+    return hashlib.sha256(
+        json.dumps(request, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one: the first caller
+    starts the call and later callers await the same result (or exception)
+    until it completes. Calls started after completion run again.
+
+    The shared call runs without the deadline of the caller starting it (see
+    `deadline`), so that caller running out of time doesn't fail the others.
+    Each caller waits until its own deadline instead, and the call is
+    cancelled once no caller waits for it.
+    """
+
+    def __init__(self) -> None:
+        self.in_flight: dict[str, asyncio.Task] = {}
+        # Number of callers waiting for each shared call.
+        self.waiters: dict[asyncio.Task, int] = {}
+        self.calls = 0
+        self.collapsed = 0
+
+    async def do(self, key: str, call: Callable[[], Awaitable[T]]) -> T:
+        task = self.in_flight.get(key)
+        if task is None:
+            self.calls += 1
+            with deadline.detached():
+                task = asyncio.ensure_future(call())
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self._done(key, done))
+        else:
+            self.collapsed += 1
+        self.waiters[task] = self.waiters.get(task, 0) + 1
+        try:
+            # Shield the shared call, so a caller being cancelled or timing
+            # out doesn't cancel it for the others.
+            return await asyncio.wait_for(asyncio.shield(task), deadline.remaining())
+        finally:
+            self.waiters[task] -= 1
+            if not self.waiters[task]:
+                del self.waiters[task]
+                task.cancel()
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        self.in_flight.pop(key, None)
+        # Mark the exception as retrieved in case every caller was cancelled.
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "in_flight": len(self.in_flight),
+            "calls": self.calls,
+            "collapsed": self.collapsed,
+        }
@@ -0,0 +1,184 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import asyncio
+import time
+from collections import Counter
+from typing import Any
+
+from node_engine.libs.context import apply_delta
+from node_engine.libs.node_engine_component import NodeEngineComponent
+from node_engine.models.flow_definition import FlowDefinition
+from node_engine.models.flow_status import FlowStatus
+from node_engine.models.flow_step import FlowStep
+
+
+class SpeculativeRun:
+    """
+    A component started ahead of the branch decision that leads to it, on a
+    copy of the flow definition so its changes can be merged or discarded.
+    """
+
+    def __init__(
+        self, key: str, component: NodeEngineComponent, flow_definition: FlowDefinition
+    ) -> None:
+        self.key = key
+        self.component = component
+        self.flow_definition = flow_definition
+        self.started = time.perf_counter()
+        self.finished: float | None = None
+        # Context keys written by the branch, which the component must not
+        # have read for its result to be used.
+        self.conflicts: set[str] = set()
+        self.overlap_ms = 0.0
+        self.task = asyncio.ensure_future(component.invoke_execute())
+        self.task.add_done_callback(self._done)
+
+    def _done(self, task: asyncio.Task) -> None:
+        self.finished = time.perf_counter()
+        # The exception is raised again when the component runs normally.
+        if not task.cancelled():
+            task.exception()
+
+    def elapsed_ms(self) -> float:
+        return ((self.finished or time.perf_counter()) - self.started) * 1000
+
+    def cancel(self) -> None:
+        self.task.cancel()
+
+    async def take(self, flow_definition: FlowDefinition) -> FlowStep | None:
+        """
+        Waits for the component and merges its context changes, log and
+        trace into `flow_definition`. Returns None, leaving the flow
+        definition untouched, if the component raised or read a context key
+        the branch changed.
+        """
+        try:
+            result = await self.task
+        except Exception:
+            return None
+        if self.conflicts & self.component.context.reads:
+            return None
+
+        apply_delta(
+            flow_definition.context,
+            self.component.context.delta(result.flow_definition.context),
+        )
+        status = result.flow_definition.status
+        flow_definition.status.log.extend(status.log)
+        flow_definition.status.trace.extend(status.trace)
+        if status.error:
+            flow_definition.status.error = status.error
+        return FlowStep(next=result.next, flow_definition=flow_definition)
+
+
+class Speculation:
+    """
+    Speculative execution of branches. While a branching component runs
+    (one that returns its `candidate_successors`), the successor it most
+    often chose before, in the same flow, is started concurrently. The
+    speculative result is used when the branch picks that successor and
+    didn't change any context key the successor read, and is discarded
+    otherwise.
+
+    Only components marked `side_effect_free` take part, both as the branch
+    and as the successor, since discarded work must leave nothing behind.
+    """
+
+    def __init__(self) -> None:
+        self.choices: dict[tuple[str, str], Counter[str]] = {}
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.saved_ms = 0.0
+        self.wasted_ms = 0.0
+
+    def predict(
+        self, flow_key: str, component_key: str, candidates: list[str]
+    ) -> str | None:
+        """
+        Returns the candidate chosen most often so far, the first one when
+        there is no history.
+        """
+        if not candidates:
+            return None
+        counts = self.choices.get((flow_key, component_key)) or Counter()
+        return max(candidates, key=lambda candidate: counts[candidate])
+
+    def start(
+        self,
+        key: str,
+        component: NodeEngineComponent,
+        flow_definition: FlowDefinition,
+    ) -> SpeculativeRun:
+        self.started += 1
+        return SpeculativeRun(key, component, flow_definition)
+
+    @staticmethod
+    def fork(flow_definition: FlowDefinition) -> FlowDefinition:
+        """
+        Returns a copy of the flow definition for a speculative run, sharing
+        context values (see `Context.get`) and with an empty status. Log
+        entries of the run are kept in its status, merged when it is used,
+        but not streamed to clients, since it may be discarded.
+        """
+        context = dict(flow_definition.context)
+        context.pop("stream_log", None)
+        return FlowDefinition(
+            key=flow_definition.key,
+            session_id=flow_definition.session_id,
+            flow=flow_definition.flow,
+            registry=flow_definition.registry,
+            context=context,
+            status=FlowStatus(),
+        )
+
+    def resolve(
+        self,
+        run: SpeculativeRun,
+        flow_key: str,
+        component_key: str,
+        branch: NodeEngineComponent,
+        next: str,
+    ) -> bool:
+        """
+        Records the branch decision and returns whether the speculative run
+        may be used, cancelling it if not. It is used if `take` succeeds.
+        """
+        self.choices.setdefault((flow_key, component_key), Counter())[next] += 1
+
+        run.conflicts = set(branch.context.written_keys())
+        if run.key == next and not run.conflicts & run.component.context.reads:
+            # Time the successor ran alongside the branch.
+            run.overlap_ms = run.elapsed_ms()
+            return True
+
+        self.discard(run)
+        return False
+
+    async def take(
+        self, run: SpeculativeRun, flow_definition: FlowDefinition
+    ) -> FlowStep | None:
+        result = await run.take(flow_definition)
+        if result is None:
+            self.misses += 1
+            self.wasted_ms += run.elapsed_ms()
+        else:
+            self.hits += 1
+            self.saved_ms += run.overlap_ms
+        return result
+
+    def discard(self, run: SpeculativeRun) -> None:
+        run.cancel()
+        self.misses += 1
+        self.wasted_ms += run.elapsed_ms()
+
+    def stats(self) -> dict[str, Any]:
+        resolved = self.hits + self.misses
+        return {
+            "started": self.started,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / resolved if resolved else 0.0,
+            "saved_ms": self.saved_ms,
+            "wasted_ms": self.wasted_ms,
+        }
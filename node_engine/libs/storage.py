@@ -1,12 +1,104 @@
 # Copyright (c) Microsoft. All rights reserved.
 
+import asyncio
 import contextlib
 import json
 import os
+import time
 import uuid
+from contextvars import ContextVar
+from functools import wraps
 from pathlib import Path
 from typing import IO, Any
 
+from node_engine.libs import metrics
+
+
+def _read_file(filename: str) -> str | None:
+    try:
+        with open(filename, mode="r") as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
+
+
+def _timed(operation: str):
+    # Records the latency of a storage operation, see metrics.
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                metrics.storage_duration.observe(time.perf_counter() - start, operation)
+
+        return wrapper
+
+    return decorator
+
+
+class StoragePrefetch:
+    """
+    Reads of session storage keys started ahead of time, in worker threads,
+    so they overlap with each other and with the work done before the keys
+    are read. While active (see `Storage.prefetching`), `Storage.get` serves
+    reads of the keys from the prefetched contents unless the key was written
+    since its read started, in which case it is read again.
+    """
+
+    # Prefetches in progress, so writes can invalidate their reads.
+    active: set["StoragePrefetch"] = set()
+
+    def __init__(self, session_id: str, keys: list[str]) -> None:
+        self.session_id = session_id
+        self.reads: dict[str, asyncio.Task[str | None]] = {}
+        self.hits = 0
+        self.misses = 0
+        for key in dict.fromkeys(keys):
+            filename = str(Path(Storage.root_path, session_id, key).absolute())
+            task = asyncio.ensure_future(asyncio.to_thread(_read_file, filename))
+            # Errors are raised again by the fallback read, if it happens.
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self.reads[key] = task
+
+    async def get(self, key: str) -> tuple[bool, str | None]:
+        """
+        Returns whether the key was prefetched and not written since, and its
+        raw contents (None if it doesn't exist).
+        """
+        task = self.reads.get(key)
+        if task is None:
+            self.misses += 1
+            return False, None
+        try:
+            contents = await task
+        except Exception:
+            self.misses += 1
+            return False, None
+        if self.reads.get(key) is not task:
+            # Written while the read was in progress.
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        return True, contents
+
+    def invalidate(self, key: str) -> None:
+        # Reads in worker threads can't be interrupted, so tasks are dropped
+        # rather than cancelled.
+        self.reads.pop(key, None)
+
+    def close(self) -> None:
+        self.reads.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+_prefetch: ContextVar[StoragePrefetch | None] = ContextVar(
+    "storage_prefetch", default=None
+)
+
 
 class Storage:
     root_path: str = "storage"
@@ -24,22 +116,46 @@ class Storage:
         return await Storage.get_file_name(session_id, f"_temp-{uuid.uuid4().hex}")
 
     @staticmethod
-    async def get(session_id, key, raw=False) -> Any | None:
-        if not os.path.exists(await Storage.get_file_name(session_id, key)):
-            return None
+    @contextlib.contextmanager
+    def prefetching(session_id: str, keys: list[str]):
+        """
+        Starts reading the given keys of a session and serves `get` calls
+        made within the context (including from tasks it starts) from the
+        prefetched contents.
+        """
+        prefetch = StoragePrefetch(session_id, keys)
+        token = _prefetch.set(prefetch)
+        StoragePrefetch.active.add(prefetch)
+        try:
+            yield prefetch
+        finally:
+            StoragePrefetch.active.discard(prefetch)
+            _prefetch.reset(token)
+            # Tasks started within the context keep it, but no longer use it.
+            prefetch.close()
 
+    @staticmethod
+    @_timed("get")
+    async def get(session_id, key, raw=False) -> Any | None:
         filename = await Storage.get_file_name(session_id, key)
-        with open(filename, mode="r") as file:
-            if raw:
-                contents = file.read()
-            else:
-                try:
-                    contents = json.load(file)
-                except Exception as exception:
-                    raise Exception(
-                        f"unable to parse storage file ({filename}) contents: {exception}"
-                    )
+
+        prefetch = _prefetch.get()
+        found = False
+        if prefetch is not None and prefetch.session_id == session_id:
+            found, contents = await prefetch.get(key)
+        if not found:
+            if not os.path.exists(filename):
+                return None
+            contents = _read_file(filename)
+
+        if contents is None or raw:
             return contents
+        try:
+            return json.loads(contents)
+        except Exception as exception:
+            raise Exception(
+                f"unable to parse storage file ({filename}) contents: {exception}"
+            )
 
     @staticmethod
     async def stream(session_id, key) -> contextlib.closing[IO[str]]:
@@ -50,10 +166,12 @@ class Storage:
             raise FileNotFoundError(f"file not found: {filename}")
 
     @staticmethod
+    @_timed("set")
     async def set(session_id, key, value, raw=False) -> None:
         # write to temp file first to avoid corrupting the file if the process is interrupted
         # or json encoding fails
         file_path = await Storage.get_file_name(session_id, key)
+        Storage._written(session_id, key)
         temp_file_path = await Storage._get_temp_file_name(session_id)
 
         try:
@@ -70,8 +188,10 @@ class Storage:
             Path(temp_file_path).unlink(missing_ok=True)
 
     @staticmethod
+    @_timed("append")
     async def append(session_id, key, value, raw=False) -> None:
         file_path = await Storage.get_file_name(session_id, key)
+        Storage._written(session_id, key)
         with open(file_path, mode="a") as file:
             if raw and isinstance(value, str):
                 file.write(value)
@@ -79,11 +199,30 @@ class Storage:
                 json.dump(value, file)
 
     @staticmethod
+    @_timed("delete")
     async def delete(session_id, key) -> None:
         filename = await Storage.get_file_name(session_id, key)
+        Storage._written(session_id, key)
         if os.path.exists(filename):
             os.remove(filename)
 
+    @staticmethod
+    def _written(session_id, key) -> None:
+        for prefetch in StoragePrefetch.active:
+            if prefetch.session_id == session_id:
+                prefetch.invalidate(key)
+
+    @staticmethod
+    async def keys(session_id) -> list[str]:
+        session_path = Path(Storage.root_path, session_id)
+        if not os.path.isdir(session_path):
+            return []
+        return sorted(
+            file.name
+            for file in session_path.iterdir()
+            if file.is_file() and not file.name.startswith("_temp-")
+        )
+
     @staticmethod
     async def list(session_id) -> list[str]:
         files = list(Path(Storage.root_path).glob(f"{session_id}_*"))
@@ -0,0 +1,338 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+"""
+Span based tracing of flows and components. Each flow invocation and each
+component step is a span, child of the span that was current when it
+started: the component that invoked a sub-flow, the flow that queued a
+background flow, or, across services, the remote caller whose span context
+came in the W3C `traceparent` header.
+
+Tracing is off until `configure` is called with an exporter. Sampling is
+decided once per trace, at its root span, and followed by every span and
+service in the trace. Finished spans are exported in batches from a worker
+thread, so the event loop only creates them and puts them in a queue.
+"""
+
+import contextlib
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Mapping, Protocol
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+traceparent_header = "traceparent"
+
+
+@dataclass(frozen=True)
+class SpanContext:
+    trace_id: str
+    span_id: str
+    sampled: bool
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+
+@dataclass
+class Span:
+    name: str
+    context: SpanContext
+    parent_id: str | None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int | None = None
+    # Error message, if the span failed.
+    error: str | None = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_otlp(self) -> dict[str, Any]:
+        """
+        Returns the span in the OTLP/JSON format.
+        """
+        span = {
+            "traceId": self.context.trace_id,
+            "spanId": self.context.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [
+                {"key": key, "value": _otlp_value(value)}
+                for key, value in self.attributes.items()
+            ],
+            "status": (
+                {"code": 2, "message": self.error} if self.error else {"code": 1}
+            ),
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Exporter(Protocol):
+    def export(self, spans: list[Span]) -> None: ...
+
+
+class FileExporter:
+    """
+    Appends spans to a file, one OTLP/JSON span per line.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def export(self, spans: list[Span]) -> None:
+        with open(self.path, mode="a") as file:
+            for span in spans:
+                file.write(json.dumps(span.to_otlp()) + "\n")
+
+
+class OTLPExporter:
+    """
+    Sends spans to an OTLP/HTTP collector, e.g. the OpenTelemetry Collector
+    or Jaeger, as JSON to `<endpoint>/v1/traces`.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        service_name: str = "node-engine",
+        headers: dict[str, str] | None = None,
+    ) -> None:
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.headers = headers or {}
+
+    def export(self, spans: list[Span]) -> None:
+        body = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": {"stringValue": self.service_name},
+                            }
+                        ]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "node_engine"},
+                            "spans": [span.to_otlp() for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        response = httpx.post(self.url, json=body, headers=self.headers, timeout=10)
+        response.raise_for_status()
+
+
+class Tracer:
+    """
+    Samples traces and exports finished spans from a worker thread, in
+    batches of up to `batch_size` spans at least every `interval` seconds.
+    Spans are dropped when more than `max_queued` wait to be exported.
+    """
+
+    def __init__(
+        self,
+        exporter: Exporter,
+        sample_rate: float = 1.0,
+        batch_size: int = 512,
+        interval: float = 5.0,
+        max_queued: int = 8192,
+    ) -> None:
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_queued = max_queued
+        self.dropped = 0
+        self._queue: queue.Queue[Span | None] = queue.Queue()
+        self._flushed = threading.Event()
+        self._thread = threading.Thread(target=self._work, daemon=True)
+        self._thread.start()
+
+    def sample(self, trace_id: str) -> bool:
+        # Decided from the trace id, so every service sampling at the same
+        # rate makes the same decision.
+        return int(trace_id[16:], 16) < self.sample_rate * 2**64
+
+    def record(self, span: Span) -> None:
+        if self._queue.qsize() >= self.max_queued:
+            self.dropped += 1
+            return
+        self._queue.put_nowait(span)
+
+    def flush(self, timeout: float = 10) -> None:
+        """
+        Exports the spans recorded so far, waiting up to `timeout` seconds.
+        """
+        self._flushed.clear()
+        self._queue.put_nowait(None)
+        self._flushed.wait(timeout)
+
+    def _work(self) -> None:
+        while True:
+            batch: list[Span] = []
+            flush = False
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                try:
+                    span = self._queue.get(
+                        timeout=max(0.0, deadline - time.monotonic())
+                    )
+                except queue.Empty:
+                    break
+                if span is None:
+                    flush = True
+                    break
+                batch.append(span)
+            if batch:
+                try:
+                    self.exporter.export(batch)
+                except Exception:
+                    logger.exception("Failed to export %s spans", len(batch))
+            if flush:
+                self._flushed.set()
+
+
+_tracer: Tracer | None = None
+
+# Span context of the current span, or of the remote caller's span.
+_current: ContextVar[SpanContext | None] = ContextVar("span", default=None)
+
+
+def configure(tracer: Tracer | None) -> None:
+    """
+    Sets the tracer spans are sampled and exported with, or turns tracing off
+    with None.
+    """
+    global _tracer
+    _tracer = tracer
+
+
+def flush() -> None:
+    if _tracer is not None:
+        _tracer.flush()
+
+
+def current() -> SpanContext | None:
+    return _current.get()
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span | None]:
+    """
+    Runs the code within the context in a new span, child of the current
+    one, and yields it, or None when the trace is not sampled. The span
+    records the error if the code raises.
+    """
+    tracer = _tracer
+    parent = _current.get()
+    if tracer is None or (parent is not None and not parent.sampled):
+        yield None
+        return
+
+    if parent is None:
+        trace_id = _new_id(128)
+        sampled = tracer.sample(trace_id)
+    else:
+        trace_id = parent.trace_id
+        sampled = True
+    context = SpanContext(trace_id, _new_id(64), sampled)
+    token = _current.set(context)
+    if not sampled:
+        # Later spans of the trace, here and in the services it calls, are
+        # not sampled either.
+        try:
+            yield None
+        finally:
+            _current.reset(token)
+        return
+
+    span = Span(
+        name,
+        context,
+        parent.span_id if parent else None,
+        attributes,
+    )
+    try:
+        yield span
+    except BaseException as exception:
+        span.error = span.error or f"{type(exception).__name__}: {exception}"
+        raise
+    finally:
+        _current.reset(token)
+        span.end_ns = time.time_ns()
+        tracer.record(span)
+
+
+@contextlib.contextmanager
+def resume(parent: SpanContext | None) -> Iterator[None]:
+    """
+    Makes `parent` the current span context within the context, for work
+    continuing a trace elsewhere, such as a request from another service or
+    a background flow.
+    """
+    if parent is None:
+        yield
+        return
+    token = _current.set(parent)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def headers() -> dict[str, str]:
+    """
+    Returns the header propagating the current span context to a service.
+    """
+    context = _current.get()
+    if context is None:
+        return {}
+    return {traceparent_header: context.traceparent()}
+
+
+def from_headers(headers: Mapping[str, str]) -> SpanContext | None:
+    """
+    Returns the span context sent by a caller, or None.
+    """
+    value = headers.get(traceparent_header)
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        flags = int(parts[3][:2], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    return SpanContext(parts[1], parts[2], bool(flags & 1))
@@ -3,6 +3,7 @@
 import json
 import os
 import re
+from typing import Any, Callable
 
 from dotenv import load_dotenv
 
@@ -63,6 +64,43 @@ def continue_flow(next: str | None, flow_definition: FlowDefinition) -> FlowStep
     )
 
 
+def declared_context_keys(reads_from: dict | None) -> list[str] | None:
+    """
+    Returns the context keys declared in a component's `reads_from` metadata,
+    or None if the component does not declare them as a dict of keys (e.g.
+    "as defined in config"), in which case any key may be read.
+    """
+    if not isinstance(reads_from, dict) or "context" not in reads_from:
+        return None
+    context = reads_from["context"]
+    if not isinstance(context, dict):
+        return None
+    return list(context.keys())
+
+
+def declared_storage_keys(
+    reads_from: dict | None, get_config: Callable[[str], Any]
+) -> list[str]:
+    """
+    Returns the session storage keys declared in the "storage" section of a
+    component's `reads_from` metadata. An entry with a "config" field names
+    the config option that overrides its key, read with `get_config` (e.g.
+    ComponentConfig.get).
+    """
+    if not isinstance(reads_from, dict):
+        return []
+    storage = reads_from.get("storage")
+    if not isinstance(storage, dict):
+        return []
+    keys = []
+    for key, declaration in storage.items():
+        if isinstance(declaration, dict) and declaration.get("config"):
+            key = get_config(declaration["config"]) or key
+        if isinstance(key, str):
+            keys.append(key)
+    return keys
+
+
 def eval_template(template_string: str, values: dict) -> str | dict | list:
     """
     Use template string to walk through the values dict to find the
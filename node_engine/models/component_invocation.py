@@ -0,0 +1,27 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+from pydantic import Field
+
+from node_engine.models.flow_component import FlowComponent
+from node_engine.models.flow_status import FlowStatus
+from node_engine.models.node_engine_base_model import NodeEngineBaseModel
+
+
+# Compact request/response pair used to run a single component on a remote
+# node engine service. Instead of the whole flow definition, only the context
+# keys the component reads are sent, and only the context changes it made are
+# returned. Other components in `flow` carry their key and name but no config,
+# so the remote runtime can still resolve the default next component.
+class ComponentInvocation(NodeEngineBaseModel):
+    key: str
+    session_id: str
+    component_key: str
+    flow: list[FlowComponent]
+    context: dict = {}
+
+
+class ComponentInvocationResult(NodeEngineBaseModel):
+    next: str | None
+    context_delta: dict = {}
+    # Status entries (log, trace, error) produced by the remote invocation.
+    status: FlowStatus = Field(default=FlowStatus())
@@ -1,9 +1,15 @@
 # Copyright (c) Microsoft. All rights reserved.
 
+from pydantic import ConfigDict
+
 from node_engine.models.node_engine_base_model import NodeEngineBaseModel
 
 
 class FlowComponent(NodeEngineBaseModel):
+    # Flow components are never modified once a flow is loaded, so instances
+    # can be shared between a flow, its sub-flows and status without copying.
+    model_config = ConfigDict(frozen=True)
+
     key: str
     name: str
     config: dict = {}
@@ -17,3 +17,7 @@ class FlowDefinition(NodeEngineBaseModel):
     registry: list[ComponentRegistration] | None = None
     context: dict = {}
     status: FlowStatus = Field(default=FlowStatus())
+    # Time allowed for the invocation of the flow, in milliseconds.
+    timeout_ms: int | None = None
+    # Save a profile of the invocation, see Profiler.
+    profile: bool = False
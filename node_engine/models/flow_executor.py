@@ -19,4 +19,12 @@ class FlowExecutor(Protocol):
         tunnel_authorization: str | None = None,
     ) -> FlowStep: ...
 
+    async def invoke_background(
+        self,
+        flow_definition: FlowDefinition,
+        tunnel_authorization: str | None = None,
+        priority: int = 0,
+        coalesce_key: str | None = None,
+    ) -> str: ...
+
     async def emit(self, event: FlowEvent, connection_id: str | None = None): ...
@@ -0,0 +1,31 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import time
+from enum import Enum
+
+from pydantic import Field
+
+from node_engine.models.flow_definition import FlowDefinition
+from node_engine.models.node_engine_base_model import NodeEngineBaseModel
+
+
+class JobStatusEnum(str, Enum):
+    queued = "queued"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+
+# A flow invocation running in the background. The job is checkpointed after
+# every step: `flow_definition` holds the flow as returned by the last
+# completed component and `next` the key of the component to run next, which
+# is where the flow resumes if the service restarts.
+class FlowJob(NodeEngineBaseModel):
+    id: str
+    status: JobStatusEnum = JobStatusEnum.queued
+    flow_definition: FlowDefinition
+    next: str | None = None
+    steps: int = 0
+    error: str | None = None
+    created: float = Field(default_factory=time.time)
+    updated: float = Field(default_factory=time.time)
@@ -0,0 +1,10 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+from node_engine.models.node_engine_base_model import NodeEngineBaseModel
+
+
+class FlowValidation(NodeEngineBaseModel):
+    # Flows with errors would fail when run, warnings are likely mistakes.
+    valid: bool
+    errors: list[str] = []
+    warnings: list[str] = []
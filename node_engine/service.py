@@ -3,50 +3,182 @@
 import asyncio
 from typing import Any, AsyncGenerator
 
-from fastapi import FastAPI, Request
+from fastapi import APIRouter, FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from sse_starlette.sse import EventSourceResponse
 
+from node_engine.libs import deadline, debug_collector, metrics, tracing
+from node_engine.libs.background_supervisor import BackgroundSupervisor
+from node_engine.libs.context import Context
+from node_engine.libs.flow_validator import validate
+from node_engine.libs.job_manager import JobManager
+from node_engine.libs.loop_monitor import LoopMonitor
+from node_engine.libs.negotiated_route import NegotiatedResponse, NegotiatedRoute
+from node_engine.libs.profiler import Profiler
 from node_engine.libs.runtime import Runtime
+from node_engine.libs.speculation import Speculation
 from node_engine.libs.sse_state import SSEState
 from node_engine.libs.utility import exit_flow_with_error
+from node_engine.models.component_invocation import (
+    ComponentInvocation,
+    ComponentInvocationResult,
+)
 from node_engine.models.flow_definition import FlowDefinition
 from node_engine.models.flow_event import FlowEvent
+from node_engine.models.flow_job import FlowJob
 from node_engine.models.flow_step import FlowStep
+from node_engine.models.flow_validation import FlowValidation
 
 
-def init(fastapi_app: FastAPI, registry_root: str) -> None:
+def init(
+    fastapi_app: FastAPI,
+    registry_root: str,
+    background_workers: int = 4,
+    speculate: bool = False,
+    profile_threshold_ms: float | None = None,
+    loop_block_threshold_ms: float | None = 100,
+    preload: bool = False,
+) -> None:
     """
     Adds node engine service endpoints to the FastAPI app.
     """
     app = fastapi_app
-    runtime = Runtime(registry_root)
+    runtime = Runtime(
+        registry_root,
+        BackgroundSupervisor(background_workers),
+        speculation=Speculation() if speculate else None,
+        profiler=Profiler(threshold_ms=profile_threshold_ms),
+    )
     sse_state = SSEState()
+    job_manager = JobManager(runtime)
+
+    # Resume jobs interrupted by a previous shutdown of the service.
+    app.router.on_startup.append(job_manager.resume)
+    # Let background flows finish, within limits, when the service stops.
+    app.router.on_shutdown.append(runtime.background.shutdown)
+    # Export the spans still queued, see tracing.
+    app.router.on_shutdown.append(tracing.flush)
+
+    # Report code blocking the event loop, see LoopMonitor.
+    if loop_block_threshold_ms is not None:
+        loop_monitor = LoopMonitor(threshold_ms=loop_block_threshold_ms)
+        app.router.on_startup.append(loop_monitor.start)
+        app.router.on_shutdown.append(loop_monitor.stop)
+
+    # With `preload`, the registry's components are loaded in the background
+    # at startup and the service reports ready once they are, see /ready.
+    # Otherwise components are loaded by the first request using them.
+    preload_task: asyncio.Task | None = None
+    if preload:
+
+        async def start_preload() -> None:
+            nonlocal preload_task
+            preload_task = asyncio.create_task(runtime.registry.preload())
+
+        app.router.on_startup.append(start_preload)
+
+    # Flow and component invocations can be exchanged as msgpack and/or with
+    # compressed bodies, see NegotiatedRoute.
+    invoke_router = APIRouter(
+        route_class=NegotiatedRoute, default_response_class=NegotiatedResponse
+    )
 
-    @app.post("/invoke", description="Invoke a flow")
+    @invoke_router.post("/invoke", description="Invoke a flow")
     async def invoke(
         flow_definition: FlowDefinition, request: Request
     ) -> FlowDefinition:
         tunnel_authorization = request.headers.get("X-Tunnel-Authorization")
         try:
-            return await runtime.invoke(flow_definition, tunnel_authorization)
+            with (
+                deadline.scope(deadline.from_headers(request.headers)),
+                tracing.resume(tracing.from_headers(request.headers)),
+            ):
+                return await runtime.invoke(flow_definition, tunnel_authorization)
         except Exception as exception:
             flow_step = exit_flow_with_error(str(exception), flow_definition)
             return flow_step.flow_definition
 
-    @app.post("/invoke_component", description="Invoke a component")
+    @invoke_router.post("/invoke_component", description="Invoke a component")
     async def invoke_component(
         component_key: str, flow_definition: FlowDefinition, request: Request
     ) -> FlowStep:
         tunnel_authorization = request.headers.get("X-Tunnel-Authorization")
         try:
-            return await runtime.invoke_component(
-                flow_definition, component_key, tunnel_authorization
-            )
+            with (
+                deadline.scope(deadline.from_headers(request.headers)),
+                tracing.resume(tracing.from_headers(request.headers)),
+            ):
+                return await runtime.invoke_component(
+                    flow_definition, component_key, tunnel_authorization
+                )
         except Exception as exception:
             return exit_flow_with_error(str(exception), flow_definition)
 
+    @invoke_router.post(
+        "/invoke_component_delta",
+        description="Invoke a component with only the context it reads, returning only the context changes",
+    )
+    async def invoke_component_delta(
+        invocation: ComponentInvocation, request: Request
+    ) -> ComponentInvocationResult:
+        tunnel_authorization = request.headers.get("X-Tunnel-Authorization")
+        flow_definition = FlowDefinition(
+            key=invocation.key,
+            session_id=invocation.session_id,
+            flow=invocation.flow,
+            context=invocation.context,
+        )
+        context = Context(flow_definition, track_changes=True)
+        try:
+            with (
+                deadline.scope(deadline.from_headers(request.headers)),
+                tracing.resume(tracing.from_headers(request.headers)),
+            ):
+                flow_step = await runtime.invoke_component(
+                    flow_definition, invocation.component_key, tunnel_authorization
+                )
+        except Exception as exception:
+            flow_step = exit_flow_with_error(str(exception), flow_definition)
+
+        return ComponentInvocationResult(
+            next=flow_step.next,
+            context_delta=context.delta(
+                flow_step.flow_definition.context, compare_values=True
+            ),
+            status=flow_step.flow_definition.status,
+        )
+
+    @invoke_router.post(
+        "/jobs",
+        description="Start a flow as a background job, returning the job immediately",
+    )
+    async def create_job(flow_definition: FlowDefinition, request: Request) -> FlowJob:
+        tunnel_authorization = request.headers.get("X-Tunnel-Authorization")
+        try:
+            with tracing.resume(tracing.from_headers(request.headers)):
+                return await job_manager.submit(flow_definition, tunnel_authorization)
+        except Exception as exception:
+            raise HTTPException(status_code=400, detail=str(exception))
+
+    @invoke_router.get("/jobs/{job_id}", description="Get the status of a job")
+    async def get_job(job_id: str) -> FlowJob:
+        job = await job_manager.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"job not found: {job_id}")
+        return job
+
+    @invoke_router.post("/validate", description="Validate a flow without running it")
+    async def validate_flow(flow_definition: FlowDefinition) -> FlowValidation:
+        return validate(flow_definition, runtime.registry)
+
+    app.include_router(invoke_router)
+
     @app.get("/registry", description="List all available flow components")
-    async def registry() -> list[dict[str, str]]:
+    async def registry(details: bool = False) -> list[dict[str, Any]]:
+        if details:
+            # Metadata of each component, from the registry index.
+            return list(runtime.registry.index().values())
+
         components = runtime.registry.list_components()
         # only return key, label, description, and type
         return [
@@ -59,6 +191,142 @@ def init(fastapi_app: FastAPI, registry_root: str) -> None:
             for component in components
         ]
 
+    @app.get(
+        "/background",
+        description="List running and queued background flows",
+    )
+    async def background() -> list[dict[str, Any]]:
+        return runtime.background.list()
+
+    @app.delete(
+        "/background/{task_id}",
+        description="Cancel a running or queued background flow",
+    )
+    async def cancel_background(task_id: str) -> dict[str, str]:
+        if not runtime.background.cancel(task_id):
+            raise HTTPException(
+                status_code=404, detail=f"background task not found: {task_id}"
+            )
+        return {"status": "ok"}
+
+    @app.get(
+        "/speculation",
+        description="Get speculative execution hit rate and wasted work",
+    )
+    async def speculation() -> dict[str, Any]:
+        if runtime.speculation is None:
+            raise HTTPException(status_code=404, detail="speculation is not enabled")
+        return runtime.speculation.stats()
+
+    def collect_metrics() -> list[metrics.Metric]:
+        # Metrics of this service's runtime and connections, read when scraped.
+        timeouts = metrics.Counter(
+            "node_engine_component_timeouts_total",
+            "Components stopped by their timeout or the invocation deadline, by component name",
+            ["component"],
+        )
+        for name, count in runtime.timeouts.items():
+            timeouts.inc(name, amount=count)
+
+        depths = [
+            connection.queue.qsize() for connection in sse_state.connections.values()
+        ]
+        sse_connections = metrics.Gauge(
+            "node_engine_sse_connections", "Open SSE connections"
+        )
+        sse_connections.set(len(depths))
+        sse_queue_depth = metrics.Gauge(
+            "node_engine_sse_queue_depth",
+            "Events waiting to be sent to SSE connections, in total and on the longest queue",
+            ["aggregate"],
+        )
+        sse_queue_depth.set(sum(depths), "sum")
+        sse_queue_depth.set(max(depths, default=0), "max")
+
+        collected: list[metrics.Metric] = [timeouts, sse_connections, sse_queue_depth]
+        if runtime.speculation is not None:
+            stats = runtime.speculation.stats()
+            for name, help in [
+                ("started", "Speculative runs started"),
+                ("hits", "Speculative runs whose result was used"),
+                ("misses", "Speculative runs whose result was discarded"),
+            ]:
+                counter = metrics.Counter(f"node_engine_speculation_{name}_total", help)
+                counter.inc(amount=stats[name])
+                collected.append(counter)
+            for name, help in [
+                ("saved", "Time successors ran alongside their branch"),
+                ("wasted", "Time spent on discarded speculative runs"),
+            ]:
+                counter = metrics.Counter(
+                    f"node_engine_speculation_{name}_seconds_total", help
+                )
+                counter.inc(amount=stats[f"{name}_ms"] / 1000)
+                collected.append(counter)
+        return collected
+
+    @app.get(
+        "/metrics",
+        description="Get metrics in the Prometheus text format",
+        response_class=PlainTextResponse,
+    )
+    async def get_metrics() -> PlainTextResponse:
+        return PlainTextResponse(
+            metrics.registry.render(collect_metrics()),
+            media_type="text/plain; version=0.0.4",
+        )
+
+    @app.get("/ready", description="Report whether the service is ready")
+    async def ready() -> JSONResponse:
+        task = preload_task
+        if preload and (task is None or not task.done()):
+            return JSONResponse({"ready": False}, status_code=503)
+
+        errors = {}
+        if task is not None:
+            try:
+                index = task.result()
+            except Exception as exception:
+                # Components are loaded by the requests using them instead.
+                errors["registry"] = str(exception)
+            else:
+                errors = {
+                    key: info["error"] for key, info in index.items() if info["error"]
+                }
+        return JSONResponse({"ready": True, "errors": errors})
+
+    @app.get(
+        "/debug/{debug_id}",
+        description="Get the debug information of a flow that exited with an error",
+    )
+    async def debug(debug_id: str) -> dict[str, Any]:
+        debug_information = await debug_collector.materialize(debug_id)
+        if debug_information is None:
+            raise HTTPException(
+                status_code=404, detail=f"debug information not found: {debug_id}"
+            )
+        return debug_information
+
+    @app.get(
+        "/profiles",
+        description="List saved profiles of flagged and slow flow invocations",
+    )
+    async def profiles() -> list[dict[str, Any]]:
+        return await runtime.profiler.list()
+
+    @app.get(
+        "/profiles/{profile_id}",
+        description="Download a profile in the collapsed stack format",
+        response_class=PlainTextResponse,
+    )
+    async def get_profile(profile_id: str) -> PlainTextResponse:
+        profile = await runtime.profiler.get(profile_id)
+        if profile is None:
+            raise HTTPException(
+                status_code=404, detail=f"profile not found: {profile_id}"
+            )
+        return PlainTextResponse(profile)
+
     @app.get(
         "/sse", description="Subscribe to flow events using Server-Sent Events (SSE)"
     )
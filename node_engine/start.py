@@ -7,6 +7,7 @@ import os
 import uvicorn
 from fastapi import FastAPI
 
+from node_engine.libs import tracing
 from node_engine.libs.logging import console_log_handler
 
 from . import service
@@ -43,6 +44,58 @@ def main():
         default="./examples",
         help="root directory for registry and component discovery",
     )
+    parser.add_argument(
+        "--background-workers",
+        dest="background_workers",
+        type=int,
+        default=4,
+        help="number of background flows to run concurrently",
+    )
+    parser.add_argument(
+        "--speculate",
+        dest="speculate",
+        action="store_true",
+        help="start the likely branch of side effect free branching components early",
+    )
+    parser.add_argument(
+        "--profile-threshold-ms",
+        dest="profile_threshold_ms",
+        type=float,
+        help="save a profile of flow invocations taking at least this long",
+    )
+    parser.add_argument(
+        "--loop-block-threshold-ms",
+        dest="loop_block_threshold_ms",
+        type=float,
+        default=100,
+        help="report code blocking the event loop for at least this long, 0 to disable",
+    )
+    parser.add_argument(
+        "--preload",
+        dest="preload",
+        action="store_true",
+        help="load all registry components at startup, reporting ready (see /ready) once loaded",
+    )
+    parser.add_argument(
+        "--trace-file",
+        dest="trace_file",
+        type=str,
+        help="append sampled flow and component spans to this file, as OTLP/JSON lines",
+    )
+    parser.add_argument(
+        "--trace-otlp-endpoint",
+        dest="trace_otlp_endpoint",
+        type=str,
+        default=os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"),
+        help="send sampled spans to this OTLP/HTTP collector",
+    )
+    parser.add_argument(
+        "--trace-sample-rate",
+        dest="trace_sample_rate",
+        type=float,
+        default=0.1,
+        help="fraction of traces started by this service to sample",
+    )
     args = parser.parse_args()
 
     host = args.host
@@ -56,8 +109,24 @@ def main():
 
     registry_root = os.path.abspath(registry_root)
 
+    if args.trace_file or args.trace_otlp_endpoint:
+        exporter = (
+            tracing.FileExporter(args.trace_file)
+            if args.trace_file
+            else tracing.OTLPExporter(args.trace_otlp_endpoint)
+        )
+        tracing.configure(tracing.Tracer(exporter, sample_rate=args.trace_sample_rate))
+
     app = FastAPI()
-    service.init(app, registry_root)
+    service.init(
+        app,
+        registry_root,
+        background_workers=args.background_workers,
+        speculate=args.speculate,
+        profile_threshold_ms=args.profile_threshold_ms,
+        loop_block_threshold_ms=args.loop_block_threshold_ms or None,
+        preload=args.preload,
+    )
 
     logger.info("Starting node_engine service on %s:%s...", host, port)
     logger.info("Registry root: %s", registry_root)
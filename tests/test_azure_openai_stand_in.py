@@ -0,0 +1,62 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import asyncio
+
+import httpx
+import pytest
+
+from node_engine.azure_openai_stand_in import (
+    StandInSettings,
+    create_app,
+    parse_latency,
+    serve,
+)
+from node_engine.libs.azure_openai_chat_completion import AzureOpenAIChatCompletion
+from node_engine.libs.azure_openai_embeddings import AzureOpenAIEmbeddings
+
+
+def test_clients_are_answered_by_the_stand_in() -> None:
+    endpoint = serve(
+        create_app(
+            StandInSettings(
+                latency="fixed:1",
+                embedding_dimensions=8,
+                responses=[{"match": "weather", "content": "sunny"}],
+            )
+        )
+    )
+    service = f"endpoint|{endpoint},key|test,deployment|stand-in"
+
+    async def run() -> None:
+        content = await AzureOpenAIChatCompletion().create(
+            messages=[{"role": "user", "content": "how is the weather?"}],
+            service=service,
+        )
+        assert content == "sunny"
+
+        first, second = await AzureOpenAIEmbeddings().create(
+            ["a", "b"], azureopenai_env_var=service
+        )
+        assert len(first) == 8
+        assert first != second
+        assert (await AzureOpenAIEmbeddings().create("a", service)) == [first]
+
+    asyncio.run(run())
+
+    stats = httpx.get(f"{endpoint}/stats").json()
+    assert stats["chat"] == 1
+    assert stats["embeddings"] == 3
+
+
+def test_injected_errors() -> None:
+    endpoint = serve(create_app(StandInSettings(latency="fixed:0", error_rate_429=1)))
+
+    response = httpx.post(
+        f"{endpoint}/openai/deployments/stand-in/chat/completions",
+        json={"messages": []},
+    )
+    assert response.status_code == 429
+    assert response.headers["retry-after-ms"] == "1000"
+
+    with pytest.raises(ValueError):
+        parse_latency("gamma:1:2")
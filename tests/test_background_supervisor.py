@@ -0,0 +1,156 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import asyncio
+import os
+
+from node_engine.libs.background_supervisor import BackgroundSupervisor
+from node_engine.libs.runtime import Runtime
+from node_engine.libs.storage import Storage
+from node_engine.models.flow_definition import FlowDefinition
+
+registry_root = os.path.join(os.path.dirname(__file__), "..", "examples")
+
+
+def test_runs_by_priority_within_worker_and_session_limits() -> None:
+    async def run() -> list[str]:
+        supervisor = BackgroundSupervisor(max_workers=2, max_running_per_session=1)
+        order = []
+        release = asyncio.Event()
+
+        def work(name):
+            async def run() -> None:
+                order.append(name)
+                await release.wait()
+
+            return run
+
+        supervisor.submit("a", "a1", work("a1"))
+        supervisor.submit("a", "a2", work("a2"), priority=1)
+        supervisor.submit("b", "b1", work("b1"), priority=2)
+        supervisor.submit("a", "a3", work("a3"))
+        await asyncio.sleep(0)
+
+        # Session "a" is limited to one running task, so "b1" takes the
+        # second worker ahead of the higher priority "a3" and "a2".
+        assert [task["name"] for task in supervisor.list()] == ["a1", "b1", "a3", "a2"]
+        assert [task["status"] for task in supervisor.list()] == [
+            "running",
+            "running",
+            "queued",
+            "queued",
+        ]
+
+        release.set()
+        await supervisor.shutdown()
+        return order
+
+    assert asyncio.run(run()) == ["a1", "b1", "a3", "a2"]
+
+
+def test_cancel_and_shutdown() -> None:
+    async def run() -> None:
+        supervisor = BackgroundSupervisor(max_workers=1)
+        cancelled = []
+
+        async def forever() -> None:
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        running = supervisor.submit("a", "running", forever)
+        queued = supervisor.submit("b", "queued", forever)
+        await asyncio.sleep(0)
+
+        assert supervisor.cancel(queued.id)
+        assert not supervisor.cancel("unknown")
+        assert [task["name"] for task in supervisor.list()] == ["running"]
+
+        await supervisor.shutdown(timeout=0.01)
+        assert cancelled == [True]
+        assert running.task is not None and running.task.cancelled()
+        assert supervisor.list() == []
+
+    asyncio.run(run())
+
+
+def test_coalesces_tasks_with_the_same_key() -> None:
+    async def run() -> list[str]:
+        supervisor = BackgroundSupervisor(max_workers=4, max_running_per_session=4)
+        runs = []
+        release = asyncio.Event()
+
+        def work(name):
+            async def run() -> None:
+                runs.append(name)
+                await release.wait()
+
+            return run
+
+        first = supervisor.submit("a", "memories", work("1"), coalesce_key="key")
+        await asyncio.sleep(0)
+        second = supervisor.submit("a", "memories", work("2"), coalesce_key="key")
+        third = supervisor.submit("a", "memories", work("3"), coalesce_key="key")
+        other = supervisor.submit("a", "other", work("other"))
+        await asyncio.sleep(0)
+
+        # One run in flight and one pending with the latest input, while
+        # tasks without the key are not held back.
+        assert second is third and second is not first
+        assert second.coalesced == 1
+        assert [task["status"] for task in supervisor.list()] == [
+            "running",
+            "running",
+            "queued",
+        ]
+        assert other.started is not None
+
+        release.set()
+        await supervisor.shutdown()
+        return runs
+
+    assert asyncio.run(run()) == ["1", "other", "3"]
+
+
+def test_process_memories_steps_coalesce_separately(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Storage, "root_path", str(tmp_path))
+    runtime = Runtime(registry_root)
+    coalesce_keys = []
+
+    async def invoke_background(flow_definition, *args, coalesce_key=None, **kwargs):
+        coalesce_keys.append(coalesce_key)
+        return "task"
+
+    monkeypatch.setattr(runtime, "invoke_background", invoke_background)
+
+    def flow(key: str) -> FlowDefinition:
+        return FlowDefinition(
+            key=key,
+            session_id="session",
+            context={"messages": []},
+            flow=[
+                {"key": "first", "name": "ProcessMemories", "config": {"await": False}},
+                {
+                    "key": "second",
+                    "name": "ProcessMemories",
+                    "config": {"await": False},
+                },
+            ],
+        )
+
+    async def run() -> None:
+        await runtime.invoke(flow("chat"))
+        await runtime.invoke(flow("chat"))
+        await runtime.invoke(flow("other"))
+
+    asyncio.run(run())
+    # Runs of the same step in a session coalesce, other steps don't.
+    assert coalesce_keys == [
+        "session:chat:first:process_memories",
+        "session:chat:second:process_memories",
+        "session:chat:first:process_memories",
+        "session:chat:second:process_memories",
+        "session:other:first:process_memories",
+        "session:other:second:process_memories",
+    ]
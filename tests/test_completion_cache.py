@@ -0,0 +1,81 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import asyncio
+
+from node_engine.libs.completion_cache import CompletionCache
+from node_engine.libs.storage import Storage
+
+messages = [{"role": "user", "content": "hello"}]
+
+
+def test_key_depends_on_request() -> None:
+    key = CompletionCache.key("endpoint", "gpt", messages, {"temperature": 0})
+    assert key == CompletionCache.key(
+        "endpoint", "gpt", messages, {"temperature": 0, "top_p": None}
+    )
+    assert key != CompletionCache.key("endpoint", "gpt", messages, {"temperature": 1})
+    assert key != CompletionCache.key("endpoint", "gpt4", messages, {"temperature": 0})
+
+
+def test_entries_are_served_from_memory_then_storage(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Storage, "root_path", str(tmp_path))
+
+    async def run() -> None:
+        cache = CompletionCache(max_entries=1)
+        await cache.set("a", "first", ttl=60, latency_ms=100)
+        await cache.set("b", "second", ttl=60, latency_ms=50)
+        assert list(cache.entries) == ["b"]
+
+        # Evicted from memory, but still on disk.
+        entry = await cache.get("a")
+        assert entry is not None and entry["value"] == "first"
+        assert list(cache.entries) == ["a"]
+
+        # A new process starts with an empty memory tier.
+        assert (await CompletionCache().get("b") or {}).get("value") == "second"
+
+        assert await cache.get("missing") is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+        assert cache.stats()["saved_latency_ms"] == 100
+
+    asyncio.run(run())
+
+
+def test_expired_entries_are_removed(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Storage, "root_path", str(tmp_path))
+
+    async def run() -> None:
+        cache = CompletionCache()
+        await cache.set("a", "value", ttl=-1, latency_ms=100)
+        assert await cache.get("a") is None
+        assert "a" not in cache.entries
+        assert await CompletionCache().get("a") is None
+
+    asyncio.run(run())
+
+
+def test_stored_entries_are_capped(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Storage, "root_path", str(tmp_path))
+
+    async def run() -> None:
+        cache = CompletionCache(max_entries=1, max_stored_entries=4)
+        await cache.set("expired", "value", ttl=-1, latency_ms=100)
+        for ttl, key in enumerate(["a", "b", "c"], 60):
+            await cache.set(key, "value", ttl=ttl, latency_ms=100)
+        assert await Storage.keys("_completion_cache") == ["a", "b", "c", "expired"]
+
+        # Over the limit, expired entries and those expiring soonest are
+        # removed, down to three quarters of it.
+        await cache.set("d", "value", ttl=120, latency_ms=100)
+        assert await Storage.keys("_completion_cache") == ["b", "c", "d"]
+        assert cache.stats()["stored_entries"] == 3
+
+        # A new process counts the stored entries.
+        cache = CompletionCache(max_entries=1, max_stored_entries=4)
+        await cache.set("e", "value", ttl=120, latency_ms=100)
+        assert cache.stats()["stored_entries"] == 4
+        await cache.set("f", "value", ttl=120, latency_ms=100)
+        assert await Storage.keys("_completion_cache") == ["d", "e", "f"]
+
+    asyncio.run(run())
@@ -0,0 +1,67 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+from node_engine.libs.context import Context, apply_delta
+from node_engine.models.flow_definition import FlowDefinition
+
+
+def new_flow_definition(context: dict) -> FlowDefinition:
+    return FlowDefinition(key="test", flow=[], context=context)
+
+
+def test_untracked_context_returns_shared_values() -> None:
+    messages = [{"content": "hi"}]
+    flow_definition = new_flow_definition({"messages": messages})
+    context = Context(flow_definition)
+    assert context.get("messages") is messages
+    assert context.reads == set()
+
+
+def test_tracked_context_copies_mutable_values_on_access() -> None:
+    messages = [{"content": "hi"}]
+    flow_definition = new_flow_definition({"messages": messages})
+    context = Context(flow_definition, track_changes=True)
+
+    value = context.get("messages")
+    value.append({"content": "there"})
+
+    assert len(messages) == 1
+    assert value[0] is messages[0]
+    assert context.get("messages") is value
+    assert context.reads == {"messages"}
+    assert context.written_keys() == ["messages"]
+
+
+def test_tracked_context_delta() -> None:
+    flow_definition = new_flow_definition(
+        {"messages": [1, 2], "intent": "greeting", "count": 1}
+    )
+    context = Context(flow_definition, track_changes=True)
+
+    context.get("messages")
+    context.get("intent")
+    context.set("count", 2)
+    context.set("response", "hello")
+    context.delete("intent")
+
+    delta = context.delta()
+    assert delta == {"set": {"count": 2, "response": "hello"}, "delete": ["intent"]}
+
+    target = {"messages": [1, 2], "intent": "greeting", "count": 1}
+    assert apply_delta(target, delta) == flow_definition.context
+
+
+def test_fork_shares_values() -> None:
+    messages = [1, 2]
+    context = Context(new_flow_definition({"messages": messages}))
+    forked = context.fork({"input": "x"})
+    assert forked["messages"] is messages
+    assert forked["input"] == "x"
+    assert "input" not in context.flow_definition.context
+
+
+def test_set_before_get_is_written() -> None:
+    flow_definition = new_flow_definition({"items": [1]})
+    context = Context(flow_definition, track_changes=True)
+    context.set("items", [1])
+    context.get("items")
+    assert context.written_keys() == ["items"]
@@ -0,0 +1,68 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import asyncio
+import os
+
+from node_engine.libs import deadline
+from node_engine.libs.runtime import Runtime
+from node_engine.libs.storage import Storage
+from node_engine.models.flow_definition import FlowDefinition
+
+registry_root = os.path.join(os.path.dirname(__file__), "..", "examples")
+
+
+def test_nested_scopes_keep_the_earliest_deadline() -> None:
+    assert deadline.remaining() is None
+    assert deadline.headers() == {}
+
+    with deadline.scope(10):
+        with deadline.scope(60):
+            assert 9 < deadline.remaining() <= 10
+        with deadline.scope(1):
+            assert deadline.remaining() <= 1
+            assert deadline.from_headers(deadline.headers()) <= 1
+            with deadline.detached():
+                assert deadline.remaining() is None
+
+    assert deadline.from_headers({deadline.timeout_header: "1500"}) == 1.5
+    assert deadline.from_headers({deadline.timeout_header: "soon"}) is None
+
+
+def flow(**kwargs) -> FlowDefinition:
+    return FlowDefinition(
+        key="slow",
+        session_id="session",
+        context={"continued": True},
+        flow=[
+            {
+                "key": "evaluate",
+                "name": "EvaluateContinue",
+                "config": {"outputs": {"yes": "emit", "no": "exit"}, **kwargs},
+            },
+            {"key": "emit", "name": "EmitEvents", "config": {}},
+        ],
+    )
+
+
+def test_component_timeout_exits_with_error(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Storage, "root_path", str(tmp_path))
+    runtime = Runtime(registry_root)
+
+    result = asyncio.run(runtime.invoke(flow(timeout_ms=50)))
+
+    assert "component timed out" in result.status.error
+    assert "timeout_ms=50" in result.status.error
+    assert result.status.trace == []
+    assert runtime.timeouts["EvaluateContinue"] == 1
+
+
+def test_flow_deadline_stops_the_flow(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Storage, "root_path", str(tmp_path))
+    runtime = Runtime(registry_root)
+    flow_definition = flow()
+    flow_definition.timeout_ms = 50
+
+    result = asyncio.run(runtime.invoke(flow_definition))
+
+    assert "invocation deadline exceeded" in result.status.error
+    assert runtime.timeouts["EvaluateContinue"] == 1
@@ -0,0 +1,111 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import asyncio
+import gc
+import os
+import weakref
+
+from node_engine_example_components.invoke_flow import InvokeFlow
+
+from node_engine.libs import debug_collector, endpoint_runner
+from node_engine.libs.endpoint_runner import EndpointRunner
+from node_engine.libs.runtime import Runtime
+from node_engine.libs.storage import Storage
+from node_engine.models.flow_definition import FlowDefinition
+
+registry_root = os.path.join(os.path.dirname(__file__), "..", "examples")
+
+
+def invoke_flow_without_definition(config: dict) -> FlowDefinition:
+    return FlowDefinition(
+        key="debug",
+        session_id="session",
+        # An empty flow definition passes validation and fails when run.
+        flow=[
+            {
+                "key": "invoke",
+                "name": "InvokeFlow",
+                "config": {"flow_definition": {}, **config},
+            }
+        ],
+        context={"input": "hello"},
+    )
+
+
+def test_debug_information_is_materialized_on_request(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Storage, "root_path", str(tmp_path))
+    runtime = Runtime(registry_root)
+
+    async def run() -> None:
+        result = await runtime.invoke(invoke_flow_without_definition({}))
+        assert result.status.error == "no flow definition provided"
+        reference = result.context["debug_information"]
+        assert list(reference) == ["debug_id"]
+
+        # Later changes to the flow don't show up in the debug information.
+        result.context["input"] = "changed"
+
+        info = await debug_collector.materialize(reference["debug_id"])
+        assert info is not None
+        assert info["error"] == "no flow definition provided"
+        assert info["component_name"] == "InvokeFlow"
+        assert '"hello"' in info["error_context"]
+        assert "async def execute" in info["code"]
+
+        assert await debug_collector.materialize("unknown") is None
+
+    asyncio.run(run())
+
+
+def test_include_debug_collects_right_away(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Storage, "root_path", str(tmp_path))
+    runtime = Runtime(registry_root)
+
+    result = asyncio.run(
+        runtime.invoke(invoke_flow_without_definition({"include_debug": True}))
+    )
+    info = result.context["debug_information"]
+    assert info["error"] == "no flow definition provided"
+    assert "async def execute" in info["code"]
+
+
+def test_references_do_not_keep_components_alive(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Storage, "root_path", str(tmp_path))
+    runtime = Runtime(registry_root)
+    # Remote source is fetched once per endpoint and component.
+    monkeypatch.setitem(
+        endpoint_runner._source_cache,
+        ("http://127.0.0.1:8001/", "remote", "Remote"),
+        "remote source",
+    )
+
+    async def run() -> None:
+        components = [
+            InvokeFlow(invoke_flow_without_definition({}), "invoke", runtime),
+            EndpointRunner(
+                invoke_flow_without_definition({}),
+                "invoke",
+                endpoint="http://127.0.0.1:8001/",
+                component_name="remote",
+                class_name="Remote",
+            ),
+        ]
+        debug_ids = [
+            debug_collector.reference(
+                "failed", component.flow_definition, component=component
+            )["debug_id"]
+            for component in components
+        ]
+        alive = [weakref.ref(component) for component in components]
+        del components
+        gc.collect()
+        assert [component() for component in alive] == [None, None]
+
+        local, remote = [
+            await debug_collector.materialize(debug_id) for debug_id in debug_ids
+        ]
+        assert local["error"] == "failed"
+        assert "async def execute" in local["code"]
+        assert remote["code"] == "remote source"
+
+    asyncio.run(run())
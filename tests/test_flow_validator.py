@@ -0,0 +1,122 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import asyncio
+import os
+
+from node_engine.libs.flow_validator import validate
+from node_engine.libs.registry import Registry
+from node_engine.libs.runtime import Runtime
+from node_engine.libs.storage import Storage
+from node_engine.models.flow_definition import FlowDefinition
+
+registry_root = os.path.join(os.path.dirname(__file__), "..", "examples")
+
+
+def flow(*components: dict) -> FlowDefinition:
+    return FlowDefinition(key="validate", session_id="session", flow=list(components))
+
+
+def test_validation_errors_and_warnings() -> None:
+    registry = Registry(registry_root)
+
+    validation = validate(
+        flow(
+            {"key": "start", "name": "Unknown"},
+            {"key": "branch", "name": "EvaluateContinue", "config": {"outputs": {}}},
+            {"key": "jump", "name": "NextComponent", "config": {"next": "missing"}},
+            {"key": "store", "name": "StoreContent"},
+        ),
+        registry,
+    )
+    assert not validation.valid
+    assert validation.errors == [
+        "start: component not found: Unknown",
+        "jump: next component not found: missing",
+        "store: missing required config: source",
+    ]
+
+    validation = validate(
+        flow(
+            {"key": "start", "name": "NextComponent", "config": {"next": "exit"}},
+            {"key": "skipped", "name": "EmitEvents"},
+        ),
+        registry,
+    )
+    assert validation.valid
+    assert validation.warnings == ["skipped: component is unreachable"]
+
+
+def test_loops() -> None:
+    registry = Registry(registry_root)
+
+    # Loops with a branch or a limit may end.
+    for config in [
+        {"next": "start", "limit": {"max": 3}},
+        {"outputs": {"yes": "start", "no": "exit"}},
+    ]:
+        name = "EvaluateContinue" if "outputs" in config else "NextComponent"
+        validation = validate(
+            flow(
+                {"key": "start", "name": "EmitEvents"},
+                {"key": "loop", "name": name, "config": config},
+            ),
+            registry,
+        )
+        assert validation.valid
+        assert validation.warnings == []
+
+    validation = validate(
+        flow(
+            {"key": "start", "name": "EmitEvents"},
+            {"key": "loop", "name": "NextComponent", "config": {"next": "start"}},
+        ),
+        registry,
+    )
+    # Routing is inferred from config, so loops are never certain.
+    assert validation.valid
+    assert validation.warnings == [
+        "possible unbounded loop, no component in it branches or limits its runs:"
+        " start, loop"
+    ]
+
+
+def test_flow_looping_through_a_limit_runs(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Storage, "root_path", str(tmp_path))
+    runtime = Runtime(registry_root)
+    loop = flow(
+        {"key": "retrieve", "name": "RetrieveContent", "config": {"key": "notes"}},
+        {
+            "key": "loop",
+            "name": "NextComponent",
+            "config": {"next": "retrieve", "limit": {"max": 2}},
+        },
+    )
+
+    validation = validate(loop, runtime.registry)
+    assert validation.valid
+    assert validation.warnings == []
+
+    result = asyncio.run(runtime.invoke(loop))
+    # The limit ends the loop on the third pass.
+    assert result.status.error == "Limit exceeded"
+    assert [trace["component"]["key"] for trace in result.status.trace] == [
+        "retrieve",
+        "loop",
+    ] * 3
+
+
+def test_invalid_flows_fail_before_running(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Storage, "root_path", str(tmp_path))
+    runtime = Runtime(registry_root)
+
+    result = asyncio.run(
+        runtime.invoke(
+            flow(
+                {"key": "store", "name": "StoreContent", "config": {"source": "a"}},
+                {"key": "jump", "name": "NextComponent", "config": {"next": "gone"}},
+            )
+        )
+    )
+    assert result.status.error == ("Invalid flow: jump: next component not found: gone")
+    # Nothing ran, so nothing was stored.
+    assert result.status.trace == []
@@ -0,0 +1,69 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import asyncio
+import os
+
+from node_engine.libs.job_manager import JobManager
+from node_engine.libs.runtime import Runtime
+from node_engine.libs.storage import Storage
+from node_engine.models.flow_definition import FlowDefinition
+from node_engine.models.flow_job import FlowJob, JobStatusEnum
+
+registry_root = os.path.join(os.path.dirname(__file__), "..", "examples")
+
+
+def new_flow_definition() -> FlowDefinition:
+    return FlowDefinition(
+        key="test",
+        session_id="test",
+        flow=[
+            {"key": "first", "name": "EmitEvents", "config": {}},
+            {"key": "second", "name": "EmitEvents", "config": {}},
+        ],
+    )
+
+
+async def run_jobs(job_manager: JobManager) -> None:
+    while job_manager.tasks:
+        await asyncio.gather(*job_manager.tasks.values())
+
+
+def test_job_runs_to_completion(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Storage, "root_path", str(tmp_path))
+
+    async def run() -> FlowJob | None:
+        job_manager = JobManager(Runtime(registry_root))
+        job = await job_manager.submit(new_flow_definition())
+        await run_jobs(job_manager)
+        return await job_manager.get(job.id)
+
+    job = asyncio.run(run())
+    assert job is not None
+    assert job.status == JobStatusEnum.completed
+    assert job.steps == 2
+    assert job.next is None
+
+
+def test_job_resumes_from_checkpoint(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Storage, "root_path", str(tmp_path))
+
+    async def run() -> tuple[list[str], FlowJob | None]:
+        job_manager = JobManager(Runtime(registry_root))
+        interrupted = FlowJob(
+            id="interrupted",
+            status=JobStatusEnum.running,
+            flow_definition=new_flow_definition(),
+            next="second",
+            steps=1,
+        )
+        await job_manager.save(interrupted)
+        resumed = await job_manager.resume()
+        await run_jobs(job_manager)
+        return resumed, await job_manager.get(interrupted.id)
+
+    resumed, job = asyncio.run(run())
+    assert resumed == ["interrupted"]
+    assert job is not None
+    assert job.status == JobStatusEnum.completed
+    # Only the component after the checkpoint ran.
+    assert job.steps == 2
@@ -0,0 +1,31 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import asyncio
+import time
+
+from node_engine.libs import metrics
+from node_engine.libs.loop_monitor import LoopMonitor
+
+
+def blocking_call() -> None:
+    time.sleep(0.3)
+
+
+def test_blocking_code_is_located() -> None:
+    monitor = LoopMonitor(threshold_ms=100, interval_ms=10)
+
+    async def run() -> None:
+        monitor.start()
+        await asyncio.sleep(0.05)
+        blocking_call()
+        await asyncio.sleep(0.05)
+        monitor.stop()
+
+    asyncio.run(run())
+
+    (block,) = monitor.blocks
+    assert block.lag_ms >= 100
+    assert block.location is not None
+    assert block.location.endswith("(blocking_call)")
+    assert any("blocking_call" in line for line in block.stack)
+    assert metrics.event_loop_blocks.values[(block.location,)] >= 1
@@ -0,0 +1,75 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import asyncio
+import os
+
+import httpx
+from fastapi import FastAPI
+
+from node_engine import service
+from node_engine.libs import metrics
+from node_engine.libs.storage import Storage
+
+registry_root = os.path.join(os.path.dirname(__file__), "..", "examples")
+
+
+def test_histogram_renders_cumulative_buckets() -> None:
+    histogram = metrics.Histogram("test_seconds", "Test", ["name"], buckets=[1, 5])
+    histogram.observe(0.5, "a")
+    histogram.observe(1, "a")
+    histogram.observe(7, "a")
+
+    assert histogram.render().splitlines() == [
+        "# HELP test_seconds Test",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{name="a",le="1"} 2',
+        'test_seconds_bucket{name="a",le="5"} 2',
+        'test_seconds_bucket{name="a",le="+Inf"} 3',
+        'test_seconds_sum{name="a"} 8.5',
+        'test_seconds_count{name="a"} 3',
+    ]
+
+
+def test_metrics_endpoint(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Storage, "root_path", str(tmp_path))
+    app = FastAPI()
+    service.init(app, registry_root)
+
+    async def run() -> tuple[httpx.Response, httpx.Response]:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://service"
+        ) as client:
+            invoked = await client.post(
+                "/invoke",
+                json={
+                    "key": "metrics-test",
+                    "session_id": "session",
+                    "flow": [
+                        {
+                            "key": "retrieve",
+                            "name": "RetrieveContent",
+                            "config": {"key": "notes", "target": "notes"},
+                        }
+                    ],
+                },
+            )
+            return invoked, await client.get("/metrics")
+
+    invoked, response = asyncio.run(run())
+    assert invoked.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    lines = response.text.splitlines()
+    assert 'node_engine_flow_duration_seconds_count{flow="metrics-test"} 1' in lines
+    assert any(
+        line.startswith(
+            'node_engine_component_duration_seconds_count{component="RetrieveContent"}'
+        )
+        for line in lines
+    )
+    assert any(
+        line.startswith(
+            'node_engine_storage_operation_duration_seconds_count{operation="get"}'
+        )
+        for line in lines
+    )
+    assert 'node_engine_sse_queue_depth{aggregate="sum"} 0' in lines
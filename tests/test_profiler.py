@@ -0,0 +1,82 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import asyncio
+import os
+
+from node_engine.libs.profiler import Profiler
+from node_engine.libs.runtime import Runtime
+from node_engine.libs.storage import Storage
+from node_engine.models.flow_definition import FlowDefinition
+
+registry_root = os.path.join(os.path.dirname(__file__), "..", "examples")
+
+
+def flow_definition(profile: bool) -> FlowDefinition:
+    return FlowDefinition(
+        key="retrieve",
+        session_id="session",
+        profile=profile,
+        flow=[
+            {
+                "key": "retrieve",
+                "name": "RetrieveContent",
+                "config": {"key": "notes", "target": "notes"},
+            }
+        ],
+    )
+
+
+def test_flagged_invocations_are_profiled(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Storage, "root_path", str(tmp_path))
+    get = Storage.get
+
+    async def slow_get(session_id, key, raw=False):
+        await asyncio.sleep(0.2)
+        return await get(session_id, key, raw)
+
+    monkeypatch.setattr(Storage, "get", staticmethod(slow_get))
+    profiler = Profiler(interval_ms=5)
+    runtime = Runtime(registry_root, profiler=profiler)
+
+    async def run() -> None:
+        await runtime.invoke(flow_definition(profile=False))
+        assert await profiler.list() == []
+
+        await runtime.invoke(flow_definition(profile=True))
+        (profile,) = await profiler.list()
+        assert profile["flow_key"] == "retrieve"
+        assert profile["reason"] == "flag"
+        assert profile["samples"] > 10
+
+        stacks = await profiler.get(profile["id"])
+        assert stacks is not None
+        waiting = [
+            line
+            for line in stacks.splitlines()
+            if "RetrieveContent.execute" in line and "slow_get" in line
+        ]
+        assert waiting
+        assert waiting[0].startswith("Runtime.invoke (runtime.py:")
+        assert ";(waiting) " in waiting[0]
+
+        assert await profiler.get("../session") is None
+
+    asyncio.run(run())
+
+
+def test_threshold_keeps_slow_invocations(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Storage, "root_path", str(tmp_path))
+    profiler = Profiler(threshold_ms=60_000, max_profiles=1)
+    runtime = Runtime(registry_root, profiler=profiler)
+
+    async def run() -> None:
+        await runtime.invoke(flow_definition(profile=False))
+        assert await profiler.list() == []
+
+        profiler.threshold_ms = 0
+        await runtime.invoke(flow_definition(profile=False))
+        await runtime.invoke(flow_definition(profile=False))
+        profiles = await profiler.list()
+        assert [profile["reason"] for profile in profiles] == ["threshold"]
+
+    asyncio.run(run())
@@ -0,0 +1,28 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+from node_engine.libs.prompt_budget import (
+    estimate_tokens,
+    fit_history,
+    message_overhead_tokens,
+)
+
+
+def test_estimate_tokens() -> None:
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("Hello, world!") == 4
+    assert estimate_tokens("internationalization") == 5
+
+
+def test_fit_history_keeps_most_recent_messages() -> None:
+    history = [{"content": "one two three"}, {"content": "four"}, {"content": "five"}]
+    budget = 2 * (1 + message_overhead_tokens)
+
+    assert fit_history(history, lambda message: message["content"], budget) == (
+        history[1:]
+    )
+
+
+def test_fit_history_with_small_budget() -> None:
+    history = [{"content": "a long message that does not fit"}]
+
+    assert fit_history(history, lambda message: message["content"], 5) == []
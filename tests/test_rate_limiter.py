@@ -0,0 +1,91 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import asyncio
+import time
+
+import httpx
+import pytest
+from openai import BadRequestError, InternalServerError, RateLimitError
+
+from node_engine.libs.rate_limiter import (
+    CircuitOpenError,
+    DeploymentLimiter,
+    TokenBucket,
+)
+
+
+def status_error(error_class, status_code: int, headers: dict | None = None):
+    response = httpx.Response(
+        status_code,
+        headers=headers,
+        request=httpx.Request("POST", "https://example.openai.azure.com"),
+    )
+    return error_class("error", response=response, body=None)
+
+
+def failing(errors: list[Exception]):
+    calls = []
+
+    async def request() -> str:
+        calls.append(time.monotonic())
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    return request, calls
+
+
+def test_token_bucket_paces_requests() -> None:
+    async def run() -> float:
+        bucket = TokenBucket(capacity=2, refill_per_second=100)
+        start = time.monotonic()
+        for _ in range(4):
+            await bucket.acquire()
+        return time.monotonic() - start
+
+    # Two requests use the burst capacity, the next two wait ~10ms each.
+    assert 0.015 < asyncio.run(run()) < 0.5
+
+
+def test_rate_limited_request_is_retried_after_retry_after() -> None:
+    async def run() -> None:
+        limiter = DeploymentLimiter("test")
+        request, calls = failing(
+            [status_error(RateLimitError, 429, {"retry-after-ms": "50"})]
+        )
+        assert await limiter.call(request, retry_delay_ms=1) == "ok"
+        assert len(calls) == 2
+        assert calls[1] - calls[0] >= 0.05
+
+    asyncio.run(run())
+
+
+def test_client_errors_are_not_retried() -> None:
+    async def run() -> None:
+        limiter = DeploymentLimiter("test")
+        request, calls = failing([status_error(BadRequestError, 400)])
+        with pytest.raises(BadRequestError):
+            await limiter.call(request, retry_delay_ms=1)
+        assert len(calls) == 1
+
+    asyncio.run(run())
+
+
+def test_circuit_opens_after_consecutive_failures() -> None:
+    async def run() -> None:
+        limiter = DeploymentLimiter("test", failure_threshold=2, reset_timeout=0.05)
+        request, calls = failing(
+            [status_error(InternalServerError, 500) for _ in range(2)]
+        )
+        with pytest.raises(InternalServerError):
+            await limiter.call(request, max_retries=1, retry_delay_ms=1)
+        with pytest.raises(CircuitOpenError):
+            await limiter.call(request)
+        assert len(calls) == 2
+
+        # After the reset timeout a successful trial call closes the circuit.
+        await asyncio.sleep(0.05)
+        assert await limiter.call(request) == "ok"
+        assert limiter.stats()["circuit_open"] is False
+
+    asyncio.run(run())
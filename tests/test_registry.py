@@ -0,0 +1,154 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import asyncio
+import json
+import os
+
+import httpx
+from fastapi import FastAPI
+
+from node_engine import service
+from node_engine.libs.registry import Registry
+from node_engine.libs.storage import Storage
+
+code = """
+from node_engine.libs.node_engine_component import NodeEngineComponent
+
+
+class Echo(NodeEngineComponent):
+    default_config = {"target": "output"}
+    reads_from = {"context": ["input"]}
+
+    async def execute(self):
+        return self.continue_flow()
+"""
+
+
+def write_registry(tmp_path, components: list[dict]) -> None:
+    with open(os.path.join(tmp_path, "registry.json"), "w") as file:
+        json.dump(components, file)
+    # Make sure the change is seen, even on coarse file system timestamps.
+    stat = os.stat(os.path.join(tmp_path, "registry.json"))
+    os.utime(
+        os.path.join(tmp_path, "registry.json"),
+        ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000),
+    )
+
+
+def registration(key: str, type: str, config: dict) -> dict:
+    return {
+        "key": key,
+        "label": key,
+        "description": f"{key} component",
+        "type": type,
+        "config": config,
+    }
+
+
+def test_index_describes_registered_components(tmp_path) -> None:
+    write_registry(
+        tmp_path,
+        [
+            registration("Echo", "code", {"code": code, "class": "Echo"}),
+            registration(
+                "Remote",
+                "endpoint",
+                {
+                    "endpoint": "http://127.0.0.1:8001/",
+                    "component_name": "remote",
+                    "class_name": "Remote",
+                    "reads_from": {"storage": ["notes"]},
+                },
+            ),
+            registration("Missing", "module", {"module": "missing", "class": "X"}),
+        ],
+    )
+    registry = Registry(str(tmp_path))
+
+    index = registry.index()
+    assert list(index) == ["Echo", "Missing", "Remote"]
+
+    echo = index["Echo"]
+    assert echo["description"] == "Echo component"
+    assert echo["default_config"] == {"target": "output"}
+    assert echo["reads_from"] == {"context": ["input"]}
+    assert echo["error"] is None
+
+    assert index["Remote"]["name"] == "Remote"
+    assert index["Remote"]["reads_from"] == {"storage": ["notes"]}
+    assert "ModuleNotFoundError" in index["Missing"]["error"]
+
+    # Served from memory until the registry file changes.
+    assert registry.index()["Echo"] is echo
+    write_registry(
+        tmp_path, [registration("Echo", "code", {"code": code, "class": "Echo"})]
+    )
+    assert list(registry.index()) == ["Echo"]
+    assert [component.key for component in registry.list_components()] == ["Echo"]
+
+
+def test_preload_readiness(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Storage, "root_path", str(tmp_path))
+    write_registry(
+        tmp_path,
+        [
+            registration("Echo", "code", {"code": code, "class": "Echo"}),
+            registration("Missing", "module", {"module": "missing", "class": "X"}),
+        ],
+    )
+    app = FastAPI()
+    service.init(app, str(tmp_path), loop_block_threshold_ms=None, preload=True)
+
+    async def run() -> None:
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://service"
+        ) as client:
+            response = await client.get("/ready")
+            assert response.status_code == 503
+            assert response.json() == {"ready": False}
+
+            async with app.router.lifespan_context(app):
+                # Let the preload finish.
+                for _ in range(100):
+                    response = await client.get("/ready")
+                    if response.status_code == 200:
+                        break
+                    await asyncio.sleep(0.01)
+                assert response.status_code == 200
+                ready = response.json()
+                assert ready["ready"] is True
+                assert list(ready["errors"]) == ["Missing"]
+
+                response = await client.get("/registry", params={"details": True})
+                assert [component["key"] for component in response.json()] == [
+                    "Echo",
+                    "Missing",
+                ]
+
+    asyncio.run(run())
+
+
+def test_preload_drops_results_of_a_changed_registry(tmp_path, monkeypatch) -> None:
+    write_registry(
+        tmp_path, [registration("Echo", "code", {"code": code, "class": "Echo"})]
+    )
+    registry = Registry(str(tmp_path))
+    component_info = registry._component_info
+    changed = []
+
+    def change_during_preload(component):
+        info = component_info(component)
+        if not changed:
+            # The registry file changes while the first preload runs.
+            changed.append(component.key)
+            changed_echo = registration("Echo", "code", {"code": code, "class": "Echo"})
+            changed_echo["description"] = "changed"
+            write_registry(tmp_path, [changed_echo])
+            registry.list_components()
+        return info
+
+    monkeypatch.setattr(registry, "_component_info", change_during_preload)
+
+    index = asyncio.run(registry.preload())
+    assert index["Echo"]["description"] == "changed"
+    assert registry.index()["Echo"]["description"] == "changed"
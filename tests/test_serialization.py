@@ -0,0 +1,53 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import pytest
+
+from node_engine.libs import serialization
+
+data = {
+    "key": "sample",
+    "context": {
+        "text": "héllo",
+        "short": [0.5, 1.5],
+        "embedding": [0.25] * 32,
+        "mixed": [1] * 32,
+    },
+}
+
+
+@pytest.mark.parametrize("content_type", serialization.content_types)
+@pytest.mark.parametrize("content_encoding", [None, *serialization.content_encodings])
+def test_round_trip(content_type, content_encoding) -> None:
+    pytest.importorskip("msgpack")
+    pytest.importorskip("zstandard")
+    body = serialization.encode(data, content_type, content_encoding)
+    assert serialization.decode(body, content_type, content_encoding) == data
+
+
+def test_msgpack_packs_float_arrays() -> None:
+    pytest.importorskip("msgpack")
+    floats = {"embedding": [0.1] * 32}
+    body = serialization.encode(floats, serialization.msgpack_content_type)
+    decoded = serialization.decode(body, serialization.msgpack_content_type)
+    assert len(body) < len(serialization.encode(floats))
+    assert decoded["embedding"] == pytest.approx(floats["embedding"], rel=1e-6)
+
+
+negotiation_tests = [
+    (None, serialization.json_content_type),
+    ("*/*", serialization.json_content_type),
+    ("application/msgpack", serialization.msgpack_content_type),
+    ("text/html, application/msgpack;q=0.9", serialization.msgpack_content_type),
+    ("application/json, application/msgpack", serialization.json_content_type),
+]
+
+
+@pytest.mark.parametrize("accept, expected", negotiation_tests)
+def test_negotiate_content_type(accept, expected) -> None:
+    assert serialization.negotiate_content_type(accept) == expected
+
+
+def test_negotiate_content_encoding() -> None:
+    assert serialization.negotiate_content_encoding(None) is None
+    assert serialization.negotiate_content_encoding("br, deflate") is None
+    assert serialization.negotiate_content_encoding("br, zstd, gzip") == "zstd"
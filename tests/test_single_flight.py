@@ -0,0 +1,107 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import asyncio
+
+import pytest
+
+from node_engine.libs import deadline
+from node_engine.libs.single_flight import SingleFlight, request_key
+
+
+def test_request_key_ignores_unset_parts() -> None:
+    assert request_key(input="a", user=None) == request_key(input="a")
+    assert request_key(input="a") != request_key(input="b")
+
+
+def test_concurrent_calls_are_collapsed() -> None:
+    async def run() -> None:
+        single_flight = SingleFlight()
+        calls = []
+
+        async def call() -> str:
+            calls.append(True)
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(
+            single_flight.do("a", call),
+            single_flight.do("a", call),
+            single_flight.do("b", call),
+        )
+        assert results == ["result"] * 3
+        assert len(calls) == 2
+        assert single_flight.stats() == {"in_flight": 0, "calls": 2, "collapsed": 1}
+
+        # Calls after completion are not collapsed.
+        await single_flight.do("a", call)
+        assert len(calls) == 3
+
+    asyncio.run(run())
+
+
+def test_exceptions_are_shared() -> None:
+    async def run() -> None:
+        single_flight = SingleFlight()
+
+        async def call() -> str:
+            await asyncio.sleep(0.01)
+            raise Exception("failed")
+
+        results = await asyncio.gather(
+            single_flight.do("a", call),
+            single_flight.do("a", call),
+            return_exceptions=True,
+        )
+        assert [str(result) for result in results] == ["failed", "failed"]
+        with pytest.raises(Exception, match="failed"):
+            await single_flight.do("a", call)
+
+    asyncio.run(run())
+
+
+def test_callers_wait_until_their_own_deadline() -> None:
+    async def run() -> None:
+        single_flight = SingleFlight()
+        deadlines = []
+
+        async def call() -> str:
+            deadlines.append(deadline.remaining())
+            await asyncio.sleep(0.1)
+            return "result"
+
+        async def caller(timeout: float) -> str:
+            with deadline.scope(timeout):
+                return await single_flight.do("a", call)
+
+        # The first caller's short deadline doesn't fail the second caller.
+        short, long = await asyncio.gather(
+            caller(0.01), caller(10), return_exceptions=True
+        )
+        assert isinstance(short, TimeoutError)
+        assert long == "result"
+        assert deadlines == [None]
+        assert single_flight.stats() == {"in_flight": 0, "calls": 1, "collapsed": 1}
+
+    asyncio.run(run())
+
+
+def test_call_is_cancelled_once_no_caller_waits() -> None:
+    async def run() -> None:
+        single_flight = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def call() -> str:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return "result"
+
+        with deadline.scope(0.01):
+            with pytest.raises(TimeoutError):
+                await single_flight.do("a", call)
+        await asyncio.wait_for(cancelled.wait(), 1)
+        assert single_flight.stats()["in_flight"] == 0
+
+    asyncio.run(run())
@@ -0,0 +1,183 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import asyncio
+import json
+import os
+import time
+
+from node_engine.libs.runtime import Runtime
+from node_engine.libs.speculation import Speculation
+from node_engine.libs.storage import Storage
+from node_engine.models.flow_definition import FlowDefinition
+from node_engine.models.flow_event import FlowEvent
+
+registry_root = os.path.join(os.path.dirname(__file__), "..", "examples")
+
+
+def flow(continued: bool) -> FlowDefinition:
+    return FlowDefinition(
+        key="branch",
+        session_id="session",
+        context={"continued": continued},
+        flow=[
+            {
+                "key": "evaluate",
+                "name": "EvaluateContinue",
+                "config": {"outputs": {"yes": "retrieve", "no": "exit"}},
+            },
+            {
+                "key": "retrieve",
+                "name": "RetrieveContent",
+                "config": {"key": "notes", "target": "notes"},
+            },
+        ],
+    )
+
+
+def test_speculative_branch_is_used_or_discarded(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Storage, "root_path", str(tmp_path))
+    speculation = Speculation()
+    runtime = Runtime(registry_root, speculation=speculation)
+
+    async def run() -> tuple[FlowDefinition, FlowDefinition]:
+        await Storage.set("session", "notes", ["a"])
+        return (
+            await runtime.invoke(flow(continued=True)),
+            await runtime.invoke(flow(continued=False)),
+        )
+
+    taken, skipped = asyncio.run(run())
+
+    assert taken.context["notes"] == ["a"]
+    assert [trace["component"]["key"] for trace in taken.status.trace] == [
+        "evaluate",
+        "retrieve",
+    ]
+    assert "notes" not in skipped.context
+    assert len(skipped.status.trace) == 1
+
+    stats = speculation.stats()
+    assert stats["started"] == 2
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def storage_files(root) -> dict[str, bytes]:
+    return {
+        str(path.relative_to(root)): path.read_bytes()
+        for path in sorted(root.rglob("*"))
+        if path.is_file()
+    }
+
+
+def test_discarded_speculation_leaves_nothing_behind(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Storage, "root_path", str(tmp_path))
+    speculation = Speculation()
+    runtime = Runtime(registry_root, speculation=speculation)
+    events: asyncio.Queue[FlowEvent] = asyncio.Queue()
+    runtime.add_event_consumer("session", events)
+
+    async def run() -> FlowDefinition:
+        flow_definition = flow(continued=False)
+        flow_definition.context["stream_log"] = True
+        return await runtime.invoke(flow_definition)
+
+    asyncio.run(Storage.set("session", "notes", ["a"]))
+    before = storage_files(tmp_path)
+    result = asyncio.run(run())
+
+    assert speculation.stats()["started"] == 1
+    assert speculation.stats()["misses"] == 1
+    assert "notes" not in result.context
+    assert storage_files(tmp_path) == before
+
+    logged = []
+    while not events.empty():
+        logged.append(json.loads(events.get_nowait().data)["message"])
+    assert logged
+    assert not any("RetrieveContent" in message for message in logged)
+
+
+slow_component = """
+import asyncio
+
+from node_engine.libs.node_engine_component import NodeEngineComponent
+
+
+class Slow(NodeEngineComponent):
+    side_effect_free = True
+
+    async def execute(self):
+        await asyncio.sleep(3)
+        self.context.set("slow", True)
+        return self.continue_flow()
+"""
+
+
+def test_speculative_successor_times_out(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Storage, "root_path", str(tmp_path / "storage"))
+    registry_path = tmp_path / "registry"
+    registry_path.mkdir()
+    (registry_path / "registry.json").write_text(
+        json.dumps(
+            [
+                {
+                    "key": "EvaluateContinue",
+                    "label": "Evaluate Continue",
+                    "description": "",
+                    "type": "module",
+                    "config": {
+                        "module": "node_engine_example_components.evaluate_continue",
+                        "class": "EvaluateContinue",
+                    },
+                },
+                {
+                    "key": "Slow",
+                    "label": "Slow",
+                    "description": "",
+                    "type": "code",
+                    "config": {"code": slow_component, "class": "Slow"},
+                },
+            ]
+        )
+    )
+    speculation = Speculation()
+    runtime = Runtime(str(registry_path), speculation=speculation)
+
+    def slow_flow(config: dict, timeout_ms: int | None = None) -> FlowDefinition:
+        return FlowDefinition(
+            key="slow",
+            session_id="session",
+            context={"continued": True},
+            timeout_ms=timeout_ms,
+            flow=[
+                {
+                    "key": "evaluate",
+                    "name": "EvaluateContinue",
+                    "config": {"outputs": {"yes": "slow", "no": "exit"}},
+                },
+                {"key": "slow", "name": "Slow", "config": config},
+            ],
+        )
+
+    async def run(flow_definition: FlowDefinition) -> tuple[FlowDefinition, float]:
+        start = time.perf_counter()
+        result = await runtime.invoke(flow_definition)
+        return result, time.perf_counter() - start
+
+    # The successor started during the branch's 1s, so it is past its
+    # timeout when the branch picks it.
+    result, elapsed = asyncio.run(run(slow_flow({"timeout_ms": 500})))
+    assert result.status.error == "component timed out. name=Slow, timeout_ms=500"
+    assert elapsed < 2
+    assert "slow" not in result.context
+
+    result, elapsed = asyncio.run(run(slow_flow({}, timeout_ms=1500)))
+    assert result.status.error == (
+        "component timed out. name=Slow, invocation deadline exceeded"
+    )
+    assert elapsed < 2
+
+    assert runtime.timeouts["Slow"] == 2
+    assert speculation.stats()["started"] == 2
+    assert speculation.stats()["hits"] == 0
@@ -0,0 +1,81 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import asyncio
+import os
+import threading
+
+from node_engine.libs import storage
+from node_engine.libs.runtime import Runtime
+from node_engine.libs.storage import Storage
+from node_engine.models.flow_definition import FlowDefinition
+
+registry_root = os.path.join(os.path.dirname(__file__), "..", "examples")
+
+
+def test_prefetched_keys_are_served_until_written(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Storage, "root_path", str(tmp_path))
+
+    async def run() -> None:
+        await Storage.set("session", "messages", [{"content": "hello"}])
+
+        with Storage.prefetching("session", ["messages", "missing"]) as prefetch:
+            assert await Storage.get("session", "messages") == [{"content": "hello"}]
+            assert await Storage.get("session", "missing") is None
+            assert prefetch.stats() == {"hits": 2, "misses": 0}
+
+            # Each read gets its own copy.
+            (await Storage.get("session", "messages")).append({"content": "x"})
+            assert len(await Storage.get("session", "messages")) == 1
+
+            # Writes made while prefetching are read back.
+            await Storage.append("session", "missing", "text", raw=True)
+            assert await Storage.get("session", "missing", raw=True) == "text"
+            assert prefetch.stats()["misses"] == 1
+
+        # Outside of the context, reads go to the files again.
+        assert prefetch.stats()["hits"] == 4
+
+    asyncio.run(run())
+
+
+def test_runtime_prefetches_declared_keys(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Storage, "root_path", str(tmp_path))
+    flow_definition = FlowDefinition(
+        key="retrieve",
+        session_id="session",
+        flow=[
+            {
+                "key": "retrieve",
+                "name": "RetrieveContent",
+                "config": {"key": "notes", "target": "notes"},
+            }
+        ],
+    )
+    runtime = Runtime(registry_root)
+    prefetching = Storage.prefetching
+    prefetches = []
+
+    def record_prefetching(session_id: str, keys: list[str]):
+        context = prefetching(session_id, keys)
+        prefetches.append(keys)
+        return context
+
+    monkeypatch.setattr(Storage, "prefetching", staticmethod(record_prefetching))
+    reads = []
+    read_file = storage._read_file
+
+    def record_read(filename: str) -> str | None:
+        reads.append(threading.current_thread() is threading.main_thread())
+        return read_file(filename)
+
+    monkeypatch.setattr(storage, "_read_file", record_read)
+
+    async def run() -> FlowDefinition:
+        await Storage.set("session", "notes", ["a", "b"])
+        return await runtime.invoke(flow_definition)
+
+    assert asyncio.run(run()).context["notes"] == ["a", "b"]
+    assert prefetches == [["notes"]]
+    # The component's read was served by the prefetch, read in a worker
+    # thread, rather than by a read of its own on the event loop.
+    assert reads == [False]
@@ -0,0 +1,169 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import asyncio
+import os
+import re
+
+from openai.types.chat import ChatCompletion
+
+from node_engine.libs import azure_openai_chat_completion
+from node_engine.libs.prompt_budget import estimate_tokens, message_overhead_tokens
+from node_engine.libs.runtime import Runtime
+from node_engine.libs.storage import Storage
+from node_engine.models.flow_definition import FlowDefinition
+
+registry_root = os.path.join(os.path.dirname(__file__), "..", "examples")
+
+
+class StubClient:
+    """
+    Answers chat completions in place of the Azure OpenAI client, recording
+    the summary and new messages of each request and summarizing them as the
+    number of messages sent so far.
+    """
+
+    def __init__(self) -> None:
+        self.summaries: list[str] = []
+        self.chunks: list[list[str]] = []
+        self.finish_reason = "stop"
+        self.error: Exception | None = None
+
+    def __call__(self, **options) -> "StubClient":
+        return self
+
+    def with_options(self, **options) -> "StubClient":
+        return self
+
+    @property
+    def chat(self) -> "StubClient":
+        return self
+
+    @property
+    def completions(self) -> "StubClient":
+        return self
+
+    async def create(self, messages: list[dict], **params) -> ChatCompletion:
+        if self.error:
+            raise self.error
+        new_messages = re.fullmatch(
+            "<NEW_MESSAGES>(.*)</NEW_MESSAGES>", messages[-1]["content"], re.S
+        )
+        self.summaries.append(messages[-2]["content"])
+        self.chunks.append(new_messages.group(1).split("\n"))
+        return ChatCompletion(
+            id="stub",
+            object="chat.completion",
+            created=0,
+            model="stub",
+            choices=[
+                {
+                    "index": 0,
+                    "finish_reason": self.finish_reason,
+                    "message": {
+                        "role": "assistant",
+                        "content": f"{sum(len(chunk) for chunk in self.chunks)} messages",
+                    },
+                }
+            ],
+        )
+
+
+def flow(**config) -> FlowDefinition:
+    return FlowDefinition(
+        key="summarize",
+        session_id="session",
+        flow=[
+            {
+                "key": "summarize",
+                "name": "SummarizeHistory",
+                "config": {
+                    "service": "endpoint|http://stand-in,key|test,deployment|stub",
+                    **config,
+                },
+            }
+        ],
+    )
+
+
+def history(count: int) -> list[dict]:
+    return [
+        {"sender": "user", "content": f"message {index} " + "word " * 20}
+        for index in range(count)
+    ]
+
+
+def test_summarize_new_messages_in_chunks(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Storage, "root_path", str(tmp_path))
+    client = StubClient()
+    monkeypatch.setattr(azure_openai_chat_completion, "AsyncAzureOpenAI", client)
+    runtime = Runtime(registry_root)
+    budget = 100
+
+    async def run() -> None:
+        await Storage.set("session", "messages", history(12))
+        result = await runtime.invoke(flow(keep_recent=2, chunk_token_budget=budget))
+        assert result.status.error is None
+        assert result.context["history_summary"]["processed"] == 10
+        assert result.context["history_summary"]["content"] == "10 messages"
+
+        # The ten oldest messages were sent in chunks within the budget.
+        sent = [line for chunk in client.chunks for line in chunk]
+        assert sent == [f"[user]: {message['content']}" for message in history(12)[:10]]
+        assert len(client.chunks) > 1
+        for chunk in client.chunks:
+            assert (
+                sum(estimate_tokens(line) + message_overhead_tokens for line in chunk)
+                <= budget
+            )
+
+        # Only messages after the mark are sent on the next run.
+        client.summaries.clear()
+        client.chunks.clear()
+        await Storage.set("session", "messages", history(14))
+        result = await runtime.invoke(flow(keep_recent=2, chunk_token_budget=budget))
+        assert client.summaries == ["<SUMMARY>10 messages</SUMMARY>"]
+        assert client.chunks == [
+            [f"[user]: {message['content']}" for message in history(14)[10:12]]
+        ]
+        summary = await Storage.get("session", "history_summary")
+        assert summary["processed"] == 12
+        assert summary == result.context["history_summary"]
+
+        # A shrunk history resets the summary.
+        client.summaries.clear()
+        client.chunks.clear()
+        await Storage.set("session", "messages", history(3))
+        result = await runtime.invoke(flow(keep_recent=0))
+        assert client.summaries == ["<SUMMARY></SUMMARY>"]
+        assert client.chunks == [
+            [f"[user]: {message['content']}" for message in history(3)]
+        ]
+        assert (await Storage.get("session", "history_summary"))["processed"] == 3
+
+    asyncio.run(run())
+
+
+def test_failed_completion_keeps_the_summary(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Storage, "root_path", str(tmp_path))
+    client = StubClient()
+    monkeypatch.setattr(azure_openai_chat_completion, "AsyncAzureOpenAI", client)
+    runtime = Runtime(registry_root)
+
+    async def run() -> None:
+        await Storage.set("session", "messages", history(2))
+        await runtime.invoke(flow(keep_recent=0))
+        summary = await Storage.get("session", "history_summary")
+        assert summary["processed"] == 2
+
+        await Storage.set("session", "messages", history(4))
+        client.finish_reason = "length"
+        result = await runtime.invoke(flow(keep_recent=0))
+        assert "incomplete response - reason: length" in result.status.error
+        assert await Storage.get("session", "history_summary") == summary
+
+        client.error = Exception("connection reset")
+        result = await runtime.invoke(flow(keep_recent=0))
+        assert "Error creating chat completion." in result.status.error
+        assert await Storage.get("session", "history_summary") == summary
+
+    asyncio.run(run())
@@ -0,0 +1,93 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+import asyncio
+import os
+
+from node_engine.libs import tracing
+from node_engine.libs.runtime import Runtime
+from node_engine.libs.storage import Storage
+from node_engine.models.flow_definition import FlowDefinition
+
+registry_root = os.path.join(os.path.dirname(__file__), "..", "examples")
+
+
+class ListExporter:
+    def __init__(self) -> None:
+        self.spans: list[tracing.Span] = []
+
+    def export(self, spans: list[tracing.Span]) -> None:
+        self.spans.extend(spans)
+
+
+def test_sub_flows_are_traced_as_children(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(Storage, "root_path", str(tmp_path))
+    exporter = ListExporter()
+    tracer = tracing.Tracer(exporter)
+    monkeypatch.setattr(tracing, "_tracer", tracer)
+
+    flow_definition = FlowDefinition(
+        key="outer",
+        session_id="session",
+        flow=[
+            {
+                "key": "invoke",
+                "name": "InvokeFlow",
+                "config": {
+                    "flow_definition": {
+                        "key": "inner",
+                        "flow": [
+                            {
+                                "key": "retrieve",
+                                "name": "RetrieveContent",
+                                "config": {"key": "notes", "target": "notes"},
+                            }
+                        ],
+                    }
+                },
+            }
+        ],
+    )
+    parent = tracing.SpanContext("a" * 32, "b" * 16, True)
+
+    async def run() -> None:
+        with tracing.resume(parent):
+            await Runtime(registry_root).invoke(flow_definition)
+
+    asyncio.run(run())
+    tracer.flush()
+
+    spans = {span.name: span for span in exporter.spans}
+    assert set(spans) == {
+        "flow outer",
+        "component InvokeFlow",
+        "flow inner",
+        "component RetrieveContent",
+    }
+    assert {span.context.trace_id for span in spans.values()} == {"a" * 32}
+    assert spans["flow outer"].parent_id == "b" * 16
+    for child, parent_name in [
+        ("component InvokeFlow", "flow outer"),
+        ("flow inner", "component InvokeFlow"),
+        ("component RetrieveContent", "flow inner"),
+    ]:
+        assert spans[child].parent_id == spans[parent_name].context.span_id
+    assert spans["flow outer"].to_otlp()["status"] == {"code": 1}
+
+
+def test_sampling_decision_is_propagated(monkeypatch) -> None:
+    exporter = ListExporter()
+    monkeypatch.setattr(tracing, "_tracer", tracing.Tracer(exporter, sample_rate=0))
+
+    with tracing.span("root") as span:
+        assert span is None
+        headers = tracing.headers()
+    assert headers["traceparent"].endswith("-00")
+
+    context = tracing.from_headers(headers)
+    assert context is not None and not context.sampled
+    with tracing.resume(context), tracing.span("child") as child:
+        assert child is None
+    assert tracing.from_headers({"traceparent": "invalid"}) is None
+
+    tracing._tracer.flush()
+    assert exporter.spans == []
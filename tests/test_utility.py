@@ -1,6 +1,6 @@
 # Copyright (c) Microsoft. All rights reserved.
 
-from node_engine.libs.utility import eval_template
+from node_engine.libs.utility import declared_context_keys, eval_template
 import pytest
 
 values = {
@@ -40,3 +40,18 @@ tests = [
 def test_eval_template(input, expected) -> None:
     actual = eval_template(input, values)
     assert expected == actual
+
+
+declared_context_keys_tests = [
+    (None, None),
+    ({"config": {}}, None),
+    ({"context": None}, None),
+    ({"context": "as defined in config"}, None),
+    ({"context": {}}, []),
+    ({"context": {"messages": {}, "intent": {}}}, ["messages", "intent"]),
+]
+
+
+@pytest.mark.parametrize("reads_from, expected", declared_context_keys_tests)
+def test_declared_context_keys(reads_from, expected) -> None:
+    assert declared_context_keys(reads_from) == expected